@@ -0,0 +1,88 @@
+# app/conditional.py
+
+import hashlib
+from calendar import timegm
+
+from django.core.exceptions import ValidationError
+from django.db.models import Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from app.models import borrados_de
+
+
+def etag_de(request, *version):
+    """
+    ETag fuerte de una respuesta: la versión de los datos (`version`, p. ej. el mayor id y el
+    mayor updated_at) más lo que cambia los bytes sin cambiar los datos: la URL con su query
+    string (?fields=, cursor, page_size...), el formato negociado y el usuario.
+    """
+    formato = getattr(request, 'accepted_media_type', None)
+    llave = repr((request.get_full_path(), formato, request.user.pk, version))
+    return quote_etag(hashlib.sha256(llave.encode()).hexdigest()[:32])
+
+
+class ValidadoresMixin:
+    """
+    GET condicional para APIView: la vista llama a self.no_modificado() con el ETag y la
+    última modificación antes de leer los datos; si el cliente ya tiene esa versión
+    (If-None-Match, o If-Modified-Since sin If-None-Match) responde 304 sin cuerpo, y si no,
+    la respuesta 2xx sale con ETag y Last-Modified.
+    """
+    _validadores = None
+
+    def no_modificado(self, request, etag, ultimo):
+        """Guarda los validadores de la respuesta; devuelve el 304 si el cliente ya tiene esta versión, si no None."""
+        segundos = timegm(ultimo.utctimetuple()) if ultimo else None
+        self._validadores = (etag, segundos)
+        return get_conditional_response(request, etag=etag, last_modified=segundos)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self._validadores and (200 <= response.status_code < 300 or response.status_code == 304):
+            etag, segundos = self._validadores
+            response['ETag'] = etag
+            if segundos is not None:
+                response['Last-Modified'] = http_date(segundos)
+        return response
+
+
+class ConditionalGetMixin(ValidadoresMixin):
+    """
+    list() y retrieve() de un ViewSet con GET condicional: la versión del queryset filtrado
+    (mayor id y mayor `campo_modificacion`, MAX sobre índices en vez de contar las filas) más
+    los borrados del modelo (DeletionCounter, una lectura por clave) deciden el 304 antes de
+    paginar o serializar. El id cubre las altas, updated_at las modificaciones y el contador
+    los borrados; Last-Modified (segundos, sin contador) no ve los borrados, por eso el ETag
+    manda cuando el cliente envía los dos.
+    """
+    campo_modificacion = 'updated_at'
+
+    def version(self, queryset):
+        version = queryset.order_by().aggregate(max_pk=Max('pk'), ultimo=Max(self.campo_modificacion))
+        version['borrados'] = borrados_de(queryset.model)
+        return version
+
+    def _no_modificado(self, request, queryset):
+        version = self.version(queryset)
+        return self.no_modificado(request, etag_de(request, *version.values()), version['ultimo'])
+
+    def list(self, request, *args, **kwargs):
+        respuesta = self._no_modificado(request, self.filter_queryset(self.get_queryset()))
+        if respuesta is not None:
+            return respuesta
+        return super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            queryset = self.filter_queryset(self.get_queryset()).filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+            respuesta = self._no_modificado(request, queryset)
+        except (TypeError, ValueError, ValidationError):
+            # Un id inválido: el retrieve normal responde 404
+            respuesta = None
+        if respuesta is not None:
+            return respuesta
+        return super().retrieve(request, *args, **kwargs)
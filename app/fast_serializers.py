@@ -0,0 +1,177 @@
+# app/fast_serializers.py
+
+import decimal
+from decimal import Decimal
+
+from rest_framework import serializers
+from rest_framework.settings import ISO_8601, api_settings
+
+
+def _convertidor(campo):
+    """
+    Función valor -> JSON equivalente a campo.to_representation() para los tipos de campo
+    de la API, sin pasar por el objeto Field en cada fila. Lo que no se reconoce (o trae
+    opciones poco comunes) usa el to_representation del propio campo.
+    """
+    if isinstance(campo, serializers.DecimalField):
+        coerce = getattr(campo, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+        if coerce and not campo.localize and not getattr(campo, 'normalize_output', False) \
+                and campo.decimal_places is not None:
+            # El mismo quantize que DecimalField.quantize (con los Decimal de la base no cambia nada)
+            contexto = decimal.getcontext().copy()
+            if campo.max_digits is not None:
+                contexto.prec = campo.max_digits
+            exponente = Decimal('.1') ** campo.decimal_places
+            rounding = campo.rounding
+            lento = campo.to_representation
+
+            def decimal_(v):
+                if type(v) is Decimal:
+                    return format(v.quantize(exponente, rounding=rounding, context=contexto), 'f')
+                return lento(v)
+            return decimal_
+    elif isinstance(campo, (serializers.DateField, serializers.TimeField)):
+        por_defecto = api_settings.DATE_FORMAT if isinstance(campo, serializers.DateField) else api_settings.TIME_FORMAT
+        if getattr(campo, 'format', por_defecto) == ISO_8601:
+            return lambda v: v if isinstance(v, str) else v.isoformat()
+    elif isinstance(campo, serializers.IntegerField):
+        return int
+    elif isinstance(campo, serializers.CharField):
+        return str
+    elif isinstance(campo, serializers.PrimaryKeyRelatedField) and campo.pk_field is None:
+        # .values_list() ya trae el id de la FK
+        return lambda v: v
+    return campo.to_representation
+
+
+class LectorRapido:
+    """
+    Camino de solo lectura para un ModelSerializer: arma los dicts de la respuesta
+    directamente desde las tuplas de .values_list() (o desde una instancia) con un convertidor
+    precompilado por campo, en el mismo orden de llaves y con los mismos valores que
+    serializer.data. Los serializers anidados many=True (related_name) se leen con una
+    consulta .values_list() por relación y se agrupan por la FK, en el orden de `ordenes`.
+    """
+
+    def __init__(self, serializer_class, campos=None, ordenes=None):
+        self.serializer_class = serializer_class
+        self.model = serializer_class.Meta.model
+        self.ordenes = dict(ordenes or {})
+        fields = serializer_class().fields
+        self.disponibles = list(fields)
+        self.pk = self.model._meta.pk.name
+        self._recortes = {}
+
+        # Plan: (nombre, columna de .values_list(), atributo de la instancia, convertidor, anidado)
+        self.plan = []
+        self.anidados = []
+        for nombre, campo in fields.items():
+            if campos is not None and nombre not in campos:
+                continue
+            if isinstance(campo, serializers.ListSerializer):
+                relacion = self.model._meta.get_field(campo.source)
+                hijo = LectorRapido(type(campo.child))
+                self.anidados.append((nombre, hijo, relacion.field.name, self.ordenes.get(nombre, ())))
+                self.plan.append((nombre, self.pk, campo.source, None, hijo))
+            else:
+                atributo = self.model._meta.get_field(campo.source).attname
+                self.plan.append((nombre, campo.source, atributo, _convertidor(campo), None))
+        self.columnas = list(dict.fromkeys(columna for _, columna, _, _, _ in self.plan))
+        self._indices = {columna: i for i, columna in enumerate(self.columnas)}
+
+    def recortado(self, campos):
+        """El lector con solo `campos` (resultado de campos_pedidos(); None = todos), compilado una vez."""
+        if campos is None:
+            return self
+        llave = tuple(campos)
+        if llave not in self._recortes:
+            self._recortes[llave] = LectorRapido(self.serializer_class, campos, self.ordenes)
+        return self._recortes[llave]
+
+    def values(self, queryset, columnas_extra=()):
+        """
+        El queryset como tuplas de .values_list() con las columnas del plan (sin prefetch ni
+        .only()). Son namedtuples para que la paginación por cursor pueda leer `columnas_extra`.
+        """
+        columnas = [*self.columnas, *(c for c in columnas_extra if c not in self._indices)]
+        return queryset.prefetch_related(None).values_list(*columnas, named=True)
+
+    def _convertidores(self, hijos, flotantes=()):
+        """(nombre, posición en la tupla, convertidor); los anidados se buscan por el pk del padre."""
+        resultado = []
+        for nombre, columna, _, convertir, anidado in self.plan:
+            if anidado is not None:
+                grupos, vacio = hijos[nombre]
+                convertir = lambda pk, grupos=grupos, vacio=vacio: grupos.get(pk, vacio)
+            elif nombre in flotantes:
+                convertir = float
+            resultado.append((nombre, self._indices[columna], convertir))
+        return resultado
+
+    def _filas(self, filas, convertidores):
+        return [
+            {nombre: None if (valor := fila[i]) is None else convertir(valor) for nombre, i, convertir in convertidores}
+            for fila in filas
+        ]
+
+    def _columnas(self, filas, convertidores):
+        # Se transponen las tuplas tal como vienen (zip), sin armar un dict por fila
+        columnas = list(zip(*filas)) or [()] * len(self.columnas)
+        return {
+            nombre: [None if valor is None else convertir(valor) for valor in columnas[i]]
+            for nombre, i, convertir in convertidores
+        }
+
+    def _hijos(self, pks, columnar=False, tamano_bloque=1000):
+        """
+        {nombre anidado: ({pk del padre: lista de dicts o dict de columnas}, valor si no tiene)}
+        con una consulta por relación (por bloques de pks).
+        """
+        hijos = {}
+        for nombre, lector, fk, orden in self.anidados:
+            convertidores = [(n, i + 1, c) for n, i, c in lector._convertidores(None)]
+            tuplas = {}
+            for inicio in range(0, len(pks), tamano_bloque):
+                filas = (
+                    lector.model.objects
+                    .filter(**{f'{fk}__in': pks[inicio:inicio + tamano_bloque]})
+                    .order_by(*orden)
+                    .values_list(fk, *lector.columnas)
+                )
+                for fila in filas:
+                    tuplas.setdefault(fila[0], []).append(fila)
+            armar = lector._columnas if columnar else lector._filas
+            grupos = {pk: armar(filas, convertidores) for pk, filas in tuplas.items()}
+            hijos[nombre] = (grupos, {n: [] for n, _, _ in convertidores} if columnar else [])
+        return hijos
+
+    def _pks(self, filas):
+        i = self._indices[self.pk]
+        return [fila[i] for fila in filas]
+
+    def serializar(self, filas):
+        """Lista de dicts (como serializer(many=True).data) a partir de filas de self.values()."""
+        filas = list(filas)
+        hijos = self._hijos(self._pks(filas)) if self.anidados else None
+        return self._filas(filas, self._convertidores(hijos))
+
+    def serializar_columnas(self, filas, flotantes=()):
+        """
+        Las mismas filas en formato columnar: {campo: [valor de cada fila]}. Los anidados
+        quedan como un dict de columnas por fila y los campos de `flotantes` como números
+        en lugar de cadenas decimales.
+        """
+        filas = list(filas)
+        hijos = self._hijos(self._pks(filas), columnar=True) if self.anidados else None
+        return self._columnas(filas, self._convertidores(hijos, flotantes))
+
+    def serializar_instancia(self, obj):
+        """Como serializer(obj).data; los anidados salen de obj.<related_name>.all() (ya precargados)."""
+        datos = {}
+        for nombre, _, atributo, convertir, anidado in self.plan:
+            if anidado is not None:
+                datos[nombre] = [anidado.serializar_instancia(hijo) for hijo in getattr(obj, atributo).all()]
+            else:
+                valor = getattr(obj, atributo)
+                datos[nombre] = None if valor is None else convertir(valor)
+        return datos
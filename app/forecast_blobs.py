@@ -0,0 +1,61 @@
+# app/forecast_blobs.py
+
+import zlib
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, OuterRef, Subquery
+
+from app.models import DailyForecast, ForecastBlob, Location
+from app.renderers import ORJSONRenderer
+from app.serializers import LECTOR_PRONOSTICOS
+
+
+# Guardar al escribir el JSON de cada pronóstico y servirlo tal cual en /clima-actual/ y /clima-por-ciudad/
+PRERENDERED_FORECASTS = getattr(settings, "PRERENDERED_FORECASTS", True)
+
+# Nivel de zlib: el JSON de un pronóstico (~1.6 KB) queda en ~0.5 KB
+NIVEL_COMPRESION = 6
+
+_renderer = ORJSONRenderer()
+
+
+def renderizar_pronosticos(forecast_ids, tamano_bloque=1000):
+    """
+    Renderiza (con LECTOR_PRONOSTICOS y ORJSONRenderer, los mismos bytes que la API) y
+    guarda con un upsert por bloque el JSON de cada DailyForecast de `forecast_ids`.
+    Los ids que ya no existen se ignoran. Devuelve cuántos se escribieron.
+    """
+    if not PRERENDERED_FORECASTS:
+        return 0
+    ids = sorted({pk for pk in forecast_ids if pk is not None})
+    # MySQL resuelve el conflicto con ON DUPLICATE KEY UPDATE y no admite unique_fields
+    unique_fields = ["daily_forecast"] if connection.features.supports_update_conflicts_with_target else None
+    escritos = 0
+    for i in range(0, len(ids), tamano_bloque):
+        filas = LECTOR_PRONOSTICOS.values(DailyForecast.objects.filter(pk__in=ids[i:i + tamano_bloque]))
+        blobs = [
+            ForecastBlob(daily_forecast_id=datos["id"], data=zlib.compress(_renderer.render(datos), NIVEL_COMPRESION))
+            for datos in LECTOR_PRONOSTICOS.serializar(filas)
+        ]
+        ForecastBlob.objects.bulk_create(blobs, update_conflicts=True, unique_fields=unique_fields, update_fields=["data"])
+        escritos += len(blobs)
+    return escritos
+
+
+def ubicaciones_con_blob():
+    """
+    Location con el JSON guardado de su latest_forecast anotado como `blob` (None si no hay)
+    y el updated_at del pronóstico como `forecast_updated_at` (para el ETag): una sola
+    consulta y sin hidratar el pronóstico ni sus detalles.
+    """
+    return Location.objects.only("id", "city", "latitude", "longitude", "latest_forecast", "updated_at").annotate(
+        blob=Subquery(ForecastBlob.objects.filter(pk=OuterRef("latest_forecast_id")).values("data")[:1]),
+        forecast_updated_at=F("latest_forecast__updated_at"),
+    )
+
+
+def con_metadata(blob, metadata):
+    """El JSON guardado con el bloque "metadata" agregado al final del objeto (como response_data['metadata'] = ...)."""
+    cuerpo = zlib.decompress(blob)
+    return b"".join((cuerpo[:-1], b',"metadata":', _renderer.render(metadata), b"}"))
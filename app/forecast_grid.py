@@ -0,0 +1,160 @@
+# app/forecast_grid.py
+
+import json
+import os
+import struct
+import threading
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from app.model_registry import MODELOS_DIR
+
+
+# Archivo por defecto del cubo precalculado (lo genera `manage.py build_forecast_grid`)
+GRID_PATH = Path(getattr(settings, "FORECAST_GRID_PATH", MODELOS_DIR / "forecast_grid.f32"))
+
+# Formato: MAGIC (8 bytes) + largo del header (uint32) + header JSON, y los datos
+# float32 alineados a 64 bytes con forma (dias, nlat, nlon, nvars + 1).
+# La última columna es el índice de la clase de condición (NaN si no hay clasificador).
+MAGIC = b"SAGRID01"
+ALINEACION = 64
+DIAS = 365
+
+
+def _offset_datos(header_bytes):
+    crudo = len(MAGIC) + 4 + len(header_bytes)
+    return (crudo + ALINEACION - 1) // ALINEACION * ALINEACION
+
+
+def ejes_grid(lat_step, lon_step):
+    """Ejes de la malla: latitudes incluyen ambos polos, longitudes cubren [-180, 180)."""
+    nlat = int(round(180 / lat_step)) + 1
+    nlon = int(round(360 / lon_step))
+    lats = -90 + lat_step * np.arange(nlat)
+    lons = -180 + lon_step * np.arange(nlon)
+    return lats, lons
+
+
+def escribir_grid(path, header, datos_por_dia):
+    """
+    Escribe el cubo en `path` de forma atómica (archivo temporal + os.replace), así
+    los workers que ya tienen mapeado el archivo anterior no leen datos a medias.
+    `datos_por_dia` es un iterable que produce un array (nlat, nlon, nvars + 1) por día.
+    """
+    path = Path(path)
+    header_bytes = json.dumps(header).encode()
+    offset = _offset_datos(header_bytes)
+    forma = (DIAS, len(header["lats"]), len(header["lons"]), len(header["variables"]) + 1)
+
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b"\0" * (offset - f.tell()))
+
+    cubo = np.memmap(tmp, dtype="<f4", mode="r+", offset=offset, shape=forma)
+    for d, datos in enumerate(datos_por_dia):
+        cubo[d] = datos
+    cubo.flush()
+    del cubo
+    os.replace(tmp, path)
+
+
+class ForecastGrid:
+    """
+    Cubo precalculado (día, lat, lon, variable) abierto como memmap de solo lectura.
+    Todos los workers que abren el mismo archivo comparten sus páginas en la caché del SO.
+    """
+
+    def __init__(self, path=GRID_PATH):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{self.path} no es un archivo de malla de pronóstico válido.")
+            (largo,) = struct.unpack("<I", f.read(4))
+            header_bytes = f.read(largo)
+
+        self.header = json.loads(header_bytes)
+        self.variables = self.header["variables"]
+        self.classes = self.header["classes"]
+        self.lat0, self.lat_step = self.header["lats"][0], self.header["lat_step"]
+        self.lon0, self.lon_step = self.header["lons"][0], self.header["lon_step"]
+        self.nlat, self.nlon = len(self.header["lats"]), len(self.header["lons"])
+        self.mtime = os.stat(self.path).st_mtime_ns
+
+        self.cubo = np.memmap(
+            self.path, dtype="<f4", mode="r", offset=_offset_datos(header_bytes),
+            shape=(DIAS, self.nlat, self.nlon, len(self.variables) + 1),
+        )
+
+    def interpolar(self, lats, lons, dias):
+        """
+        Interpolación bilineal en espacio (vectorizada) para el día indicado.
+        Las longitudes dan la vuelta en el antimeridiano; las latitudes se recortan a los polos.
+        La condición no se interpola: se toma la de la celda más cercana.
+        Devuelve un dict columnar con la misma forma que predecir_condicion_batch.
+        """
+        lats = np.asarray(lats, dtype=float).ravel()
+        lons = np.asarray(lons, dtype=float).ravel()
+        dias = np.asarray(dias).ravel()
+        d = (dias.astype(int) - 1) % DIAS
+
+        fi = np.clip((lats - self.lat0) / self.lat_step, 0, self.nlat - 1)
+        fj = np.mod((lons - self.lon0) / self.lon_step, self.nlon)
+        i0 = np.minimum(np.floor(fi).astype(int), self.nlat - 2)
+        j0 = np.floor(fj).astype(int) % self.nlon
+        i1 = np.minimum(i0 + 1, self.nlat - 1)
+        j1 = (j0 + 1) % self.nlon
+        wi = (fi - i0)[:, None]
+        wj = (fj - np.floor(fj))[:, None]
+
+        c00 = self.cubo[d, i0, j0]
+        c01 = self.cubo[d, i0, j1]
+        c10 = self.cubo[d, i1, j0]
+        c11 = self.cubo[d, i1, j1]
+        valores = (c00 * (1 - wi) * (1 - wj) + c01 * (1 - wi) * wj + c10 * wi * (1 - wj) + c11 * wi * wj)
+
+        # Condición de la celda más cercana
+        cercana = self.cubo[d, np.where(wi[:, 0] < 0.5, i0, i1), np.where(wj[:, 0] < 0.5, j0, j1), -1]
+        condition = np.full(len(lats), "Not Classified", dtype=object)
+        validas = ~np.isnan(cercana)
+        if self.classes:
+            condition[validas] = np.asarray(self.classes, dtype=object)[cercana[validas].astype(int)]
+
+        resultado = {"lat": lats, "lon": lons, "day": dias, "condition": condition}
+        for k, var in enumerate(self.variables):
+            resultado[var] = valores[:, k].astype(np.float32)
+        return resultado
+
+    def lookup(self, lat, lon, dia):
+        """Un solo punto; mismas llaves que predecir_condicion."""
+        lote = self.interpolar([lat], [lon], [dia])
+        preds = {var: lote[var][0] for var in self.variables}
+        return {"lat": lat, "lon": lon, "day": dia, "condition": lote["condition"][0], **preds}
+
+
+_grid = None
+_grid_lock = threading.Lock()
+
+
+def get_grid(path=GRID_PATH):
+    """
+    Devuelve la malla abierta de este proceso (o None si no se ha generado).
+    Si el archivo se regeneró se vuelve a mapear.
+    """
+    global _grid
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    grid = _grid
+    if grid is None or grid.path != Path(path) or grid.mtime != mtime:
+        with _grid_lock:
+            if _grid is None or _grid.path != Path(path) or _grid.mtime != mtime:
+                _grid = ForecastGrid(path)
+            grid = _grid
+    return grid
@@ -0,0 +1,69 @@
+# app/interpolation.py
+
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db import models
+
+from app.models import DailyForecast
+
+
+# Exponente de la ponderación por inverso de la distancia (peso = 1 / d^IDW_POWER)
+IDW_POWER = getattr(settings, "IDW_POWER", 2)
+
+# Por debajo de esta distancia (km) se toma el vecino tal cual en lugar de ponderar
+DISTANCIA_EXACTA_KM = 1e-3
+
+
+def campos_numericos():
+    """Campos de DailyForecast que se pueden promediar (Decimal/Integer/Float), con sus decimales."""
+    campos = {}
+    for field in DailyForecast._meta.concrete_fields:
+        if isinstance(field, models.DecimalField):
+            campos[field.name] = field.decimal_places
+        elif isinstance(field, (models.IntegerField, models.FloatField)) and not field.primary_key:
+            campos[field.name] = 0 if isinstance(field, models.IntegerField) else None
+    return campos
+
+
+def pesos_idw(distancias_km, power=IDW_POWER):
+    """Pesos normalizados 1/d^power; si algún vecino coincide con el punto, se lleva todo el peso."""
+    d = np.asarray(distancias_km, dtype=float)
+    exactos = d < DISTANCIA_EXACTA_KM
+    if exactos.any():
+        return exactos / exactos.sum()
+    w = 1.0 / d ** power
+    return w / w.sum()
+
+
+def mezclar_idw(forecasts, distancias_km, power=IDW_POWER):
+    """
+    Mezcla los campos numéricos de varios DailyForecast con pesos IDW (en una sola
+    operación matricial). Los nulos no cuentan: su peso se reparte entre los demás.
+    Cada valor sale con el tipo de su campo (Decimal con sus decimales, int o float).
+    Solo devuelve los campos numéricos: los demás (condición, dirección del viento...)
+    los pone quien llama, a partir del más cercano.
+    """
+    campos = campos_numericos()
+    nombres = list(campos)
+    valores = np.array(
+        [[np.nan if getattr(f, n) is None else float(getattr(f, n)) for n in nombres] for f in forecasts],
+        dtype=float,
+    ).reshape(len(forecasts), len(nombres))
+
+    w = pesos_idw(distancias_km, power)[:, None] * ~np.isnan(valores)
+    suma = w.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mezcla = np.nansum(valores * w, axis=0) / suma
+
+    resultado = {}
+    for nombre, valor, total in zip(nombres, mezcla, suma):
+        decimales = campos[nombre]
+        if total == 0:
+            resultado[nombre] = None
+        elif decimales == 0:
+            resultado[nombre] = int(round(valor))
+        else:
+            resultado[nombre] = Decimal(float(valor)).quantize(Decimal(1).scaleb(-decimales)) if decimales is not None else float(valor)
+    return resultado
@@ -0,0 +1,74 @@
+# app/management/commands/bench_city_search.py
+
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.search import CityTrie, TrigramIndex
+
+
+SILABAS = (
+    "mon te rrey san pe dro to kio nue va york ma drid gua da la ja ra lon dres ber lin ca li sal ti llo "
+    "que re ta ro chi hua her mo si lla ve cruz pue bla mo re lia tam pi co a ca pul zi hua ta ne jo co "
+    "lo gne mu nich ham burg par is rio ja nei bue nos ai res bo go sou pau lo qui sin lis bo ro sa "
+    "val pa rai so cu rich vie na pra ga var so via os kar kov dub lin ed im bur leeds york shi re"
+).split()
+
+
+def _nombre(rng):
+    return " ".join("".join(rng.choices(SILABAS, k=rng.randint(2, 4))) for _ in range(rng.randint(1, 3)))
+
+
+def _con_errata(nombre, rng):
+    # Una errata al azar: borrar, duplicar o intercambiar una letra
+    i = rng.randrange(len(nombre) - 1)
+    return rng.choice([
+        nombre[:i] + nombre[i + 1:],
+        nombre[:i] + nombre[i] + nombre[i:],
+        nombre[:i] + nombre[i + 1] + nombre[i] + nombre[i + 2:],
+    ])
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el índice de trigramas (búsqueda con erratas) y el trie de autocompletado sobre "
+        "nombres de ciudad sintéticos en memoria, sin tocar la base de datos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+        parser.add_argument("--queries", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        for n in options["sizes"]:
+            filas = [
+                {"pk": i, "city": _nombre(rng), "state_province": None, "country": None,
+                 "latitude": 0, "longitude": 0, "search_key": ""}
+                for i in range(n)
+            ]
+            consultas = [filas[rng.randrange(n)]["city"] for _ in range(options["queries"])]
+            erratas = [_con_errata(nombre, rng) for nombre in consultas]
+
+            inicio = time.perf_counter()
+            trigramas = TrigramIndex(filas)
+            construccion = time.perf_counter() - inicio
+
+            inicio = time.perf_counter()
+            aciertos = sum(
+                bool(r) and filas[r[0][0]]["city"] == nombre
+                for nombre, r in ((nombre, trigramas.buscar(errata, limit=1)) for nombre, errata in zip(consultas, erratas))
+            )
+            difusa = (time.perf_counter() - inicio) / len(erratas)
+
+            trie = CityTrie(filas)
+            inicio = time.perf_counter()
+            for nombre in consultas:
+                trie.sugerencias(nombre[:3])
+            prefijo = (time.perf_counter() - inicio) / len(consultas)
+
+            self.stdout.write(
+                f"n={n:>9,} | trigramas: construcción {construccion:6.2f} s, consulta {difusa * 1e6:8.1f} µs, "
+                f"aciertos {aciertos / len(erratas):6.1%} | trie: consulta {prefijo * 1e6:6.1f} µs"
+            )
@@ -0,0 +1,77 @@
+# app/management/commands/bench_nearest.py
+
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app.models import Location, celda_de, normalizar_busqueda
+from app.spatial import SpatialIndex, ubicacion_mas_cercana_orm
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara la búsqueda de la Location más cercana con el índice espacial en memoria "
+        "contra la consulta ORM original. Inserta ubicaciones sintéticas dentro de una "
+        "transacción que se revierte al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 1_000_000])
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--orm-queries", type=int, default=10, help="Consultas ORM por tamaño (son lentas).")
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        for n in options["sizes"]:
+            try:
+                with transaction.atomic():
+                    self._medir(n, rng, options)
+                    raise _Rollback
+            except _Rollback:
+                pass
+
+    def _medir(self, n, rng, options):
+        # Puntos uniformes sobre la esfera y coordenadas únicas (unique_together)
+        lats = np.round(np.degrees(np.arcsin(rng.uniform(-1, 1, n))), 6)
+        lons = np.round(rng.uniform(-180, 180, n), 6)
+        Location.objects.bulk_create(
+            (
+                Location(
+                    city=f"bench-{i}",
+                    search_key=normalizar_busqueda(f"bench-{i}"),
+                    latitude=lat,
+                    longitude=lon,
+                    grid_cell=celda_de(lat, lon),
+                )
+                for i, (lat, lon) in enumerate(zip(lats, lons))
+            ),
+            batch_size=5000,
+            ignore_conflicts=True,
+        )
+
+        consultas = np.column_stack([rng.uniform(-90, 90, options["queries"]), rng.uniform(-180, 180, options["queries"])])
+
+        inicio = time.perf_counter()
+        indice = SpatialIndex.desde_db()
+        construccion = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        for lat, lon in consultas:
+            indice.nearest(lat, lon)
+        memoria = (time.perf_counter() - inicio) / len(consultas)
+
+        inicio = time.perf_counter()
+        for lat, lon in consultas[:options["orm_queries"]]:
+            ubicacion_mas_cercana_orm(lat, lon)
+        orm = (time.perf_counter() - inicio) / max(min(len(consultas), options["orm_queries"]), 1)
+
+        self.stdout.write(
+            f"n={n:>9,} | índice: construcción {construccion:7.2f} s, consulta {memoria * 1e6:8.1f} µs | "
+            f"ORM: consulta {orm * 1e3:9.2f} ms | x{orm / memoria:,.0f}"
+        )
@@ -0,0 +1,80 @@
+# app/management/commands/bench_read_path.py
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from app.management.commands.bench_sparse_fields import crear_pronosticos_sinteticos
+from app.models import DailyForecast
+from app.renderers import ORJSONRenderer
+from app.serializers import DailyForecastSerializer
+from app.views import LECTOR_PRONOSTICOS, pronosticos_con_detalles
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara DailyForecastSerializer + JSONRenderer contra el camino rápido (.values() + "
+        "ORJSONRenderer) leyendo todos los pronósticos en páginas, para cada tamaño de --rows. "
+        "Inserta pronósticos sintéticos dentro de una transacción que se revierte al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", default="1000,100000", help="Tamaños a medir, separados por coma.")
+        parser.add_argument("--page-size", type=int, default=1000)
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        try:
+            tamanos = [int(n) for n in options["rows"].split(",")]
+        except ValueError:
+            raise CommandError("--rows debe ser una lista de enteros separados por coma.")
+
+        for n in tamanos:
+            try:
+                with transaction.atomic():
+                    crear_pronosticos_sinteticos(n)
+                    self._medir(n, options)
+                    raise _Rollback
+            except _Rollback:
+                pass
+
+    def _paginas(self, queryset, n, tamano):
+        for inicio in range(0, n, tamano):
+            yield queryset[inicio:inicio + tamano]
+
+    def _drf(self, n, tamano):
+        queryset = pronosticos_con_detalles().order_by("-date", "-id")
+        return [
+            JSONRenderer().render(DailyForecastSerializer(pagina, many=True).data)
+            for pagina in self._paginas(queryset, n, tamano)
+        ]
+
+    def _rapido(self, n, tamano):
+        queryset = LECTOR_PRONOSTICOS.values(DailyForecast.objects.order_by("-date", "-id"))
+        return [
+            ORJSONRenderer().render(LECTOR_PRONOSTICOS.serializar(list(pagina)))
+            for pagina in self._paginas(queryset, n, tamano)
+        ]
+
+    def _medir(self, n, options):
+        resultados = {}
+        for nombre, funcion in [("DailyForecastSerializer + JSONRenderer", self._drf),
+                                ("LectorRapido + ORJSONRenderer", self._rapido)]:
+            tiempos = []
+            for _ in range(options["repeat"]):
+                inicio = time.perf_counter()
+                cuerpos = funcion(n, options["page_size"])
+                tiempos.append(time.perf_counter() - inicio)
+            resultados[nombre] = (min(tiempos), cuerpos)
+
+        (t_drf, drf), (t_rapido, rapido) = resultados.values()
+        self.stdout.write(f"{n} pronósticos (páginas de {options['page_size']}, {sum(map(len, drf)) / 1024:.0f} KB):")
+        for nombre, (t, _) in resultados.items():
+            self.stdout.write(f"  {nombre:<40} {t * 1000:10.1f} ms ({t / t_drf:6.1%})")
+        self.stdout.write(f"  Respuestas idénticas byte a byte: {'sí' if drf == rapido else 'NO'} (x{t_drf / t_rapido:.1f})")
@@ -0,0 +1,117 @@
+# app/management/commands/bench_series_formats.py
+
+import json
+import time
+from datetime import date, time as hora, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory
+
+from app.models import DailyForecast, HourlyForecast, Location, celda_de
+from app.renderers import MessagePackRenderer
+from app.views import DailyForecastViewSet, HourlyForecastViewSet
+
+
+class _Rollback(Exception):
+    pass
+
+
+FORMATOS = [
+    ("JSON por filas", "application/json", json.loads),
+    ("JSON columnar", "application/vnd.weatheron.columnar+json", json.loads),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el tamaño y el tiempo de lectura en el cliente de una serie de un año de "
+        "/api/pronosticos-diarios/ y /api/pronosticos-horarios/ en JSON por filas, JSON columnar "
+        "y MessagePack. Inserta los pronósticos dentro de una transacción que se revierte al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=365)
+        parser.add_argument("--hours-per-day", type=int, default=24)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._crear(options["days"], options["hours_per_day"])
+                self._medir(options)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _crear(self, dias, horas):
+        location = Location.objects.create(
+            city="bench-serie", search_key="bench-serie", latitude=0.123, longitude=0.456, grid_cell=celda_de(0.123, 0.456)
+        )
+        cientificos = {
+            f.name: 1.234567 + i for i, f in enumerate(DailyForecast._meta.concrete_fields)
+            if getattr(f, "decimal_places", None) == 6
+        }
+        forecasts = DailyForecast.objects.bulk_create([
+            DailyForecast(
+                location=location, date=date(2025, 1, 1) + timedelta(days=d), current_temp=20 + d % 10,
+                condition_summary="Partly cloudy", max_temp=25, min_temp=15, feels_like_temp=20, humidity=50,
+                precipitation_prob=10, wind_speed=5, wind_direction="WSW", visibility=10, pressure=1013,
+                dew_point=10, clouds=20, **cientificos,
+            )
+            for d in range(dias)
+        ])
+        HourlyForecast.objects.bulk_create([
+            HourlyForecast(daily_forecast=f, time=hora(h * 24 // horas), temperature=15 + h % 10, condition="Sunny",
+                           precipitation_perc=h)
+            for f in forecasts for h in range(horas)
+        ])
+
+    def _leer(self, vista, url, params, accept, host):
+        """Todas las páginas de la serie: (cuerpos, segundos en el servidor)."""
+        factory = APIRequestFactory()
+        request = factory.get(url, params, HTTP_ACCEPT=accept, HTTP_HOST=host)
+        cuerpos, total = [], 0.0
+        while True:
+            inicio = time.perf_counter()
+            respuesta = vista(request)
+            respuesta.render()
+            total += time.perf_counter() - inicio
+            cuerpos.append(respuesta.content)
+            siguiente = respuesta.data.get("next")
+            if not siguiente:
+                return cuerpos, total
+            request = factory.get(siguiente, HTTP_ACCEPT=accept, HTTP_HOST=host)
+
+    def _medir(self, options):
+        host = next((h.lstrip(".") for h in settings.ALLOWED_HOSTS if h != "*"), "localhost")
+        formatos = list(FORMATOS)
+        if MessagePackRenderer.disponible:
+            import msgpack
+            formatos.append(("MessagePack", "application/msgpack", msgpack.unpackb))
+        else:
+            self.stdout.write("msgpack no está instalado: se omite MessagePack.")
+
+        series = [
+            ("/api/pronosticos-diarios/", DailyForecastViewSet.as_view({"get": "list"}), {"exclude": "alerts"}),
+            ("/api/pronosticos-horarios/", HourlyForecastViewSet.as_view({"get": "list"}), {}),
+        ]
+        for url, vista, params in series:
+            self.stdout.write(url)
+            base = None
+            for nombre, accept, parsear in formatos:
+                cuerpos, servidor = self._leer(vista, url, {**params, "page_size": 1000}, accept, host)
+                cliente = min(self._parsear(cuerpos, parsear) for _ in range(options["repeat"]))
+                tamano = sum(map(len, cuerpos))
+                base = base or (tamano, cliente)
+                self.stdout.write(
+                    f"  {nombre:<16} {tamano / 1024:9.1f} KB ({tamano / base[0]:6.1%}) | servidor {servidor * 1000:7.1f} ms | "
+                    f"cliente {cliente * 1000:7.2f} ms ({cliente / base[1]:6.1%})"
+                )
+
+    def _parsear(self, cuerpos, parsear):
+        inicio = time.perf_counter()
+        for cuerpo in cuerpos:
+            parsear(cuerpo)
+        return time.perf_counter() - inicio
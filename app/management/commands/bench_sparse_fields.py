@@ -0,0 +1,101 @@
+# app/management/commands/bench_sparse_fields.py
+
+import time
+from datetime import date, time as hora, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+
+from app.models import DailyForecast, HourlyForecast, Location, WeatherAlert, celda_de
+from app.views import DailyForecastViewSet
+
+
+class _Rollback(Exception):
+    pass
+
+
+# Lo que piden las pantallas de la app
+CAMPOS_APP = "date,condition_summary,current_temp,max_temp,min_temp"
+
+
+def crear_pronosticos_sinteticos(n):
+    """n Location con un pronóstico diario cada una, 8 horas y una alerta (para los benchmarks de lectura)."""
+    locations = Location.objects.bulk_create([
+        Location(city=f"bench-{i}", search_key=f"bench-{i}", latitude=lat, longitude=lon, grid_cell=celda_de(lat, lon))
+        for i in range(n)
+        for lat, lon in [((i // 1000) / 100, (i % 1000) / 100)]
+    ])
+    cientificos = {
+        f.name: 1.234567 for f in DailyForecast._meta.concrete_fields if getattr(f, "decimal_places", None) == 6
+    }
+    forecasts = DailyForecast.objects.bulk_create([
+        DailyForecast(
+            location=loc, date=date(2025, 10, 1) - timedelta(days=i % 30), current_temp=20,
+            condition_summary="Partly cloudy", max_temp=25, min_temp=15, feels_like_temp=20, humidity=50,
+            precipitation_prob=10, wind_speed=5, wind_direction="WSW", visibility=10, pressure=1013,
+            dew_point=10, clouds=20, **cientificos,
+        )
+        for i, loc in enumerate(locations)
+    ])
+    HourlyForecast.objects.bulk_create([
+        HourlyForecast(daily_forecast=f, time=hora(h), temperature=20, condition="Sunny", precipitation_perc=0)
+        for f in forecasts for h in range(0, 24, 3)
+    ])
+    WeatherAlert.objects.bulk_create([
+        WeatherAlert(daily_forecast=f, type="Heat", start_time=hora(12), date=f.date, details="-", probability=50)
+        for f in forecasts
+    ])
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara /api/pronosticos-diarios/ completo contra ?fields= y ?exclude= (bytes de la "
+        "respuesta, consultas y tiempo de serialización). Inserta pronósticos sintéticos dentro "
+        "de una transacción que se revierte al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000, help="Pronósticos diarios sintéticos.")
+        parser.add_argument("--page-size", type=int, default=1000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                crear_pronosticos_sinteticos(options["rows"])
+                self._medir(options)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _medir(self, options):
+        vista = DailyForecastViewSet.as_view({"get": "list"})
+        factory = APIRequestFactory()
+        host = next((h.lstrip(".") for h in settings.ALLOWED_HOSTS if h != "*"), "localhost")
+
+        casos = [
+            ("completo", {}),
+            ("?exclude=hourly_forecasts,alerts", {"exclude": "hourly_forecasts,alerts"}),
+            (f"?fields={CAMPOS_APP}", {"fields": CAMPOS_APP}),
+        ]
+        base = None
+        for nombre, params in casos:
+            params = {**params, "page_size": options["page_size"]}
+            tiempos = []
+            for _ in range(options["repeat"]):
+                request = factory.get("/api/pronosticos-diarios/", params, HTTP_HOST=host)
+                with CaptureQueriesContext(connection) as consultas:
+                    inicio = time.perf_counter()
+                    respuesta = vista(request)
+                    respuesta.render()
+                    tiempos.append(time.perf_counter() - inicio)
+            tamano = len(respuesta.content)
+            mejor = min(tiempos)
+            base = base or (tamano, mejor)
+            self.stdout.write(
+                f"{nombre:<62} {tamano / 1024:9.1f} KB ({tamano / base[0]:6.1%}) | "
+                f"{len(consultas)} consultas | {mejor * 1000:8.1f} ms ({mejor / base[1]:6.1%})"
+            )
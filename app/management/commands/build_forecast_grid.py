@@ -0,0 +1,65 @@
+# app/management/commands/build_forecast_grid.py
+
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from app.forecast_grid import DIAS, GRID_PATH, ejes_grid, escribir_grid
+from app.model_registry import registry, MODELOS_DIR
+from app.utils import VARIABLE_MAP, predecir_condicion_batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Evalúa los 18 regresores y el clasificador sobre una malla lat/lon × 365 días "
+        "y guarda el resultado como cubo float32 memory-mapped para /api/clima-actual/."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lat-step", type=float, default=2.5, help="Resolución en latitud (grados).")
+        parser.add_argument("--lon-step", type=float, default=2.5, help="Resolución en longitud (grados).")
+        parser.add_argument("--output", default=str(GRID_PATH), help="Archivo de salida.")
+
+    def handle(self, *args, **options):
+        lat_step, lon_step = options["lat_step"], options["lon_step"]
+        lats, lons = ejes_grid(lat_step, lon_step)
+        malla_lat, malla_lon = np.meshgrid(lats, lons, indexing="ij")
+        malla_lat, malla_lon = malla_lat.ravel(), malla_lon.ravel()
+
+        variables = list(VARIABLE_MAP.keys())
+        try:
+            classes = np.asarray(registry.get(MODELOS_DIR / "condition_classifier.pkl").classes_).tolist()
+        except FileNotFoundError:
+            classes = []
+        indice_clase = {c: i for i, c in enumerate(classes)}
+
+        header = {
+            "lat_step": lat_step,
+            "lon_step": lon_step,
+            "lats": lats.tolist(),
+            "lons": lons.tolist(),
+            "variables": variables,
+            "classes": classes,
+            "model_version": registry.version(),
+        }
+
+        self.stdout.write(
+            f"Malla {len(lats)}×{len(lons)} × {DIAS} días × {len(variables) + 1} columnas "
+            f"({DIAS * malla_lat.size * (len(variables) + 1) * 4 / 1024 / 1024:.1f} MB)"
+        )
+
+        def dias():
+            for dia in range(1, DIAS + 1):
+                lote = predecir_condicion_batch(malla_lat, malla_lon, np.full(malla_lat.size, dia))
+                columnas = [np.asarray(lote[var], dtype=np.float32) for var in variables]
+                columnas.append(np.array([indice_clase.get(c, np.nan) for c in lote["condition"]], dtype=np.float32))
+                if dia % 30 == 0:
+                    self.stdout.write(f"  día {dia}/{DIAS}")
+                yield np.stack(columnas, axis=-1).reshape(len(lats), len(lons), -1)
+
+        inicio = time.perf_counter()
+        escribir_grid(options["output"], header, dias())
+        self.stdout.write(self.style.SUCCESS(
+            f"Malla escrita en {options['output']} en {time.perf_counter() - inicio:.1f} s"
+        ))
@@ -0,0 +1,19 @@
+# app/management/commands/export_native_models.py
+
+from django.core.management.base import BaseCommand
+
+from app.model_registry import MODELOS_DIR
+from app.native_models import exportar_nativo
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporta cada *.pkl de data/app a un booster nativo de XGBoost (.ubj) "
+        "para el motor de inferencia sin pandas (PREDICTION_ENGINE = 'native')."
+    )
+
+    def handle(self, *args, **options):
+        for pkl_path in sorted(MODELOS_DIR.glob("*.pkl")):
+            destino = exportar_nativo(pkl_path)
+            self.stdout.write(f"  {pkl_path.name} -> {destino.name}")
+        self.stdout.write(self.style.SUCCESS("Exportación terminada."))
@@ -0,0 +1,19 @@
+# app/management/commands/export_tree_models.py
+
+from django.core.management.base import BaseCommand
+
+from app.model_registry import MODELOS_DIR
+from app.tree_engine import exportar_arboles
+
+
+class Command(BaseCommand):
+    help = (
+        "Aplana cada *.pkl de data/app en arrays de NumPy (.trees.npz) para el motor "
+        "de inferencia sin xgboost (PREDICTION_ENGINE = 'numpy')."
+    )
+
+    def handle(self, *args, **options):
+        for pkl_path in sorted(MODELOS_DIR.glob("*.pkl")):
+            destino = exportar_arboles(pkl_path)
+            self.stdout.write(f"  {pkl_path.name} -> {destino.name}")
+        self.stdout.write(self.style.SUCCESS("Exportación terminada."))
@@ -0,0 +1,32 @@
+# app/management/commands/model_stats.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.model_registry import registry, MODELOS_DIR
+from app.prediction_cache import prediction_cache
+from app.utils import precargar_modelos, PREDICTION_ENGINE
+
+
+class Command(BaseCommand):
+    help = "Carga los modelos de data/app que usa el motor configurado y muestra tiempos de carga y memoria por modelo."
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        stats = precargar_modelos()
+        total = time.perf_counter() - inicio
+
+        self.stdout.write(f"Modelos en {MODELOS_DIR} (motor: {PREDICTION_ENGINE}):")
+        total_mem = 0
+        for nombre, info in stats.items():
+            mem = info["memory_bytes"] or 0
+            total_mem += mem
+            self.stdout.write(
+                f"  {nombre:<40} carga {info['load_seconds'] * 1000:8.1f} ms | "
+                f"memoria {mem / 1024:9.1f} KB | archivo {info['file_bytes'] / 1024:9.1f} KB"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(stats)} modelos | arranque {total:.2f} s | memoria {total_mem / 1024 / 1024:.1f} MB | versión {registry.version()}"
+        ))
+        self.stdout.write(f"Caché de predicciones: {prediction_cache.stats()}")
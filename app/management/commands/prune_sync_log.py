@@ -0,0 +1,22 @@
+# app/management/commands/prune_sync_log.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.sync import SYNC_LOG_RETENTION_DAYS, podar_registro
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra del registro de cambios de /api/sync/ (ChangeLog) lo que tiene más de "
+        "SYNC_LOG_RETENTION_DAYS días. Las marcas emitidas antes de ese plazo reciben 410 y el "
+        "cliente vuelve a descargar todo, así que --days no debe ser menor que ese ajuste."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=SYNC_LOG_RETENTION_DAYS, help="Días de cambios que se conservan.")
+
+    def handle(self, *args, **options):
+        if options["days"] < SYNC_LOG_RETENTION_DAYS:
+            raise CommandError(f"--days no puede ser menor que SYNC_LOG_RETENTION_DAYS ({SYNC_LOG_RETENTION_DAYS}).")
+        borrados = podar_registro(options["days"])
+        self.stdout.write(self.style.SUCCESS(f"{borrados} cambios borrados."))
@@ -0,0 +1,38 @@
+# app/management/commands/rebuild_forecast_blobs.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.forecast_blobs import PRERENDERED_FORECASTS, renderizar_pronosticos
+from app.models import DailyForecast
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera el JSON prerenderizado (ForecastBlob) de los pronósticos que no lo tienen, por "
+        "ejemplo tras la migración o cargas por SQL que no disparan las señales. Con --all "
+        "los regenera todos (después de cambiar DailyForecastSerializer)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true", help="Solo reportar; termina con error si faltan.")
+        parser.add_argument("--all", action="store_true", help="Regenerar todos, no solo los que faltan.")
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Pronósticos por upsert.")
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size debe ser mayor que 0.")
+        if not PRERENDERED_FORECASTS:
+            raise CommandError("PRERENDERED_FORECASTS está desactivado.")
+
+        pronosticos = DailyForecast.objects.order_by("pk")
+        if not options["all"]:
+            pronosticos = pronosticos.filter(blob__isnull=True)
+        ids = list(pronosticos.values_list("pk", flat=True))
+        self.stdout.write(f"{len(ids)} pronósticos {'en total' if options['all'] else 'sin JSON prerenderizado'}.")
+        if options["check"]:
+            if ids and not options["all"]:
+                raise CommandError(f"Faltan {len(ids)} JSON prerenderizados (ej: {ids[:10]}).")
+            return
+
+        escritos = renderizar_pronosticos(ids, options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"{escritos} pronósticos renderizados."))
@@ -0,0 +1,148 @@
+# app/management/commands/refresh_forecasts.py
+
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from app.models import Location, DailyForecast
+from app.utils import precargar_modelos, pronosticar_ubicaciones
+
+
+CHECKPOINT_POR_DEFECTO = Path(settings.BASE_DIR) / "data" / "refresh_forecasts.checkpoint.json"
+
+# Horas tras las que un pronóstico ya guardado se vuelve a calcular (--max-age)
+MAX_AGE_POR_DEFECTO = getattr(settings, "REFRESH_FORECASTS_MAX_AGE_HOURS", 24)
+
+
+def _procesar_shard(args):
+    """
+    Trabajo de un worker: pronostica los pares (location, fecha) de un bloque de ubicaciones
+    que faltan o que se escribieron antes de `vigente_desde`. Los modelos ya vienen cargados
+    del proceso padre (fork).
+    """
+    indice, ids, fechas, vigente_desde = args
+    locations = list(Location.objects.filter(pk__in=ids).order_by("pk"))
+
+    existentes = set()
+    if vigente_desde is not None:
+        existentes = set(
+            DailyForecast.objects.filter(
+                location_id__in=ids, date__in=fechas, updated_at__gte=vigente_desde
+            ).values_list("location_id", "date")
+        )
+
+    pares = [(loc, fecha) for loc in locations for fecha in fechas if (loc.pk, fecha) not in existentes]
+    resultado = pronosticar_ubicaciones(pares)
+    return indice, resultado["inserted"] + resultado["updated"], len(existentes)
+
+
+def _inicializar_worker():
+    # Cada proceso hijo abre su propia conexión a la base de datos
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        "Regenera los pronósticos de todas las Location para los próximos N días, "
+        "repartiendo las ubicaciones en bloques entre un pool de procesos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=7, help="Horizonte de días a pronosticar (desde --start).")
+        parser.add_argument("--start", type=date.fromisoformat, default=None, help="Fecha inicial (YYYY-MM-DD). Por defecto hoy.")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Procesos del pool.")
+        parser.add_argument("--shard-size", type=int, default=200, help="Ubicaciones por bloque de trabajo.")
+        parser.add_argument("--force", action="store_true", help="Recalcular aunque ya exista el pronóstico.")
+        parser.add_argument(
+            "--max-age", type=float, default=MAX_AGE_POR_DEFECTO,
+            help="Horas: los pronósticos guardados hace más tiempo se recalculan.",
+        )
+        parser.add_argument("--checkpoint", default=str(CHECKPOINT_POR_DEFECTO), help="Archivo de checkpoint para reanudar.")
+        parser.add_argument("--no-resume", action="store_true", help="Ignorar el checkpoint existente y empezar de cero.")
+
+    def handle(self, *args, **options):
+        if options["days"] < 1 or options["shard_size"] < 1 or options["workers"] < 1:
+            raise CommandError("--days, --shard-size y --workers deben ser mayores que 0.")
+        if options["max_age"] < 0:
+            raise CommandError("--max-age no puede ser negativo.")
+
+        inicio_fecha = options["start"] or date.today()
+        fechas = [inicio_fecha + timedelta(days=d) for d in range(options["days"])]
+
+        ids = list(Location.objects.order_by("pk").values_list("pk", flat=True))
+        shards = [ids[i:i + options["shard_size"]] for i in range(0, len(ids), options["shard_size"])]
+
+        # El checkpoint solo vale para la misma corrida (mismas fechas, bloques y ubicaciones)
+        firma = hashlib.sha256(
+            json.dumps([str(inicio_fecha), options["days"], options["shard_size"], ids[:1], ids[-1:], len(ids)]).encode()
+        ).hexdigest()[:16]
+        checkpoint_path = Path(options["checkpoint"])
+        hechos = set()
+        if not options["no_resume"] and checkpoint_path.exists():
+            checkpoint = json.loads(checkpoint_path.read_text())
+            if checkpoint.get("firma") == firma:
+                hechos = set(checkpoint["hechos"])
+                self.stdout.write(f"Reanudando: {len(hechos)}/{len(shards)} bloques ya completados.")
+
+        # Un solo corte para todos los bloques de la corrida
+        vigente_desde = None if options["force"] else timezone.now() - timedelta(hours=options["max_age"])
+        pendientes = [(i, shard, fechas, vigente_desde) for i, shard in enumerate(shards) if i not in hechos]
+        self.stdout.write(
+            f"{len(ids)} ubicaciones × {len(fechas)} días en {len(pendientes)} bloques pendientes "
+            f"con {options['workers']} procesos."
+        )
+
+        # Cargamos los modelos antes del fork para que las páginas se compartan copy-on-write
+        precargar_modelos()
+
+        def guardar_checkpoint():
+            tmp = checkpoint_path.with_suffix(".tmp")
+            tmp.write_text(json.dumps({"firma": firma, "hechos": sorted(hechos)}))
+            os.replace(tmp, checkpoint_path)
+
+        filas = omitidas = 0
+        inicio = time.perf_counter()
+
+        if options["workers"] > 1 and "fork" in multiprocessing.get_all_start_methods():
+            connections.close_all()
+            ctx = multiprocessing.get_context("fork")
+            with ctx.Pool(options["workers"], initializer=_inicializar_worker) as pool:
+                resultados = pool.imap_unordered(_procesar_shard, pendientes)
+                for indice, escritas, saltadas in resultados:
+                    filas, omitidas = filas + escritas, omitidas + saltadas
+                    hechos.add(indice)
+                    guardar_checkpoint()
+                    self._progreso(len(hechos), len(shards), filas, inicio)
+        else:
+            # Sin fork (ej: Windows) o con un solo worker: mismo trabajo en este proceso
+            for trabajo in pendientes:
+                indice, escritas, saltadas = _procesar_shard(trabajo)
+                filas, omitidas = filas + escritas, omitidas + saltadas
+                hechos.add(indice)
+                guardar_checkpoint()
+                self._progreso(len(hechos), len(shards), filas, inicio)
+
+        # Corrida completa: el checkpoint ya no hace falta
+        checkpoint_path.unlink(missing_ok=True)
+
+        total = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"{filas} pronósticos escritos, {omitidas} ya vigentes omitidos en {total:.1f} s "
+            f"({filas / total if total else 0:.0f} filas/s)."
+        ))
+
+    def _progreso(self, hechos, total_shards, filas, inicio):
+        transcurrido = time.perf_counter() - inicio
+        self.stdout.write(
+            f"  bloque {hechos}/{total_shards} | {filas} filas | "
+            f"{filas / transcurrido if transcurrido else 0:.0f} filas/s"
+        )
@@ -0,0 +1,47 @@
+# app/management/commands/repair_latest_forecast.py
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F, OuterRef, Q, Subquery
+
+from app.models import DailyForecast, Location, actualizar_ultimo_pronostico
+
+
+def ubicaciones_inconsistentes():
+    """pks de Location cuyo latest_forecast no es su DailyForecast de mayor fecha."""
+    ultimo = DailyForecast.objects.filter(location=OuterRef('pk')).order_by('-date', '-pk').values('pk')[:1]
+    return (
+        Location.objects.annotate(esperado=Subquery(ultimo))
+        .filter(
+            (Q(latest_forecast__isnull=True) & Q(esperado__isnull=False))
+            | (Q(latest_forecast__isnull=False) & Q(esperado__isnull=True))
+            | ~Q(latest_forecast=F('esperado'))
+        )
+        .order_by('pk')
+        .values_list('pk', flat=True)
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Revisa y repara el puntero Location.latest_forecast (el DailyForecast de mayor fecha "
+        "de cada ubicación), por ejemplo tras cargas por SQL que no disparan las señales."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true", help="Solo reportar; termina con error si hay inconsistencias.")
+        parser.add_argument("--all", action="store_true", help="Recalcular todas las ubicaciones, no solo las inconsistentes.")
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Ubicaciones por UPDATE.")
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size debe ser mayor que 0.")
+
+        ids = list(ubicaciones_inconsistentes())
+        self.stdout.write(f"{len(ids)} ubicaciones con latest_forecast desactualizado.")
+        if options["check"]:
+            if ids:
+                raise CommandError(f"Hay {len(ids)} punteros inconsistentes (ej: {ids[:10]}).")
+            return
+
+        actualizadas = actualizar_ultimo_pronostico(None if options["all"] else ids, options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"{actualizadas} ubicaciones actualizadas."))
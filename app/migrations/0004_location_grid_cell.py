@@ -0,0 +1,55 @@
+# Generated by Django 5.2.7 on 2025-10-18 11:20
+
+from django.db import migrations, models
+
+
+def rellenar_celdas(apps, schema_editor):
+    # Importamos la función (no el modelo) para calcular la celda igual que Location.save()
+    from app.models import celda_de
+
+    Location = apps.get_model('app', 'Location')
+    ocupadas = set()
+    lote = []
+    for loc in Location.objects.order_by('pk').iterator(chunk_size=2000):
+        loc.grid_cell = celda_de(loc.latitude, loc.longitude)
+        # Si ya hay duplicados de predicción en una celda, solo el más antiguo la reclama
+        if loc.city.startswith('Predicción @') and loc.grid_cell not in ocupadas:
+            loc.prediction_cell = loc.grid_cell
+            ocupadas.add(loc.grid_cell)
+        lote.append(loc)
+        if len(lote) >= 2000:
+            Location.objects.bulk_update(lote, ['grid_cell', 'prediction_cell'])
+            lote = []
+    if lote:
+        Location.objects.bulk_update(lote, ['grid_cell', 'prediction_cell'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_dailyforecast_co_surface_conc_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='grid_cell',
+            field=models.BigIntegerField(editable=False, help_text='Celda de la malla de 0.01°', null=True),
+        ),
+        migrations.AddField(
+            model_name='location',
+            name='prediction_cell',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(rellenar_celdas, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='location',
+            name='grid_cell',
+            field=models.BigIntegerField(db_index=True, editable=False, help_text='Celda de la malla de 0.01°'),
+        ),
+        migrations.AlterField(
+            model_name='location',
+            name='prediction_cell',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2025-10-19 10:05
+
+from django.db import migrations, models
+
+
+def rellenar_search_key(apps, schema_editor):
+    # Misma normalización que Location.save()
+    from app.models import normalizar_busqueda
+
+    Location = apps.get_model('app', 'Location')
+    lote = []
+    for loc in Location.objects.order_by('pk').iterator(chunk_size=2000):
+        loc.search_key = normalizar_busqueda(loc.city)
+        lote.append(loc)
+        if len(lote) >= 2000:
+            Location.objects.bulk_update(lote, ['search_key'])
+            lote = []
+    if lote:
+        Location.objects.bulk_update(lote, ['search_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_location_grid_cell'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='search_key',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.RunPython(rellenar_search_key, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2025-10-20 09:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def rellenar_latest_forecast(apps, schema_editor):
+    Location = apps.get_model('app', 'Location')
+    DailyForecast = apps.get_model('app', 'DailyForecast')
+    ultimo = DailyForecast.objects.filter(location=models.OuterRef('pk')).order_by('-date', '-pk').values('pk')[:1]
+    Location.objects.update(latest_forecast=models.Subquery(ultimo))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_location_search_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='latest_forecast',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='app.dailyforecast'),
+        ),
+        migrations.RunPython(rellenar_latest_forecast, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2025-10-21 16:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_location_latest_forecast'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dailyforecast',
+            index=models.Index(fields=['date', 'id'], name='dailyforecast_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='favoritelocation',
+            index=models.Index(fields=['user', 'id'], name='favoritelocation_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hourlyforecast',
+            index=models.Index(fields=['time', 'id'], name='hourlyforecast_time_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='weatheralert',
+            index=models.Index(fields=['date', 'id'], name='weatheralert_date_id_idx'),
+        ),
+    ]
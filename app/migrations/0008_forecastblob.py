@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2025-10-22 11:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForecastBlob',
+            fields=[
+                ('daily_forecast', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='blob', serialize=False, to='app.dailyforecast')),
+                ('data', models.BinaryField()),
+            ],
+            options={
+                'verbose_name': 'Pronóstico Prerenderizado',
+                'verbose_name_plural': 'Pronósticos Prerenderizados',
+            },
+        ),
+    ]
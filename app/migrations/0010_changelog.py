@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2025-10-24 09:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('daily_forecasts', 'Pronóstico diario'), ('hourly_forecasts', 'Pronóstico por hora'), ('alerts', 'Alerta climática')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('location_id', models.BigIntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Cambio para Sincronización',
+                'verbose_name_plural': 'Cambios para Sincronización',
+                'indexes': [models.Index(fields=['location_id', 'id'], name='changelog_location_id_idx')],
+            },
+        ),
+    ]
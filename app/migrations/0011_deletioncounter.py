@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-17 04:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_changelog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletionCounter',
+            fields=[
+                ('model', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('deletions', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Contador de Borrados',
+                'verbose_name_plural': 'Contadores de Borrados',
+            },
+        ),
+    ]
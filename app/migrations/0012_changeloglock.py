@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 04:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_deletioncounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogLock',
+            fields=[
+                ('id', models.PositiveSmallIntegerField(primary_key=True, serialize=False)),
+            ],
+            options={
+                'verbose_name': 'Bloqueo del Registro de Cambios',
+                'verbose_name_plural': 'Bloqueos del Registro de Cambios',
+            },
+        ),
+    ]
@@ -0,0 +1,179 @@
+# app/model_registry.py
+
+import hashlib
+import os
+import pickle
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+
+# Carpeta donde viven los artefactos entrenados (*.pkl) que usa app/utils.py
+BASE_DIR = Path(__file__).resolve().parent.parent
+MODELOS_DIR = BASE_DIR / "data" / "app"
+
+# Cada cuántos segundos se vuelve a revisar (stat) un archivo ya cargado.
+# Con 0 se revisa en cada acceso.
+CHECK_INTERVAL = getattr(settings, "MODEL_REGISTRY_CHECK_INTERVAL", 2.0)
+
+
+def _cargar_pkl(path):
+    """Loader por defecto. joblib se importa aquí para que los motores sin PKL no lo necesiten."""
+    import joblib
+
+    return joblib.load(path)
+
+
+def _hash_archivo(path):
+    """Calcula el SHA-256 del contenido del archivo en bloques de 1 MB."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloque in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def _estimar_memoria(modelo):
+    """
+    Estima los bytes que ocupa un modelo en memoria.
+    Para XGBoost el árbol vive en C++, así que se mide su serialización nativa.
+    """
+    try:
+        if hasattr(modelo, "get_booster"):
+            return len(modelo.get_booster().save_raw(raw_format="ubj"))
+        if hasattr(modelo, "nbytes"):
+            return int(modelo.nbytes)
+        return len(pickle.dumps(modelo, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return None
+
+
+class _Entrada:
+    """Artefacto cargado junto con la huella del archivo del que salió."""
+
+    __slots__ = ("modelo", "mtime", "size", "sha256", "load_seconds", "memory_bytes", "loaded_at", "checked_at")
+
+    def __init__(self, modelo, stat, sha256, load_seconds):
+        self.modelo = modelo
+        self.mtime = stat.st_mtime_ns
+        self.size = stat.st_size
+        self.sha256 = sha256
+        self.load_seconds = load_seconds
+        self.memory_bytes = _estimar_memoria(modelo)
+        self.loaded_at = time.time()
+        self.checked_at = time.monotonic()
+
+
+class ModelRegistry:
+    """
+    Registro de modelos por proceso: cada artefacto se carga una sola vez y se
+    sirve desde memoria. Solo se recarga si cambia el mtime/tamaño del archivo
+    y además su hash de contenido es distinto.
+    """
+
+    def __init__(self, loader=_cargar_pkl, check_interval=CHECK_INTERVAL):
+        self._loader = loader
+        self._check_interval = check_interval
+        self._entradas = {}
+        self._lock = threading.RLock()
+        self.reloads = 0
+        self._huella = None
+        self._huella_checked_at = 0.0
+
+    def get(self, path, loader=None):
+        """
+        Devuelve el modelo de `path`. Lanza FileNotFoundError si no existe.
+        `loader` permite cargar otros formatos (p. ej. boosters nativos .ubj).
+        """
+        path = Path(path)
+        key = str(path)
+        entrada = self._entradas.get(key)
+
+        # Camino rápido: ya cargado y revisado hace poco
+        if entrada is not None and time.monotonic() - entrada.checked_at < self._check_interval:
+            return entrada.modelo
+
+        with self._lock:
+            entrada = self._entradas.get(key)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                self._entradas.pop(key, None)
+                raise
+
+            if entrada is not None:
+                if entrada.mtime == stat.st_mtime_ns and entrada.size == stat.st_size:
+                    entrada.checked_at = time.monotonic()
+                    return entrada.modelo
+                # El archivo se tocó: solo recargamos si el contenido cambió de verdad
+                sha256 = _hash_archivo(path)
+                if sha256 == entrada.sha256:
+                    entrada.mtime = stat.st_mtime_ns
+                    entrada.size = stat.st_size
+                    entrada.checked_at = time.monotonic()
+                    return entrada.modelo
+                self.reloads += 1
+            else:
+                sha256 = _hash_archivo(path)
+
+            inicio = time.perf_counter()
+            modelo = (loader or self._loader)(path)
+            entrada = _Entrada(modelo, stat, sha256, time.perf_counter() - inicio)
+            self._entradas[key] = entrada
+            return modelo
+
+    def precargar(self, patron="*.pkl", carpeta=MODELOS_DIR):
+        """Carga de una vez todos los artefactos de la carpeta (arranque del worker)."""
+        for path in sorted(Path(carpeta).glob(patron)):
+            self.get(path)
+        return self.stats()
+
+    def version(self):
+        """Huella combinada de todos los artefactos cargados (cambia si cambia cualquiera)."""
+        h = hashlib.sha256()
+        for key in sorted(self._entradas):
+            h.update(key.encode())
+            h.update(self._entradas[key].sha256.encode())
+        return h.hexdigest()[:16]
+
+    def version_artefactos(self, carpeta=MODELOS_DIR):
+        """
+        Huella (mtime + tamaño) de todos los artefactos de la carpeta, sin cargarlos.
+        Sirve para invalidar cachés de predicciones aunque no se toque ningún modelo.
+        Se recalcula como mucho una vez por `check_interval`.
+        """
+        ahora = time.monotonic()
+        if self._huella is not None and ahora - self._huella_checked_at < self._check_interval:
+            return self._huella
+
+        h = hashlib.sha256()
+        for path in sorted(Path(carpeta).iterdir()):
+            if path.suffix in (".pkl", ".ubj", ".npz"):
+                stat = path.stat()
+                h.update(f"{path.name}:{stat.st_mtime_ns}:{stat.st_size};".encode())
+        self._huella = h.hexdigest()[:16]
+        self._huella_checked_at = ahora
+        return self._huella
+
+    def stats(self):
+        """Tiempos de carga y memoria estimada por modelo."""
+        return {
+            Path(key).name: {
+                "load_seconds": entrada.load_seconds,
+                "memory_bytes": entrada.memory_bytes,
+                "file_bytes": entrada.size,
+                "sha256": entrada.sha256,
+                "loaded_at": entrada.loaded_at,
+            }
+            for key, entrada in sorted(self._entradas.items())
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entradas.clear()
+
+
+# Instancia única por proceso (cada worker de gunicorn tiene la suya)
+registry = ModelRegistry()
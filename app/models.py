@@ -3,13 +3,46 @@
 from django.db import models
 from django.utils import timezone
 from django.contrib.auth.models import User # Necesario para FavoriteLocation
+import unicodedata
 from datetime import time
+from decimal import Decimal, ROUND_FLOOR
 
 # Configuración de precisión para los nuevos campos científicos
 # Usamos 12 dígitos en total, 6 después del punto decimal.
 DECIMAL_PRECISION = 12
 DECIMAL_PLACES = 6
 
+# Malla fija para indexar ubicaciones: celdas de GRID_CELL_DEG grados (≈ 1.1 km en latitud)
+GRID_CELL_DEG = Decimal('0.01')
+GRID_COLUMNS = int(360 / GRID_CELL_DEG)
+GRID_ROWS = int(180 / GRID_CELL_DEG) + 1
+
+
+def celda_de(latitude, longitude):
+    """Id entero de la celda de la malla fija que contiene (latitude, longitude)."""
+    fila = int(((Decimal(str(latitude)) + 90) / GRID_CELL_DEG).to_integral_value(rounding=ROUND_FLOOR))
+    columna = int(((Decimal(str(longitude)) + 180) / GRID_CELL_DEG).to_integral_value(rounding=ROUND_FLOOR))
+    return min(max(fila, 0), GRID_ROWS - 1) * GRID_COLUMNS + columna % GRID_COLUMNS
+
+
+def celdas_vecinas(latitude, longitude, anillos=1):
+    """La celda de (latitude, longitude) y las de los `anillos` alrededor (con vuelta en el antimeridiano)."""
+    celda = celda_de(latitude, longitude)
+    fila, columna = divmod(celda, GRID_COLUMNS)
+    return {
+        f * GRID_COLUMNS + (columna + dc) % GRID_COLUMNS
+        for f in range(max(fila - anillos, 0), min(fila + anillos, GRID_ROWS - 1) + 1)
+        for dc in range(-anillos, anillos + 1)
+    }
+
+
+
+def normalizar_busqueda(texto):
+    """Llave de búsqueda: sin acentos, en minúsculas y con los espacios colapsados ("España" -> "espana")."""
+    descompuesto = unicodedata.normalize('NFKD', texto or '')
+    sin_acentos = ''.join(c for c in descompuesto if not unicodedata.combining(c))
+    return ' '.join(sin_acentos.casefold().split())
+
 # ==============================================================================
 # 1. Modelo Location (Ubicación)
 # ==============================================================================
@@ -26,6 +59,30 @@ class Location(models.Model):
     latitude = models.DecimalField(max_digits=9, decimal_places=6)
     longitude = models.DecimalField(max_digits=9, decimal_places=6)
 
+    # Celda de la malla fija (ver celda_de); se calcula al guardar
+    grid_cell = models.BigIntegerField(db_index=True, editable=False, help_text="Celda de la malla de 0.01°")
+    # Solo en ubicaciones creadas por el modelo predictivo: única, para que dos escritores
+    # concurrentes no puedan crear dos "Predicción @ ..." en la misma celda
+    prediction_cell = models.BigIntegerField(null=True, blank=True, unique=True, editable=False)
+
+    # Nombre normalizado (ver normalizar_busqueda); indexado para búsquedas exactas y por prefijo
+    search_key = models.CharField(max_length=100, db_index=True, editable=False, default='')
+
+    # Pronóstico más reciente (mayor fecha) de esta ubicación, desnormalizado para las vistas de
+    # clima; lo mantienen las señales de DailyForecast y los escritores masivos (ver actualizar_ultimo_pronostico)
+    latest_forecast = models.ForeignKey(
+        'DailyForecast', null=True, blank=True, on_delete=models.SET_NULL, related_name='+', editable=False
+    )
+
+    # Última modificación de la fila (no cambia al mover latest_forecast: las vistas de clima usan
+    # el id y el updated_at del pronóstico); ETag / Last-Modified y firma_ubicaciones()
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def save(self, *args, **kwargs):
+        self.grid_cell = celda_de(self.latitude, self.longitude)
+        self.search_key = normalizar_busqueda(self.city)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.city}, {self.state_province}"
 
@@ -34,6 +91,17 @@ class Location(models.Model):
         verbose_name_plural = "Ubicaciones"
         unique_together = ('latitude', 'longitude')
 
+
+def firma_ubicaciones():
+    """
+    Versión de la tabla Location para los índices en memoria de cada proceso (app/spatial.py,
+    app/search.py): mayor id, mayor updated_at (MAX sobre índices, sin contar filas) y borrados
+    (DeletionCounter). El id cubre las altas; updated_at, los cambios de coordenadas o nombre;
+    el contador, las bajas.
+    """
+    version = Location.objects.aggregate(max_pk=models.Max('pk'), ultimo=models.Max('updated_at'))
+    return (version['max_pk'], version['ultimo'], borrados_de(Location))
+
 # ==============================================================================
 # 2. Modelo DailyForecast (Pronóstico Diario)
 # ==============================================================================
@@ -68,6 +136,10 @@ class DailyForecast(models.Model):
     sunrise = models.TimeField(default=time(6, 0)) # Añadimos default para el script de ML
     sunset = models.TimeField(default=time(18, 0)) # Añadimos default para el script de ML
     summary = models.TextField(blank=True, null=True, help_text="Resumen del día")
+
+    # Última modificación del pronóstico o de sus horas y alertas (las señales lo avanzan al
+    # escribir un detalle); ETag / Last-Modified de la API
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     # ----------------------------------------------------------------------
     # Nuevos Campos: Variables Físicas del Modelo Predictivo
@@ -96,6 +168,32 @@ class DailyForecast(models.Model):
         verbose_name = "Pronóstico Diario"
         verbose_name_plural = "Pronósticos Diarios"
         unique_together = ('location', 'date')
+        # Orden de la paginación por cursor de /pronosticos-diarios/ (-date, -id)
+        indexes = [models.Index(fields=['date', 'id'], name='dailyforecast_date_id_idx')]
+
+
+def marcar_pronosticos_modificados(forecast_ids):
+    """Avanza updated_at de los DailyForecast de `forecast_ids` (al escribir sus horas o alertas)."""
+    return DailyForecast.objects.filter(pk__in=list(forecast_ids)).update(updated_at=timezone.now())
+
+
+def actualizar_ultimo_pronostico(location_ids=None, tamano_bloque=1000):
+    """
+    Recalcula Location.latest_forecast con un UPDATE por bloque (subconsulta correlacionada
+    por la mayor fecha). No toca updated_at: mover el puntero no cambia la Location, y así cada
+    escritura de pronósticos no invalida los índices en memoria (firma_ubicaciones). Sin
+    location_ids recorre todas las ubicaciones.
+    """
+    ultimo = DailyForecast.objects.filter(location=models.OuterRef('pk')).order_by('-date', '-pk').values('pk')[:1]
+    if location_ids is None:
+        location_ids = Location.objects.order_by('pk').values_list('pk', flat=True)
+    ids = list(location_ids)
+    actualizadas = 0
+    for i in range(0, len(ids), tamano_bloque):
+        actualizadas += Location.objects.filter(pk__in=ids[i:i + tamano_bloque]).update(
+            latest_forecast=models.Subquery(ultimo)
+        )
+    return actualizadas
 
 # ==============================================================================
 # 3. Modelo HourlyForecast (Pronóstico por Hora)
@@ -109,6 +207,7 @@ class HourlyForecast(models.Model):
     temperature = models.DecimalField(max_digits=4, decimal_places=1)
     condition = models.CharField(max_length=100, help_text="Ej: Partly cloudy")
     precipitation_perc = models.IntegerField(help_text="Precipitación en %")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return f"{self.daily_forecast.location.city} - {self.daily_forecast.date} @ {self.time.strftime('%H:%M')}"
@@ -117,6 +216,8 @@ class HourlyForecast(models.Model):
         verbose_name = "Pronóstico por Hora"
         verbose_name_plural = "Pronósticos por Hora"
         unique_together = ('daily_forecast', 'time')
+        # Orden de la paginación por cursor de /pronosticos-horarios/ (time, id)
+        indexes = [models.Index(fields=['time', 'id'], name='hourlyforecast_time_id_idx')]
 
 # ==============================================================================
 # 4. Modelo WeatherAlert (Alertas/Cuidado)
@@ -131,6 +232,7 @@ class WeatherAlert(models.Model):
     date = models.DateField(help_text="Fecha de la alerta (Ej: Sep 12)")
     details = models.CharField(max_length=100, help_text="Ej: ssw 11 km/h")
     probability = models.IntegerField(help_text="Probabilidad de ocurrencia en % (Ej: 30%, 80%)")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return f"Alerta {self.type} - {self.daily_forecast.location.city}"
@@ -138,6 +240,8 @@ class WeatherAlert(models.Model):
     class Meta:
         verbose_name = "Alerta Climática"
         verbose_name_plural = "Alertas Climáticas"
+        # Orden de la paginación por cursor de /alertas/ (-date, -id)
+        indexes = [models.Index(fields=['date', 'id'], name='weatheralert_date_id_idx')]
 
 
 # ==============================================================================
@@ -156,4 +260,108 @@ class FavoriteLocation(models.Model):
     class Meta:
         verbose_name = "Ubicación Favorita"
         verbose_name_plural = "Ubicaciones Favoritas"
-        unique_together = ('user', 'location')
\ No newline at end of file
+        unique_together = ('user', 'location')
+        # Favoritos de un usuario paginados por id
+        indexes = [models.Index(fields=['user', 'id'], name='favoritelocation_user_id_idx')]
+
+
+# ==============================================================================
+# 6. Modelo ForecastBlob (JSON prerenderizado de un DailyForecast)
+# ==============================================================================
+
+class ForecastBlob(models.Model):
+    """
+    Respuesta de DailyForecastSerializer (con horas y alertas) ya renderizada a JSON y
+    comprimida con zlib. Se reescribe al guardar el pronóstico o sus detalles
+    (app/forecast_blobs.py) y las vistas de clima actual la devuelven tal cual.
+    """
+
+    daily_forecast = models.OneToOneField(DailyForecast, on_delete=models.CASCADE, primary_key=True, related_name='blob')
+    data = models.BinaryField()
+
+    def __str__(self):
+        return f"JSON del pronóstico {self.daily_forecast_id}"
+
+    class Meta:
+        verbose_name = "Pronóstico Prerenderizado"
+        verbose_name_plural = "Pronósticos Prerenderizados"
+
+# ==============================================================================
+# 7. Modelo ChangeLog (Registro de cambios para /api/sync/)
+# ==============================================================================
+
+class ChangeLog(models.Model):
+    """
+    Una fila por escritura o borrado de un DailyForecast, HourlyForecast o WeatherAlert, en
+    orden de id: /api/sync/ entrega a cada cliente lo que cambió después de su marca (app/sync.py).
+    La ubicación se guarda sin FK para que las lápidas sobrevivan al borrado de la Location.
+    """
+
+    DAILY = 'daily_forecasts'
+    HOURLY = 'hourly_forecasts'
+    ALERT = 'alerts'
+    KINDS = [(DAILY, 'Pronóstico diario'), (HOURLY, 'Pronóstico por hora'), (ALERT, 'Alerta climática')]
+
+    kind = models.CharField(max_length=20, choices=KINDS)
+    object_id = models.BigIntegerField()
+    location_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{'Borrado' if self.deleted else 'Cambio'} de {self.kind} {self.object_id}"
+
+    class Meta:
+        verbose_name = "Cambio para Sincronización"
+        verbose_name_plural = "Cambios para Sincronización"
+        # Cambios de las ubicaciones favoritas de un usuario después de su marca
+        indexes = [models.Index(fields=['location_id', 'id'], name='changelog_location_id_idx')]
+
+
+class ChangeLogLock(models.Model):
+    """
+    Fila única que se bloquea (SELECT ... FOR UPDATE) mientras se insertan y confirman filas de
+    ChangeLog (app/sync.py): dos inserciones no se solapan, así los ids confirman en orden y un
+    id visible garantiza que todos los menores ya lo son. Sin datos propios.
+    """
+
+    id = models.PositiveSmallIntegerField(primary_key=True)
+
+    class Meta:
+        verbose_name = "Bloqueo del Registro de Cambios"
+        verbose_name_plural = "Bloqueos del Registro de Cambios"
+
+# ==============================================================================
+# 8. Modelo DeletionCounter (Borrados por modelo para los GET condicionales)
+# ==============================================================================
+
+class DeletionCounter(models.Model):
+    """
+    Cuántas filas de cada modelo se han borrado. El mayor id y el mayor updated_at de un
+    listado no cambian cuando falta una fila: ConditionalGetMixin suma este contador a la
+    versión en lugar de contar las filas. Lo incrementa la señal post_delete de cada modelo.
+    """
+
+    model = models.CharField(max_length=100, primary_key=True)  # app_label.modelo
+    deletions = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.deletions} borrados de {self.model}"
+
+    class Meta:
+        verbose_name = "Contador de Borrados"
+        verbose_name_plural = "Contadores de Borrados"
+
+
+def contar_borrado(modelo):
+    """Suma un borrado al contador de `modelo` (crea su fila la primera vez)."""
+    etiqueta = modelo._meta.label_lower
+    filas = DeletionCounter.objects.filter(pk=etiqueta)
+    if not filas.update(deletions=models.F('deletions') + 1):
+        DeletionCounter.objects.get_or_create(pk=etiqueta)
+        filas.update(deletions=models.F('deletions') + 1)
+
+
+def borrados_de(modelo):
+    """Borrados registrados de `modelo` (0 si nunca se borró ninguno)."""
+    return DeletionCounter.objects.filter(pk=modelo._meta.label_lower).values_list('deletions', flat=True).first() or 0
@@ -0,0 +1,83 @@
+# app/native_models.py
+
+import json
+import threading
+from pathlib import Path
+
+import numpy as np
+
+
+# Extensión de los artefactos nativos exportados junto a cada .pkl
+EXTENSION_NATIVA = ".ubj"
+
+
+class NativeModel:
+    """
+    Booster de XGBoost cargado desde su formato nativo (UBJSON).
+    El orden de las features se fija al cargar; cada predicción llena un buffer
+    float32 preasignado (por hilo) y llama a inplace_predict, sin pandas.
+    """
+
+    def __init__(self, booster):
+        self.booster = booster
+        self.feature_names = list(booster.feature_names)
+        classes = booster.attr("classes")
+        self.classes = json.loads(classes) if classes is not None else None
+        # Regresor multisalida: nombres de las variables objetivo, en el orden de las columnas de salida
+        targets = booster.attr("targets")
+        self.targets = json.loads(targets) if targets is not None else None
+        self._local = threading.local()
+
+    def get_booster(self):
+        return self.booster
+
+    def _buffer(self, n):
+        buf = getattr(self._local, "buf", None)
+        if buf is None or buf.shape[0] < n:
+            buf = np.empty((max(n, 1), len(self.feature_names)), dtype=np.float32)
+            self._local.buf = buf
+        return buf[:n]
+
+    def predict(self, columnas):
+        """
+        `columnas` es un dict nombre -> array (todas del mismo largo).
+        Para clasificadores devuelve el índice de la clase (como XGBClassifier.predict).
+        """
+        n = len(columnas[self.feature_names[0]])
+        X = self._buffer(n)
+        for k, nombre in enumerate(self.feature_names):
+            X[:, k] = columnas[nombre]
+
+        salida = self.booster.inplace_predict(X, validate_features=False)
+        if self.classes is not None:
+            if salida.ndim == 2:
+                return np.argmax(salida, axis=1)
+            return (salida > 0.5).astype(int)
+        return salida
+
+
+def cargar_nativo(path):
+    """Loader para el registro de modelos: lee un booster .ubj/.json."""
+    import xgboost as xgb
+
+    booster = xgb.Booster()
+    booster.load_model(str(path))
+    return NativeModel(booster)
+
+
+def exportar_nativo(pkl_path):
+    """
+    Exporta el booster de un .pkl de XGBoost a formato nativo (mismo nombre, .ubj).
+    Para clasificadores guarda también `classes_` como atributo del booster.
+    """
+    import joblib
+
+    pkl_path = Path(pkl_path)
+    modelo = joblib.load(pkl_path)
+    booster = modelo.get_booster().copy()
+    if hasattr(modelo, "classes_"):
+        booster.set_attr(classes=json.dumps(np.asarray(modelo.classes_).tolist()))
+
+    destino = pkl_path.with_suffix(EXTENSION_NATIVA)
+    booster.save_model(str(destino))
+    return destino
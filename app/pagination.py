@@ -0,0 +1,113 @@
+# app/pagination.py
+
+import base64
+import json
+from functools import reduce
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación por cursor (keyset) sobre un orden estable de varias columnas, por ejemplo
+    ('-date', '-id'). El cursor guarda los valores de la última fila entregada y la página
+    siguiente se pide con WHERE (date, id) < (d, i), que con el índice correspondiente
+    cuesta lo mismo en la página 1 que en la 10 000 (no hay OFFSET ni COUNT).
+    La última columna del orden debe ser única (normalmente el id).
+    """
+
+    ordering = ('-id',)
+    page_size = getattr(settings, 'API_PAGE_SIZE', 100)
+    max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 1000)
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Cursor inválido.'
+
+    def _campos(self):
+        return [(campo.lstrip('-'), campo.startswith('-')) for campo in self.ordering]
+
+    def _tamano(self, request):
+        try:
+            tamano = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(tamano, self.max_page_size))
+
+    def _codificar(self, fila):
+        valores = [getattr(fila, nombre) for nombre, _ in self._campos()]
+        crudo = json.dumps([v.isoformat() if hasattr(v, 'isoformat') else v for v in valores], default=str)
+        return base64.urlsafe_b64encode(crudo.encode()).decode().rstrip('=')
+
+    def _decodificar(self, cursor, modelo):
+        try:
+            crudo = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            valores = json.loads(crudo)
+            campos = self._campos()
+            if len(valores) != len(campos):
+                raise ValueError
+            return [modelo._meta.get_field(nombre).to_python(v) for (nombre, _), v in zip(campos, valores)]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def _despues_de(self, valores):
+        # (a, b, c) "después de" (va, vb, vc): a > va, o a = va y b > vb, o ... (según la dirección de cada columna)
+        condiciones = []
+        campos = self._campos()
+        for i, ((nombre, desc), valor) in enumerate(zip(campos, valores)):
+            iguales = {campo: v for (campo, _), v in zip(campos[:i], valores[:i])}
+            condiciones.append(Q(**iguales, **{f"{nombre}__{'lt' if desc else 'gt'}": valor}))
+        return reduce(lambda a, b: a | b, condiciones)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        tamano = self._tamano(request)
+        queryset = queryset.order_by(*self.ordering)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(self._despues_de(self._decodificar(cursor, queryset.model)))
+
+        # Una fila de más indica si hay página siguiente sin hacer COUNT
+        filas = list(queryset[:tamano + 1])
+        self.siguiente = self._codificar(filas[tamano - 1]) if len(filas) > tamano else None
+        return filas[:tamano]
+
+    def get_next_link(self):
+        if self.siguiente is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.siguiente)
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+# Órdenes estables por recurso (cada uno con su índice en app/models.py)
+
+class FechaDescPagination(KeysetPagination):
+    """Pronósticos diarios y alertas: lo más reciente primero."""
+    ordering = ('-date', '-id')
+
+
+class HoraPagination(KeysetPagination):
+    """Pronósticos por hora en orden cronológico."""
+    ordering = ('time', 'id')
+
+
+class IdPagination(KeysetPagination):
+    """Recursos sin fecha (ubicaciones, favoritos): por orden de alta."""
+    ordering = ('id',)
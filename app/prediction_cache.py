@@ -0,0 +1,112 @@
+# app/prediction_cache.py
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class PredictionCache:
+    """
+    Caché LRU + TTL en memoria del proceso para resultados de predicción.
+    Opcionalmente escribe/lee también en un backend compartido del framework de
+    caché de Django (`alias`), para que todos los workers reutilicen las entradas.
+    Las llaves incluyen la versión del modelo, así que al cambiar un artefacto las
+    entradas viejas dejan de servirse.
+    """
+
+    def __init__(self, max_entries=10_000, ttl=3600, alias=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.alias = alias
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.shared_hits = 0
+
+    def _compartida(self):
+        if not self.alias:
+            return None
+        from django.core.cache import caches
+
+        return caches[self.alias]
+
+    def _revisar_version(self, version):
+        # Si cambió la versión del modelo, lo guardado localmente ya no sirve: liberamos memoria
+        if version != self._version:
+            self.evictions += len(self._datos)
+            self._datos.clear()
+            self._version = version
+
+    def get(self, key, version):
+        with self._lock:
+            self._revisar_version(version)
+            entrada = self._datos.get(key)
+            if entrada is not None:
+                valor, expira = entrada
+                if expira > time.monotonic():
+                    self._datos.move_to_end(key)
+                    self.hits += 1
+                    return valor
+                del self._datos[key]
+                self.expirations += 1
+
+        compartida = self._compartida()
+        if compartida is not None:
+            valor = compartida.get(f"pred:{version}:{key}")
+            if valor is not None:
+                with self._lock:
+                    self.hits += 1
+                    self.shared_hits += 1
+                self._guardar_local(key, valor)
+                return valor
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, version, valor):
+        with self._lock:
+            self._revisar_version(version)
+        self._guardar_local(key, valor)
+        compartida = self._compartida()
+        if compartida is not None:
+            compartida.set(f"pred:{version}:{key}", valor, timeout=self.ttl)
+
+    def _guardar_local(self, key, valor):
+        with self._lock:
+            self._datos[key] = (valor, time.monotonic() + self.ttl)
+            self._datos.move_to_end(key)
+            while len(self._datos) > self.max_entries:
+                self._datos.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._datos.clear()
+
+    def stats(self):
+        consultas = self.hits + self.misses
+        return {
+            "entries": len(self._datos),
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / consultas if consultas else 0.0,
+            "model_version": self._version,
+        }
+
+
+# Instancia por proceso configurada desde settings
+prediction_cache = PredictionCache(
+    max_entries=getattr(settings, "PREDICTION_CACHE_MAX_ENTRIES", 10_000),
+    ttl=getattr(settings, "PREDICTION_CACHE_TTL", 3600),
+    alias=getattr(settings, "PREDICTION_CACHE_ALIAS", None),
+)
@@ -0,0 +1,278 @@
+# app/search.py
+
+import bisect
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db.models.functions import Length
+
+from app.models import Location, firma_ubicaciones, normalizar_busqueda
+
+
+# Segundos entre revisiones de cambios en Location hechos por otros procesos
+SEARCH_INDEX_TTL = getattr(settings, "SEARCH_INDEX_TTL", 60)
+
+# Sugerencias que guarda cada nodo del trie (tope de ?limit= en el autocompletado)
+AUTOCOMPLETE_MAX = getattr(settings, "AUTOCOMPLETE_MAX", 10)
+
+# Niveles de coincidencia: el orden en que se devuelven los resultados
+EXACTA, PREFIJO, PALABRA = 0, 1, 2
+
+# Similitud mínima (Jaccard de trigramas, como pg_trgm) para aceptar una ciudad parecida
+FUZZY_MIN_SIMILARITY = getattr(settings, "FUZZY_MIN_SIMILARITY", 0.3)
+
+# Peso del estado/país ("Monterrey, N.L.") al desempatar ciudades igual de parecidas
+PESO_CONTEXTO = 0.25
+
+# Candidatas (por similitud del nombre) a las que se les compara el estado/país
+CANDIDATAS_CONTEXTO = 50
+
+
+class _Nodo:
+    __slots__ = ("hijos", "top")
+
+    def __init__(self):
+        self.hijos = {}
+        self.top = []   # (nivel, largo, llave, pk) ordenados, a lo sumo AUTOCOMPLETE_MAX
+
+
+class CityTrie:
+    """
+    Trie de prefijos sobre Location.search_key. Cada nodo guarda ya ordenadas sus mejores
+    sugerencias, así que una consulta solo recorre len(q) nodos. Además del nombre completo
+    se inserta desde el inicio de cada palabra ("san pedro" se encuentra con "ped").
+    Las Location creadas por el modelo predictivo no se indexan.
+    """
+
+    def __init__(self, filas):
+        self._lock = threading.Lock()
+        self.raiz = _Nodo()
+        self.datos = {}  # pk -> dict con los campos de la respuesta
+        self.firma = None
+        self.checked_at = time.monotonic()
+        for fila in filas:
+            self._insertar(fila)
+
+    @classmethod
+    def desde_db(cls):
+        filas = (
+            Location.objects.filter(prediction_cell__isnull=True)
+            .values("pk", "city", "state_province", "country", "latitude", "longitude", "search_key")
+        )
+        trie = cls(filas)
+        trie.firma = firma_ubicaciones()
+        return trie
+
+    def __len__(self):
+        return len(self.datos)
+
+    def _insertar(self, fila):
+        llave = fila["search_key"] or normalizar_busqueda(fila["city"])
+        pk = fila["pk"]
+        self.datos[pk] = {k: v for k, v in fila.items() if k not in ("pk", "search_key")} | {"id": pk}
+
+        inicios = [0] + [i + 1 for i, c in enumerate(llave) if c == " "]
+        for inicio in inicios:
+            entrada = (PREFIJO if inicio == 0 else PALABRA, len(llave), llave, pk)
+            nodo = self.raiz
+            for c in llave[inicio:]:
+                nodo = nodo.hijos.setdefault(c, _Nodo())
+                if len(nodo.top) < AUTOCOMPLETE_MAX or entrada < nodo.top[-1]:
+                    bisect.insort(nodo.top, entrada)
+                    del nodo.top[AUTOCOMPLETE_MAX:]
+
+    def insertar(self, fila):
+        with self._lock:
+            self._insertar(fila)
+
+    def sugerencias(self, q, limit=AUTOCOMPLETE_MAX):
+        """Hasta `limit` Location cuyo nombre (o alguna palabra) empieza por q: exactas, prefijo, palabra."""
+        q = normalizar_busqueda(q)
+        if not q:
+            return []
+        with self._lock:
+            nodo = self.raiz
+            for c in q:
+                nodo = nodo.hijos.get(c)
+                if nodo is None:
+                    return []
+            resultado, vistos = [], set()
+            for nivel, _, llave, pk in nodo.top:
+                # Un pk puede estar dos veces (nombre completo y palabra); cuenta la mejor
+                if pk in vistos or pk not in self.datos:
+                    continue
+                vistos.add(pk)
+                match = EXACTA if nivel == PREFIJO and llave == q else nivel
+                resultado.append(self.datos[pk] | {"match": ("exact", "prefix", "word")[match]})
+                if len(resultado) == limit:
+                    break
+        return resultado
+
+    def quitar(self, pk):
+        # Basta con olvidar sus datos: las entradas que queden en el trie se saltan
+        with self._lock:
+            self.datos.pop(pk, None)
+
+
+_trie = None
+_trie_lock = threading.Lock()
+
+
+def get_city_trie():
+    """Trie del proceso; se construye en el primer uso y se revalida cada SEARCH_INDEX_TTL segundos."""
+    global _trie
+    trie = _trie
+    if trie is not None and time.monotonic() - trie.checked_at < SEARCH_INDEX_TTL:
+        return trie
+
+    with _trie_lock:
+        if _trie is None or firma_ubicaciones() != _trie.firma:
+            _trie = CityTrie.desde_db()
+        _trie.checked_at = time.monotonic()
+        return _trie
+
+
+def invalidar_city_trie():
+    global _trie
+    _trie = None
+
+
+def trie_construido():
+    return _trie
+
+
+def trigramas(texto):
+    """Trigramas de cada palabra con relleno ("  tokio " -> "  t", " to", "tok", ...), como pg_trgm."""
+    resultado = set()
+    for palabra in texto.split():
+        p = f"  {palabra} "
+        resultado.update(p[i:i + 3] for i in range(len(p) - 2))
+    return resultado
+
+
+def _similitud(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class TrigramIndex:
+    """
+    Índice invertido trigrama -> filas (arrays de NumPy) sobre Location.search_key para
+    encontrar ciudades mal escritas. Una consulta junta las listas de sus trigramas y
+    cuenta coincidencias por fila con np.bincount (vectorizado, sin bucles en Python) y
+    solo calcula la similitud de las filas que pueden superar el umbral.
+    """
+
+    def __init__(self, filas):
+        pks, tamanos, contextos, listas = [], [], [], {}
+        for fila in filas:
+            tris = trigramas(fila["search_key"] or normalizar_busqueda(fila["city"]))
+            i = len(pks)
+            pks.append(fila["pk"])
+            tamanos.append(len(tris))
+            contextos.append(normalizar_busqueda(f"{fila['state_province'] or ''} {fila['country'] or ''}"))
+            for t in tris:
+                listas.setdefault(t, []).append(i)
+
+        self.pks = np.array(pks, dtype=np.int64)
+        self.tamanos = np.array(tamanos, dtype=np.int32)
+        self.contextos = contextos
+        self.listas = {t: np.array(filas_t, dtype=np.int32) for t, filas_t in listas.items()}
+        self.firma = None
+        self.checked_at = time.monotonic()
+
+    @classmethod
+    def desde_db(cls):
+        indice = cls(Location.objects.filter(prediction_cell__isnull=True).values(
+            "pk", "city", "state_province", "country", "search_key"
+        ))
+        indice.firma = firma_ubicaciones()
+        return indice
+
+    def __len__(self):
+        return len(self.pks)
+
+    def buscar(self, texto, limit=5, umbral=FUZZY_MIN_SIMILARITY):
+        """
+        Las `limit` Location más parecidas a `texto`: lista de (pk, similitud) por encima
+        del umbral. Lo que venga después de una coma ("Monterey, Mexico") se compara con
+        el estado y el país de las candidatas para desempatar.
+        """
+        nombre, _, contexto = texto.partition(",")
+        contexto = contexto.strip()
+        tris = trigramas(normalizar_busqueda(nombre))
+        listas = [self.listas[t] for t in tris if t in self.listas]
+        if not listas:
+            return []
+
+        # Trigramas en común por fila; con similitud >= umbral hacen falta al menos umbral·|q|
+        comunes = np.bincount(np.concatenate(listas), minlength=len(self.pks))
+        filas = np.flatnonzero(comunes >= max(1, int(np.ceil(umbral * len(tris)))))
+        comunes = comunes[filas]
+        similitud = comunes / (len(tris) + self.tamanos[filas] - comunes)
+        validas = similitud >= umbral
+        filas, similitud = filas[validas], similitud[validas]
+        if not len(filas):
+            return []
+
+        orden = np.argsort(-similitud, kind="stable")[:CANDIDATAS_CONTEXTO if contexto else limit]
+        filas, similitud = filas[orden], similitud[orden]
+        puntaje = similitud.copy()
+        if contexto:
+            tris_contexto = trigramas(normalizar_busqueda(contexto))
+            puntaje += PESO_CONTEXTO * np.array([_similitud(tris_contexto, trigramas(self.contextos[i])) for i in filas])
+        mejores = np.argsort(-puntaje, kind="stable")[:limit]
+        return [(int(self.pks[filas[i]]), float(similitud[i])) for i in mejores]
+
+
+_trigramas = None
+_trigramas_lock = threading.Lock()
+
+
+def get_trigram_index():
+    """Índice de trigramas del proceso; mismo ciclo de vida que el trie (SEARCH_INDEX_TTL)."""
+    global _trigramas
+    indice = _trigramas
+    if indice is not None and time.monotonic() - indice.checked_at < SEARCH_INDEX_TTL:
+        return indice
+
+    with _trigramas_lock:
+        if _trigramas is None or firma_ubicaciones() != _trigramas.firma:
+            _trigramas = TrigramIndex.desde_db()
+        _trigramas.checked_at = time.monotonic()
+        return _trigramas
+
+
+def invalidar_trigram_index():
+    global _trigramas
+    _trigramas = None
+
+
+def ciudad_parecida(nombre, queryset=None):
+    """(Location, similitud) de la ciudad más parecida a `nombre` por trigramas, o (None, None)."""
+    encontrados = get_trigram_index().buscar(nombre, limit=1)
+    if not encontrados:
+        return None, None
+    pk, similitud = encontrados[0]
+    return (Location.objects if queryset is None else queryset).filter(pk=pk).first(), similitud
+
+
+def buscar_ciudad(nombre, queryset=None):
+    """
+    Location para un nombre de ciudad, sin importar acentos ni mayúsculas. Primero la
+    coincidencia exacta y luego por prefijo (ambas sobre el índice de search_key); solo
+    si no hay ninguna se recurre a la búsqueda por subcadena, que recorre la tabla.
+    Entre varias del mismo nivel gana el nombre más corto.
+    """
+    llave = normalizar_busqueda(nombre)
+    if not llave:
+        return None
+    ubicaciones = (Location.objects if queryset is None else queryset).order_by(Length("search_key"), "search_key", "pk")
+    return (
+        ubicaciones.filter(search_key=llave).first()
+        or ubicaciones.filter(search_key__startswith=llave).first()
+        or ubicaciones.filter(search_key__contains=llave).first()
+    )
@@ -6,9 +6,11 @@ from .models import (
     DailyForecast, 
     HourlyForecast, 
     WeatherAlert, 
-    FavoriteLocation
+    FavoriteLocation,
+    ChangeLog
 )
 from django.contrib.auth import get_user_model
+from .fast_serializers import LectorRapido
 
 User = get_user_model()
 
@@ -29,11 +31,61 @@ class WeatherAlertSerializer(serializers.ModelSerializer):
         fields = ['type', 'start_time', 'date', 'details', 'probability']
 
 
+# /api/sync/ entrega las horas y alertas sueltas: llevan su id y el pronóstico al que pertenecen
+class HourlyForecastSyncSerializer(HourlyForecastSerializer):
+    class Meta(HourlyForecastSerializer.Meta):
+        fields = ['id', 'daily_forecast', *HourlyForecastSerializer.Meta.fields]
+
+class WeatherAlertSyncSerializer(WeatherAlertSerializer):
+    class Meta(WeatherAlertSerializer.Meta):
+        fields = ['id', 'daily_forecast', *WeatherAlertSerializer.Meta.fields]
+
+
+# Selección de campos por query params (?fields= / ?exclude=)
+# ----------------------------------------------------------------------
+
+def campos_pedidos(query_params, disponibles):
+    """
+    Subconjunto de `disponibles` que pide el cliente con ?fields=a,b y/o ?exclude=c.
+    Devuelve None si no pidió nada (todos los campos). Nombres desconocidos -> 400.
+    """
+    fields = query_params.get('fields')
+    exclude = query_params.get('exclude')
+    if not fields and not exclude:
+        return None
+
+    disponibles = list(disponibles)
+    seleccion = [f.strip() for f in fields.split(',') if f.strip()] if fields else disponibles
+    excluidos = {f.strip() for f in exclude.split(',') if f.strip()} if exclude else set()
+    desconocidos = (set(seleccion) | excluidos) - set(disponibles)
+    if desconocidos:
+        raise serializers.ValidationError({'fields': f"Campos desconocidos: {', '.join(sorted(desconocidos))}."})
+    return [f for f in disponibles if f in seleccion and f not in excluidos]
+
+
+class SparseFieldsMixin:
+    """
+    Para ModelSerializer: quita los campos que el cliente no pidió con ?fields= / ?exclude=
+    (leídos del request en el contexto). Las vistas usan campos_pedidos() con la misma
+    regla para recortar también el SELECT y los prefetch.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None:
+            return
+        pedidos = campos_pedidos(request.query_params, self.fields)
+        if pedidos is not None:
+            for nombre in set(self.fields) - set(pedidos):
+                self.fields.pop(nombre)
+
+
 # Serializer Principal (Home Screen)
 # ----------------------------------------------------------------------
 
-class DailyForecastSerializer(serializers.ModelSerializer):
-    """Serializa el pronóstico diario e incluye sus detalles por hora y alertas."""
+class DailyForecastSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """Serializa el pronóstico diario e incluye sus detalles por hora y alertas (acepta ?fields= / ?exclude=)."""
     # Usamos los related_name definidos en los modelos (hourly_forecasts, alerts)
     hourly_forecasts = HourlyForecastSerializer(many=True, read_only=True)
     alerts = WeatherAlertSerializer(many=True, read_only=True)
@@ -54,7 +106,9 @@ class LocationSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Location
-        fields = '__all__'
+        # Solo los campos públicos: grid_cell, prediction_cell, search_key, latest_forecast y
+        # updated_at son columnas internas (índices, punteros y validadores HTTP)
+        fields = ['id', 'city', 'state_province', 'country', 'latitude', 'longitude']
 
 class FavoriteLocationSerializer(serializers.ModelSerializer):
     """Serializa la relación de favoritos, incluyendo la data de la ubicación."""
@@ -66,4 +120,26 @@ class FavoriteLocationSerializer(serializers.ModelSerializer):
         model = FavoriteLocation
         # Excluimos 'user' para la entrada (será asignado en la vista)
         fields = ['id', 'location', 'location_details', 'user']
-        read_only_fields = ['user']
\ No newline at end of file
+        read_only_fields = ['user']
+
+
+# Camino rápido de lectura (app/fast_serializers.py)
+# ----------------------------------------------------------------------
+
+# Orden en que se muestran las horas y alertas anidadas en un pronóstico
+ORDEN_DETALLES = {
+    'hourly_forecasts': ('time',),
+    'alerts': ('date', 'start_time', 'id'),
+}
+
+LECTOR_PRONOSTICOS = LectorRapido(DailyForecastSerializer, ordenes=ORDEN_DETALLES)
+LECTOR_HORAS = LectorRapido(HourlyForecastSerializer)
+
+# Pronóstico sin sus detalles anidados: /api/sync/ (las horas y alertas van aparte) y ?mode=grid
+LECTOR_PRONOSTICO_PLANO = LECTOR_PRONOSTICOS.recortado([c for c in LECTOR_PRONOSTICOS.disponibles if c not in ORDEN_DETALLES])
+
+LECTORES_SYNC = {
+    ChangeLog.DAILY: LECTOR_PRONOSTICO_PLANO,
+    ChangeLog.HOURLY: LectorRapido(HourlyForecastSyncSerializer),
+    ChangeLog.ALERT: LectorRapido(WeatherAlertSyncSerializer),
+}
\ No newline at end of file
@@ -0,0 +1,152 @@
+# app/signals.py
+
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .forecast_blobs import renderizar_pronosticos
+from .models import (
+    ChangeLog, DailyForecast, FavoriteLocation, HourlyForecast, Location, WeatherAlert, actualizar_ultimo_pronostico,
+    contar_borrado, marcar_pronosticos_modificados,
+)
+from .search import invalidar_city_trie, invalidar_trigram_index, trie_construido
+from .spatial import indice_construido
+from .sync import registrar_cambios, ubicacion_de_detalle
+
+
+# ----------------------------------------------------------------------
+# Índice espacial en memoria: se actualiza en el mismo proceso que escribe
+# ----------------------------------------------------------------------
+
+@receiver(post_save, sender=Location)
+def actualizar_indice_espacial(sender, instance, **kwargs):
+    indice = indice_construido()
+    if indice is not None:
+        indice.upsert(instance.pk, instance.latitude, instance.longitude)
+
+
+@receiver(post_delete, sender=Location)
+def quitar_de_indice_espacial(sender, instance, **kwargs):
+    indice = indice_construido()
+    if indice is not None:
+        indice.remove(instance.pk)
+
+
+# ----------------------------------------------------------------------
+# Trie de autocompletado e índice de trigramas de ciudades
+# ----------------------------------------------------------------------
+
+@receiver(post_save, sender=Location)
+def actualizar_trie_ciudades(sender, instance, created, **kwargs):
+    if instance.prediction_cell is not None:
+        return
+    # Las listas del índice de trigramas son arrays fijos: se reconstruye en el próximo uso
+    invalidar_trigram_index()
+    trie = trie_construido()
+    if trie is None:
+        return
+    if created:
+        trie.insertar({
+            "pk": instance.pk,
+            "city": instance.city,
+            "state_province": instance.state_province,
+            "country": instance.country,
+            "latitude": instance.latitude,
+            "longitude": instance.longitude,
+            "search_key": instance.search_key,
+        })
+    else:
+        # Un cambio de nombre dejaría entradas viejas en el trie: se reconstruye en el próximo uso
+        invalidar_city_trie()
+
+
+@receiver(post_delete, sender=Location)
+def quitar_de_trie_ciudades(sender, instance, **kwargs):
+    invalidar_trigram_index()
+    trie = trie_construido()
+    if trie is not None:
+        trie.quitar(instance.pk)
+
+
+# ----------------------------------------------------------------------
+# Puntero Location.latest_forecast
+# ----------------------------------------------------------------------
+
+@receiver(post_save, sender=DailyForecast)
+@receiver(post_delete, sender=DailyForecast)
+def actualizar_latest_forecast(sender, instance, **kwargs):
+    actualizar_ultimo_pronostico([instance.location_id])
+
+
+# ----------------------------------------------------------------------
+# JSON prerenderizado de cada pronóstico (ForecastBlob); al escribir una hora o
+# una alerta se avanza antes el updated_at del pronóstico (va dentro del JSON)
+# ----------------------------------------------------------------------
+
+@receiver(post_save, sender=DailyForecast)
+def renderizar_pronostico(sender, instance, **kwargs):
+    renderizar_pronosticos([instance.pk])
+
+
+@receiver(post_save, sender=HourlyForecast)
+@receiver(post_save, sender=WeatherAlert)
+def renderizar_pronostico_de_detalle(sender, instance, **kwargs):
+    marcar_pronosticos_modificados([instance.daily_forecast_id])
+    renderizar_pronosticos([instance.daily_forecast_id])
+
+
+@receiver(post_delete, sender=HourlyForecast)
+@receiver(post_delete, sender=WeatherAlert)
+def renderizar_pronostico_sin_detalle(sender, instance, origin=None, **kwargs):
+    # Si se borra el pronóstico (o su Location) los detalles caen en cascada junto con el JSON
+    modelo = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if modelo is sender:
+        marcar_pronosticos_modificados([instance.daily_forecast_id])
+        renderizar_pronosticos([instance.daily_forecast_id])
+
+
+# ----------------------------------------------------------------------
+# Registro de cambios para /api/sync/ (ChangeLog)
+# ----------------------------------------------------------------------
+
+KINDS = {DailyForecast: ChangeLog.DAILY, HourlyForecast: ChangeLog.HOURLY, WeatherAlert: ChangeLog.ALERT}
+
+
+@receiver(post_save, sender=DailyForecast)
+def registrar_cambio_de_pronostico(sender, instance, **kwargs):
+    registrar_cambios(ChangeLog.DAILY, [(instance.pk, instance.location_id)])
+
+
+@receiver(post_delete, sender=DailyForecast)
+def registrar_borrado_de_pronostico(sender, instance, **kwargs):
+    # También al caer en cascada con su Location: la lápida lleva el location_id
+    registrar_cambios(ChangeLog.DAILY, [(instance.pk, instance.location_id)], deleted=True)
+
+
+@receiver(post_save, sender=HourlyForecast)
+@receiver(post_save, sender=WeatherAlert)
+def registrar_cambio_de_detalle(sender, instance, **kwargs):
+    registrar_cambios(KINDS[sender], [(instance.pk, ubicacion_de_detalle(instance))])
+
+
+@receiver(post_delete, sender=HourlyForecast)
+@receiver(post_delete, sender=WeatherAlert)
+def registrar_borrado_de_detalle(sender, instance, origin=None, **kwargs):
+    # Los detalles que caen en cascada con su pronóstico los quita el cliente junto con él
+    modelo = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if modelo is sender:
+        registrar_cambios(KINDS[sender], [(instance.pk, ubicacion_de_detalle(instance))], deleted=True)
+
+
+# ----------------------------------------------------------------------
+# Contador de borrados de los GET condicionales (ConditionalGetMixin)
+# ----------------------------------------------------------------------
+
+@receiver(post_delete, sender=Location)
+@receiver(post_delete, sender=DailyForecast)
+@receiver(post_delete, sender=HourlyForecast)
+@receiver(post_delete, sender=WeatherAlert)
+@receiver(post_delete, sender=FavoriteLocation)
+def registrar_borrado(sender, instance, **kwargs):
+    # También en cascada: el listado de favoritas cambia al borrar su Location
+    contar_borrado(sender)
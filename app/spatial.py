@@ -0,0 +1,546 @@
+# app/spatial.py
+
+import heapq
+import math
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db.models import F, FloatField, ExpressionWrapper, Q
+from django.db.models.functions import Cast
+
+from app.models import GRID_CELL_DEG, Location, celdas_vecinas, firma_ubicaciones
+
+
+RADIO_TIERRA_KM = 6371.0088
+
+# Estrategia para encontrar la Location más cercana:
+#   "memory" -> KD-tree en memoria del proceso (great-circle correcto, O(log n));
+#   "bbox"   -> caja lat/lon creciente en SQL sobre el índice (latitude, longitude) + haversine,
+#               para despliegues que no pueden mantener el índice en memoria;
+#   "orm"    -> distancia euclidiana en grados calculada en SQL (escaneo completo).
+LOCATION_LOOKUP = getattr(settings, "LOCATION_LOOKUP", "memory")
+
+# Cada cuántos segundos se compara firma_ubicaciones() con la base de datos para detectar
+# cambios hechos por otros procesos o por bulk_create (que no dispara señales).
+SPATIAL_INDEX_TTL = getattr(settings, "SPATIAL_INDEX_TTL", 60)
+
+# Semilado inicial (grados de latitud) de la caja de búsqueda de la estrategia "bbox"
+BBOX_RADIO_INICIAL = getattr(settings, "BBOX_RADIO_INICIAL", 0.25)
+KM_POR_GRADO = RADIO_TIERRA_KM * np.pi / 180
+
+# Puntos por hoja del KD-tree
+TAMANO_HOJA = 32
+
+
+def a_xyz(lats, lons):
+    """Coordenadas (grados) a vectores unitarios sobre la esfera."""
+    lat = np.radians(np.asarray(lats, dtype=float))
+    lon = np.radians(np.asarray(lons, dtype=float))
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def cuerda_a_km(d2):
+    """Distancia de cuerda al cuadrado (esfera unitaria) a distancia great-circle en km."""
+    return 2 * RADIO_TIERRA_KM * np.arcsin(np.minimum(np.sqrt(d2) / 2, 1.0))
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class KDTree:
+    """
+    KD-tree estático sobre puntos 3D con hojas de TAMANO_HOJA puntos.
+    Los puntos se reordenan para que cada hoja sea un bloque contiguo y se evalúe con NumPy.
+    """
+
+    def __init__(self, puntos):
+        puntos = np.asarray(puntos, dtype=float).reshape(-1, 3)
+        self.dim, self.split, self.left, self.right, self.start, self.end = [], [], [], [], [], []
+        orden = []
+        if len(puntos):
+            self._construir(puntos, np.arange(len(puntos)), orden)
+        self.orden = np.asarray(orden, dtype=np.int64)
+        self.puntos = puntos[self.orden] if len(puntos) else puntos
+
+        # Para query_many: los nodos como arrays y cada hoja como un bloque de TAMANO_HOJA
+        # filas (las que sobran con inf y posición -1), para evaluar muchas hojas de una vez
+        self.nodos = tuple(np.asarray(v) for v in (self.dim, self.split, self.left, self.right))
+        self.slot = np.full(len(self.dim), -1, dtype=np.int64)
+        hojas = np.flatnonzero(self.nodos[0] < 0)
+        self.slot[hojas] = np.arange(len(hojas))
+        self.pos_hoja = np.full((len(hojas), TAMANO_HOJA), -1, dtype=np.int64)
+        for n, h in enumerate(hojas):
+            self.pos_hoja[n, :self.end[h] - self.start[h]] = np.arange(self.start[h], self.end[h])
+        self.puntos_hoja = np.where(self.pos_hoja[..., None] >= 0, self.puntos[self.pos_hoja], np.inf)
+
+    def _construir(self, puntos, idx, orden):
+        nodo = len(self.dim)
+        self.dim.append(-1)
+        self.split.append(0.0)
+        self.left.append(-1)
+        self.right.append(-1)
+        self.start.append(len(orden))
+        self.end.append(len(orden))
+
+        if len(idx) <= TAMANO_HOJA:
+            orden.extend(idx.tolist())
+            self.end[nodo] = len(orden)
+            return nodo
+
+        sub = puntos[idx]
+        dim = int(np.argmax(sub.max(axis=0) - sub.min(axis=0)))
+        mitad = len(idx) // 2
+        particion = np.argpartition(sub[:, dim], mitad)
+        idx = idx[particion]
+        self.dim[nodo] = dim
+        self.split[nodo] = float(puntos[idx[mitad], dim])
+        self.left[nodo] = self._construir(puntos, idx[:mitad], orden)
+        self.right[nodo] = self._construir(puntos, idx[mitad:], orden)
+        return nodo
+
+    def query(self, q, k=1):
+        """Los k vecinos más cercanos a q: (distancias de cuerda al cuadrado, índices originales)."""
+        if not self.dim:
+            return np.empty(0), np.empty(0, dtype=np.int64)
+
+        mejores = []  # heap de (-d2, indice) con los k mejores
+        limite = np.inf
+        pila = [(0, 0.0)]
+        while pila:
+            nodo, cota = pila.pop()
+            if cota >= limite:
+                continue
+            dim = self.dim[nodo]
+            if dim < 0:
+                bloque = self.puntos[self.start[nodo]:self.end[nodo]]
+                d2 = ((bloque - q) ** 2).sum(axis=1)
+                for j in np.argsort(d2)[:k]:
+                    if len(mejores) < k:
+                        heapq.heappush(mejores, (-d2[j], self.start[nodo] + j))
+                    elif d2[j] < -mejores[0][0]:
+                        heapq.heapreplace(mejores, (-d2[j], self.start[nodo] + j))
+                    else:
+                        break
+                if len(mejores) == k:
+                    limite = -mejores[0][0]
+                continue
+            diff = q[dim] - self.split[nodo]
+            cerca, lejos = (self.left[nodo], self.right[nodo]) if diff < 0 else (self.right[nodo], self.left[nodo])
+            pila.append((lejos, max(cota, diff * diff)))
+            pila.append((cerca, cota))
+
+        mejores.sort(reverse=True)
+        return np.array([-d for d, _ in mejores]), self.orden[[i for _, i in mejores]]
+
+    def query_many(self, qs, k=1, excluir=None):
+        """
+        Los k vecinos más cercanos de cada fila de `qs` (m × 3) en una sola pasada: todas las
+        consultas bajan juntas a su hoja, que da una cota, y después recorren el árbol por
+        niveles como pares (consulta, nodo), descartando las ramas más lejanas que la cota;
+        al final todas las hojas alcanzadas se evalúan de una vez.
+        `excluir` (booleano por índice original) descarta puntos, p. ej. las lápidas.
+        Devuelve (distancias de cuerda al cuadrado, índices originales), ambos m × k; donde no
+        hay vecino, inf y -1.
+        """
+        qs = np.asarray(qs, dtype=float).reshape(-1, 3)
+        m = len(qs)
+        if not self.dim or not m:
+            return np.full((m, k), np.inf), np.full((m, k), -1, dtype=np.int64)
+        fuera = None if excluir is None else np.asarray(excluir, dtype=bool)[self.orden]
+        dim, split, left, right = self.nodos
+        todas = np.arange(m)
+
+        # 1. Todas las consultas bajan a la vez hasta su hoja: sus k mejores son la primera cota
+        propia = np.zeros(m, dtype=np.int64)
+        activas = todas[dim[propia] >= 0]
+        while len(activas):
+            n = propia[activas]
+            propia[activas] = np.where(qs[activas, dim[n]] < split[n], left[n], right[n])
+            activas = activas[dim[propia[activas]] >= 0]
+        mejor_d, mejor_i = self._mejores(qs, todas, propia, k, fuera)
+        cota = mejor_d[:, -1]
+
+        # 2. Recorrido por niveles de los pares (consulta, nodo) cuya distancia al plano de corte
+        #    (como en query) no supera la cota; las hojas alcanzadas se juntan para el final
+        filas, nodos, cotas = todas, np.zeros(m, dtype=np.int64), np.zeros(m)
+        hojas_f, hojas_n = [], []
+        while len(filas):
+            vivos = cotas < cota[filas]
+            filas, nodos, cotas = filas[vivos], nodos[vivos], cotas[vivos]
+            hoja = dim[nodos] < 0
+            otra = hoja & (nodos != propia[filas])
+            hojas_f.append(filas[otra])
+            hojas_n.append(nodos[otra])
+            filas, nodos, cotas = filas[~hoja], nodos[~hoja], cotas[~hoja]
+            diff = qs[filas, dim[nodos]] - split[nodos]
+            cerca = np.where(diff < 0, left[nodos], right[nodos])
+            lejos = np.where(diff < 0, right[nodos], left[nodos])
+            filas = np.concatenate([filas, filas])
+            nodos = np.concatenate([cerca, lejos])
+            cotas = np.concatenate([cotas, np.maximum(cotas, diff * diff)])
+
+        # 3. Todas las hojas alcanzadas de una vez, junto con los mejores de la propia
+        filas, nodos = np.concatenate(hojas_f), np.concatenate(hojas_n)
+        if len(filas):
+            mejor_d, mejor_i = self._mejores(qs, filas, nodos, k, fuera, (mejor_d, mejor_i))
+
+        encontrados = mejor_i >= 0
+        mejor_i[encontrados] = self.orden[mejor_i[encontrados]]
+        return mejor_d, mejor_i
+
+    def _mejores(self, qs, filas, hojas, k, fuera, previos=None):
+        """Los k mejores de cada consulta entre los pares (fila, hoja) y, si se dan, sus mejores previos."""
+        pos = self.pos_hoja[self.slot[hojas]]
+        d2 = ((self.puntos_hoja[self.slot[hojas]] - qs[filas, None, :]) ** 2).sum(axis=2)
+        if fuera is not None:
+            d2[(pos >= 0) & fuera[pos]] = np.inf
+        filas, d2, pos = np.repeat(filas, pos.shape[1]), d2.ravel(), pos.ravel()
+        if previos is not None:
+            filas = np.concatenate([filas, np.repeat(np.arange(len(qs)), k)])
+            d2 = np.concatenate([d2, previos[0].ravel()])
+            pos = np.concatenate([pos, previos[1].ravel()])
+
+        # Orden por consulta y distancia: los primeros k de cada consulta son sus mejores
+        orden = np.lexsort((d2, filas))
+        filas, d2, pos = filas[orden], d2[orden], pos[orden]
+        rango = np.arange(len(filas)) - np.searchsorted(filas, filas)
+        tomar = rango < k
+        mejor_d = np.full((len(qs), k), np.inf)
+        mejor_i = np.full((len(qs), k), -1, dtype=np.int64)
+        mejor_d[filas[tomar], rango[tomar]] = d2[tomar]
+        mejor_i[filas[tomar], rango[tomar]] = np.where(np.isinf(d2[tomar]), -1, pos[tomar])
+        return mejor_d, mejor_i
+
+
+class SpatialIndex:
+    """
+    Índice de Location en memoria del proceso. Las altas/cambios posteriores a la
+    construcción van a un buffer pequeño que se revisa por fuerza bruta y las bajas se
+    marcan como lápidas; cuando crecen demasiado se reconstruye el árbol.
+    """
+
+    def __init__(self, ids, lats, lons):
+        self._lock = threading.Lock()
+        self.firma = None
+        self._construir(np.asarray(ids, dtype=np.int64), a_xyz(lats, lons).reshape(-1, 3))
+
+    def _construir(self, ids, xyz):
+        self.ids = ids
+        self.xyz = xyz
+        self.arbol = KDTree(xyz)
+        self.extra = {}          # pk -> xyz (altas o cambios desde la construcción)
+        self.lapidas = set()     # pks del árbol que ya no valen (borrados o movidos)
+        self.checked_at = time.monotonic()
+
+    @classmethod
+    def desde_db(cls):
+        filas = np.array(Location.objects.values_list("pk", "latitude", "longitude"), dtype=float).reshape(-1, 3)
+        indice = cls(filas[:, 0].astype(np.int64), filas[:, 1], filas[:, 2])
+        indice.firma = firma_ubicaciones()
+        return indice
+
+    def __len__(self):
+        return int((~np.isin(self.ids, list(self.lapidas))).sum()) + len(self.extra)
+
+    def upsert(self, pk, lat, lon):
+        with self._lock:
+            self.lapidas.add(pk)
+            self.extra[pk] = a_xyz(float(lat), float(lon))
+            self._quiza_reconstruir()
+
+    def remove(self, pk):
+        with self._lock:
+            self.lapidas.add(pk)
+            self.extra.pop(pk, None)
+            self._quiza_reconstruir()
+
+    def _quiza_reconstruir(self):
+        if len(self.lapidas) + len(self.extra) <= max(64, int(np.sqrt(len(self.ids)))):
+            return
+        vivos = ~np.isin(self.ids, list(self.lapidas))
+        xyz = np.concatenate([self.xyz[vivos], np.array(list(self.extra.values())).reshape(-1, 3)])
+        ids = np.concatenate([self.ids[vivos], np.array(list(self.extra), dtype=np.int64)])
+        self._construir(ids, xyz)
+
+    def nearest(self, lat, lon, k=1):
+        """Los k Location más cercanos por distancia great-circle: lista de (pk, km)."""
+        q = a_xyz(float(lat), float(lon))
+        with self._lock:
+            extra = dict(self.extra)
+            lapidas = set(self.lapidas)
+            # Pedimos de más al árbol para poder descartar las lápidas
+            d2, idx = self.arbol.query(q, k + len(lapidas))
+            candidatos = [(d, int(self.ids[i])) for d, i in zip(d2, idx) if int(self.ids[i]) not in lapidas]
+        candidatos += [(float(((xyz - q) ** 2).sum()), pk) for pk, xyz in extra.items()]
+        candidatos.sort()
+        return [(pk, float(cuerda_a_km(d))) for d, pk in candidatos[:k]]
+
+    def nearest_many(self, lats, lons):
+        """El Location más cercano a cada punto: lista de (pk, km), o None si el índice está vacío."""
+        qs = a_xyz(np.asarray(lats, dtype=float), np.asarray(lons, dtype=float)).reshape(-1, 3)
+        with self._lock:
+            extra = dict(self.extra)
+            excluir = np.isin(self.ids, list(self.lapidas)) if self.lapidas else None
+            d2, idx = self.arbol.query_many(qs, 1, excluir)
+            d2, idx = d2[:, 0], idx[:, 0]
+            pks = np.full(len(qs), -1, dtype=np.int64)
+            pks[idx >= 0] = self.ids[idx[idx >= 0]]
+
+        # El buffer de altas se compara contra todos los puntos de una vez
+        if extra:
+            d2_extra = ((qs[:, None, :] - np.array(list(extra.values()))[None, :, :]) ** 2).sum(axis=2)
+            mejor_extra = np.argmin(d2_extra, axis=1)
+            d2_extra = d2_extra[np.arange(len(qs)), mejor_extra]
+            gana = d2_extra < d2
+            d2 = np.where(gana, d2_extra, d2)
+            pks = np.where(gana, np.array(list(extra), dtype=np.int64)[mejor_extra], pks)
+
+        km = cuerda_a_km(d2)
+        return [None if pk < 0 else (int(pk), float(d)) for pk, d in zip(pks, km)]
+
+
+_indice = None
+_indice_lock = threading.Lock()
+
+
+def get_spatial_index():
+    """Índice del proceso; se construye en el primer uso y se revalida cada SPATIAL_INDEX_TTL segundos."""
+    global _indice
+    indice = _indice
+    if indice is not None and time.monotonic() - indice.checked_at < SPATIAL_INDEX_TTL:
+        return indice
+
+    with _indice_lock:
+        if _indice is None or firma_ubicaciones() != _indice.firma:
+            _indice = SpatialIndex.desde_db()
+        _indice.checked_at = time.monotonic()
+        return _indice
+
+
+def invalidar_spatial_index():
+    global _indice
+    _indice = None
+
+
+def indice_construido():
+    return _indice
+
+
+def ubicacion_mas_cercana_orm(lat, lon, queryset=None):
+    """Búsqueda original: distancia euclidiana en grados, calculada en SQL sobre toda la tabla."""
+    distance_expression = ExpressionWrapper(
+        (Cast(F('latitude'), FloatField()) - lat) ** 2 +
+        (Cast(F('longitude'), FloatField()) - lon) ** 2,
+        output_field=FloatField()
+    )
+    queryset = Location.objects.all() if queryset is None else queryset
+    return queryset.annotate(distance=distance_expression).order_by('distance').first()
+
+
+def filtro_caja(lat, lon, dlat, dlon=None):
+    """
+    Q de la caja [lat ± dlat] × [lon ± dlon] (en grados). Si no se da dlon se ensancha
+    con 1/cos(lat) para cubrir la misma distancia; en el antimeridiano se parte en dos
+    rangos y cerca de los polos se toman todas las longitudes.
+    Los dos rangos caen sobre el índice compuesto (latitude, longitude).
+    """
+    lat_min, lat_max = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+    if dlon is None:
+        lat_borde = max(abs(lat_min), abs(lat_max))
+        dlon = dlat / np.cos(np.radians(lat_borde)) if lat_borde < 89.999 else 360.0
+
+    filtro = Q(latitude__gte=lat_min, latitude__lte=lat_max)
+    if dlon >= 180:
+        return filtro
+    lon_min, lon_max = lon - dlon, lon + dlon
+    if lon_min < -180:
+        return filtro & (Q(longitude__gte=lon_min + 360) | Q(longitude__lte=lon_max))
+    if lon_max > 180:
+        return filtro & (Q(longitude__gte=lon_min) | Q(longitude__lte=lon_max - 360))
+    return filtro & Q(longitude__gte=lon_min, longitude__lte=lon_max)
+
+
+def celdas_en_tolerancia(lat, lon, tolerance):
+    """Celdas de la malla que cubren la caja ±tolerance grados alrededor de (lat, lon)."""
+    return celdas_vecinas(lat, lon, anillos=max(1, math.ceil(tolerance / float(GRID_CELL_DEG))))
+
+
+def _mas_cercana(candidatas, lat, lon):
+    if not candidatas:
+        return None, None
+    distancias = haversine_km(
+        lat, lon,
+        np.array([float(loc.latitude) for loc in candidatas]),
+        np.array([float(loc.longitude) for loc in candidatas]),
+    )
+    i = int(np.argmin(distancias))
+    return candidatas[i], float(distancias[i])
+
+
+def ubicacion_mas_cercana_bbox(lat, lon, radio_inicial=BBOX_RADIO_INICIAL):
+    """
+    Location más cercana (great-circle) consultando una caja que empieza pequeña y se
+    duplica hasta encontrar candidatas. Como la esquina de la caja no garantiza el
+    círculo, si la mejor candidata está más lejos que el semilado se repite una vez
+    con una caja que cubre esa distancia.
+    """
+    lat, lon = float(lat), float(lon)
+
+    # Primero las 3×3 celdas vecinas (igualdad sobre el índice de grid_cell): si la mejor
+    # está a menos de un ancho de celda, nada fuera del bloque puede estar más cerca
+    location, km = _mas_cercana(list(Location.objects.filter(grid_cell__in=celdas_vecinas(lat, lon))), lat, lon)
+    ancho_km = float(GRID_CELL_DEG) * KM_POR_GRADO * np.cos(np.radians(min(abs(lat) + 2 * float(GRID_CELL_DEG), 90.0)))
+    if location is not None and km <= ancho_km:
+        return location
+
+    radio = radio_inicial
+    while True:
+        candidatas = list(Location.objects.filter(filtro_caja(lat, lon, radio)))
+        if candidatas or radio >= 180:
+            break
+        radio *= 2
+
+    location, km = _mas_cercana(candidatas, lat, lon)
+    if location is not None and km > radio * KM_POR_GRADO:
+        location, km = _mas_cercana(list(Location.objects.filter(filtro_caja(lat, lon, km / KM_POR_GRADO))), lat, lon)
+    return location
+
+
+def ubicacion_en_tolerancia(lat, lon, tolerance):
+    """Location más cercana dentro de ±tolerance grados (por las celdas vecinas de la malla), o None."""
+    lat, lon = float(lat), float(lon)
+    candidatas = [
+        loc for loc in Location.objects.filter(grid_cell__in=celdas_en_tolerancia(lat, lon, tolerance))
+        if abs(float(loc.latitude) - lat) <= tolerance
+        and min(abs(float(loc.longitude) - lon), 360 - abs(float(loc.longitude) - lon)) <= tolerance
+    ]
+    return _mas_cercana(candidatas, lat, lon)[0]
+
+
+def k_mas_cercanas(lat, lon, k):
+    """
+    Los k Location más cercanos a (lat, lon): lista de (pk, km) ordenada por distancia.
+    Con el índice en memoria es una consulta al KD-tree; si no, una caja creciente en
+    SQL (como ubicacion_mas_cercana_bbox) hasta tener k candidatas.
+    """
+    if LOCATION_LOOKUP == "memory":
+        return get_spatial_index().nearest(lat, lon, k)
+
+    lat, lon = float(lat), float(lon)
+    radio = BBOX_RADIO_INICIAL
+    while True:
+        candidatas = list(Location.objects.filter(filtro_caja(lat, lon, radio)).values_list("pk", "latitude", "longitude"))
+        if len(candidatas) >= k or radio >= 180:
+            break
+        radio *= 2
+
+    def ordenar(filas):
+        if not filas:
+            return []
+        pks, lats, lons = zip(*filas)
+        km = haversine_km(lat, lon, np.array(lats, dtype=float), np.array(lons, dtype=float))
+        return sorted(zip(pks, km.tolist()), key=lambda par: par[1])[:k]
+
+    vecinos = ordenar(candidatas)
+    if vecinos and vecinos[-1][1] > radio * KM_POR_GRADO:
+        filtro = filtro_caja(lat, lon, vecinos[-1][1] / KM_POR_GRADO)
+        vecinos = ordenar(list(Location.objects.filter(filtro).values_list("pk", "latitude", "longitude")))
+    return vecinos
+
+
+def ubicaciones_mas_cercanas_bbox(puntos, radio_inicial=BBOX_RADIO_INICIAL):
+    """
+    ubicacion_mas_cercana_bbox para muchos puntos con una consulta por ronda en lugar de
+    varias por punto: primero las celdas vecinas de todos los puntos juntas y después, en
+    cada ronda, la unión (OR) de las cajas de los puntos que aún no tienen garantía. Una
+    caja que no trae candidatas se duplica; si la mejor está más lejos que el semilado, la
+    siguiente caja cubre esa distancia. Devuelve el pk más cercano de cada punto o None.
+    """
+    if not puntos:
+        return []
+    lats = np.array([float(lat) for lat, _ in puntos])
+    lons = np.array([float(lon) for _, lon in puntos])
+    mejor_pk = [None] * len(puntos)
+    mejor_km = np.full(len(puntos), np.inf)
+
+    def revisar(pendientes, queryset):
+        filas = list(queryset.values_list("pk", "latitude", "longitude"))
+        if not filas:
+            return
+        pks, cand_lat, cand_lon = zip(*filas)
+        km = haversine_km(
+            lats[pendientes, None], lons[pendientes, None],
+            np.array(cand_lat, dtype=float)[None, :], np.array(cand_lon, dtype=float)[None, :],
+        )
+        j = np.argmin(km, axis=1)
+        for i, pk, d in zip(pendientes, np.asarray(pks)[j], km[np.arange(len(pendientes)), j]):
+            if d < mejor_km[i]:
+                mejor_km[i], mejor_pk[i] = d, int(pk)
+
+    # Celdas vecinas: si la mejor está a menos de un ancho de celda, nada fuera del bloque está más cerca
+    todos = np.arange(len(puntos))
+    celdas = set().union(*(celdas_vecinas(lat, lon) for lat, lon in zip(lats, lons)))
+    revisar(todos, Location.objects.filter(grid_cell__in=celdas))
+    ancho_km = float(GRID_CELL_DEG) * KM_POR_GRADO * np.cos(np.radians(np.minimum(np.abs(lats) + 2 * float(GRID_CELL_DEG), 90.0)))
+    pendientes = todos[mejor_km > ancho_km]
+
+    radios = np.full(len(puntos), float(radio_inicial))
+    while len(pendientes):
+        filtro = Q()
+        for i in pendientes:
+            filtro |= filtro_caja(lats[i], lons[i], radios[i])
+        revisar(pendientes, Location.objects.filter(filtro))
+
+        # Con la mejor dentro del semilado, la caja cubre el círculo: ya no puede haber otra más cerca
+        listos = mejor_km[pendientes] <= radios[pendientes] * KM_POR_GRADO
+        sin_nada = np.isinf(mejor_km[pendientes])
+        agotados = sin_nada & (radios[pendientes] >= 180)
+        siguen = pendientes[~(listos | agotados)]
+        radios[siguen] = np.where(np.isinf(mejor_km[siguen]), radios[siguen] * 2, mejor_km[siguen] / KM_POR_GRADO)
+        pendientes = siguen
+    return mejor_pk
+
+
+def ubicaciones_mas_cercanas(puntos):
+    """
+    pk del Location más cercano a cada (lat, lon) de `puntos`, en el mismo orden (None si
+    no hay ubicaciones). Con el índice en memoria se resuelven todos en una sola pasada
+    por el árbol y con "bbox" con unas pocas consultas para todo el lote; "orm" sigue
+    siendo una consulta por punto.
+    """
+    if LOCATION_LOOKUP == "memory":
+        if not puntos:
+            return []
+        lats, lons = zip(*puntos)
+        return [vecino and vecino[0] for vecino in get_spatial_index().nearest_many(lats, lons)]
+    if LOCATION_LOOKUP == "bbox":
+        return ubicaciones_mas_cercanas_bbox(puntos)
+    resultado = []
+    for lat, lon in puntos:
+        location = ubicacion_mas_cercana(lat, lon)
+        resultado.append(location.pk if location is not None else None)
+    return resultado
+
+
+def ubicacion_mas_cercana(lat, lon, queryset=None):
+    """
+    Location más cercana a (lat, lon) según la estrategia LOCATION_LOOKUP, o None.
+    `queryset` permite traerla ya con select_related/prefetch_related (por defecto Location.objects).
+    """
+    if LOCATION_LOOKUP == "bbox":
+        location = ubicacion_mas_cercana_bbox(lat, lon)
+        if location is None or queryset is None:
+            return location
+        return queryset.filter(pk=location.pk).first()
+    if LOCATION_LOOKUP == "memory":
+        vecinos = get_spatial_index().nearest(lat, lon)
+        if not vecinos:
+            return None
+        return (Location.objects if queryset is None else queryset).filter(pk=vecinos[0][0]).first()
+    return ubicacion_mas_cercana_orm(lat, lon, queryset)
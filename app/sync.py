@@ -0,0 +1,107 @@
+# app/sync.py
+
+import base64
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from app.models import ChangeLog, ChangeLogLock, DailyForecast, HourlyForecast, WeatherAlert
+from app.serializers import LECTORES_SYNC
+
+
+# Días que se guarda el registro de cambios (prune_sync_log); una marca más vieja pide descargar todo
+SYNC_LOG_RETENTION_DAYS = getattr(settings, "SYNC_LOG_RETENTION_DAYS", 30)
+
+MODELOS = {ChangeLog.DAILY: DailyForecast, ChangeLog.HOURLY: HourlyForecast, ChangeLog.ALERT: WeatherAlert}
+
+
+class MarcaVencida(Exception):
+    """La marca es más vieja que el registro de cambios: el cliente tiene que descargar todo de nuevo."""
+
+
+def registrar_cambios(kind, filas, deleted=False, tamano_bloque=1000):
+    """
+    Agrega al registro un cambio de `kind` por cada (object_id, location_id) de `filas`
+    cuando confirma la transacción en curso (enseguida si no hay ninguna), así los ids se
+    asignan cuando los datos ya son visibles. Si la transacción se revierte no se registra nada.
+    """
+    cambios = [ChangeLog(kind=kind, object_id=pk, location_id=location_id, deleted=deleted) for pk, location_id in filas]
+    if cambios:
+        transaction.on_commit(lambda: _insertar_en_orden(cambios, tamano_bloque))
+
+
+def _insertar_en_orden(cambios, tamano_bloque):
+    """
+    Inserta y confirma `cambios` con ChangeLogLock tomado: los INSERT del registro no se
+    solapan, así que sus ids confirman en orden. Cuando un cliente ve un id, todos los
+    menores ya son visibles y su marca no deja atrás ningún cambio, sin depender de relojes.
+    """
+    with transaction.atomic():
+        ChangeLogLock.objects.select_for_update().get_or_create(pk=1)
+        ChangeLog.objects.bulk_create(cambios, batch_size=tamano_bloque)
+
+
+def ubicacion_de_detalle(detalle):
+    """location_id del pronóstico de una hora o alerta (sin consulta si el pronóstico ya está cargado)."""
+    if type(detalle).daily_forecast.is_cached(detalle):
+        return detalle.daily_forecast.location_id
+    return DailyForecast.objects.filter(pk=detalle.daily_forecast_id).values_list("location_id", flat=True).first()
+
+
+def codificar_marca(ultimo_id):
+    """Marca opaca para ?since=: el último cambio entregado y cuándo se entregó."""
+    crudo = json.dumps([ultimo_id, int(time.time())])
+    return base64.urlsafe_b64encode(crudo.encode()).decode().rstrip("=")
+
+
+def decodificar_marca(marca):
+    """Id del último cambio entregado; ValueError si la marca no es válida y MarcaVencida si ya se podó el registro."""
+    try:
+        ultimo_id, emitida = json.loads(base64.urlsafe_b64decode(marca + "=" * (-len(marca) % 4)))
+        ultimo_id, emitida = int(ultimo_id), int(emitida)
+    except Exception:
+        raise ValueError(marca)
+    if emitida < time.time() - SYNC_LOG_RETENTION_DAYS * 86400:
+        raise MarcaVencida(marca)
+    return ultimo_id
+
+
+def ultimo_cambio():
+    """Id del último cambio (0 si no hay): la marca de partida de un cliente nuevo."""
+    return ChangeLog.objects.aggregate(ultimo=Max("pk"))["ultimo"] or 0
+
+
+def cambios_desde(ultimo_id, location_ids=None, tamano=100):
+    """
+    Hasta `tamano` cambios después de `ultimo_id` (solo de `location_ids`, un queryset de ids,
+    si se da) como ({kind: [filas actuales], "deleted": {kind: [ids]}}, id del último cambio
+    leído, si quedan más). Cada objeto va una vez con su estado actual, aunque haya cambiado
+    varias veces; si ya no existe va como lápida. Una consulta al registro y una por tipo.
+    """
+    cambios = ChangeLog.objects.filter(pk__gt=ultimo_id)
+    if location_ids is not None:
+        cambios = cambios.filter(location_id__in=location_ids)
+    pagina = list(cambios.order_by("pk").values_list("pk", "kind", "object_id")[:tamano + 1])
+    hay_mas = len(pagina) > tamano
+    pagina = pagina[:tamano]
+
+    datos = {"deleted": {}}
+    for kind, lector in LECTORES_SYNC.items():
+        ids = sorted({pk for _, k, pk in pagina if k == kind})
+        filas = lector.serializar(lector.values(MODELOS[kind].objects.filter(pk__in=ids).order_by("pk"))) if ids else []
+        vivos = {fila["id"] for fila in filas}
+        datos[kind] = filas
+        datos["deleted"][kind] = [pk for pk in ids if pk not in vivos]
+    return datos, (pagina[-1][0] if pagina else ultimo_id), hay_mas
+
+
+def podar_registro(dias=None):
+    """Borra los cambios de más de `dias` (SYNC_LOG_RETENTION_DAYS por defecto); devuelve cuántos."""
+    limite = timezone.now() - timedelta(days=SYNC_LOG_RETENTION_DAYS if dias is None else dias)
+    borrados, _ = ChangeLog.objects.filter(created_at__lt=limite).delete()
+    return borrados
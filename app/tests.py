@@ -1,3 +1,1790 @@
-from django.test import TestCase
+import importlib.util
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date, time, timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import msgpack
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from app import sync, utils, views
+from app.model_registry import MODELOS_DIR, ModelRegistry
+from app.models import (
+    GRID_COLUMNS, ChangeLog, ChangeLogLock, DailyForecast, FavoriteLocation, ForecastBlob, HourlyForecast, Location, WeatherAlert, celda_de, celdas_vecinas,
+    actualizar_ultimo_pronostico, borrados_de, normalizar_busqueda,
+)
+from app.management.commands import refresh_forecasts
+from app.forecast_blobs import renderizar_pronosticos
+from app.forecast_grid import ForecastGrid
+from app.interpolation import mezclar_idw
+from app.native_models import EXTENSION_NATIVA, cargar_nativo, exportar_nativo
+from app.prediction_cache import PredictionCache
+from app.renderers import ORJSONRenderer
+from app.search import buscar_ciudad, ciudad_parecida, get_city_trie, invalidar_city_trie, invalidar_trigram_index
+from app import spatial
+from app.spatial import (
+    filtro_caja, haversine_km, invalidar_spatial_index, k_mas_cercanas, ubicacion_en_tolerancia,
+    ubicacion_mas_cercana_bbox, ubicaciones_mas_cercanas_bbox,
+)
+from app.tree_engine import EXTENSION_ARBOLES, TreeEnsemble, aplanar_booster, exportar_arboles
+from app.utils import (
+    VARIABLE_MAP, mapear_prediccion, predecir_condicion, predecir_condicion_batch, predecir_y_guardar_pronosticos,
+    pronosticar_ubicaciones, resolver_ubicaciones,
+)
+
+
+XGBOOST_DISPONIBLE = importlib.util.find_spec("xgboost") is not None
+
+
+def crear_pronostico(location, fecha, **campos):
+    """DailyForecast con valores fijos en los campos obligatorios."""
+    valores = dict(
+        current_temp=20, condition_summary="Sunny", max_temp=25, min_temp=15, feels_like_temp=20,
+        humidity=50, precipitation_prob=10, wind_speed=5, wind_direction="N", visibility=10,
+        pressure=1013, dew_point=10, clouds=20,
+    )
+    valores.update(campos)
+    return DailyForecast.objects.create(location=location, date=fecha, **valores)
+
+
+# ----------------------------------------------------------------------
+# Registro de modelos por proceso (app/model_registry.py)
+# ----------------------------------------------------------------------
+
+class ModelRegistryTests(SimpleTestCase):
+
+    def setUp(self):
+        self.carpeta = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.carpeta)
+        self.path = self.carpeta / "modelo.pkl"
+        self._escribir(b"modelo v1", mtime_s=1_000)
+        self.cargas = 0
+        self.registro = ModelRegistry(loader=self._cargar, check_interval=0)
+
+    def _escribir(self, contenido, mtime_s):
+        self.path.write_bytes(contenido)
+        os.utime(self.path, ns=(mtime_s * 10**9, mtime_s * 10**9))
+
+    def _cargar(self, path):
+        self.cargas += 1
+        return path.read_bytes()
+
+    def test_carga_una_sola_vez(self):
+        modelo = self.registro.get(self.path)
+        self.assertIs(self.registro.get(self.path), modelo)
+        self.assertEqual(self.cargas, 1)
+        self.assertEqual(self.registro.stats()["modelo.pkl"]["file_bytes"], len(b"modelo v1"))
+
+    def test_solo_mtime_no_recarga(self):
+        modelo = self.registro.get(self.path)
+        os.utime(self.path, ns=(2_000 * 10**9, 2_000 * 10**9))
+        self.assertIs(self.registro.get(self.path), modelo)
+        self.assertEqual((self.cargas, self.registro.reloads), (1, 0))
+
+    def test_contenido_nuevo_recarga(self):
+        self.registro.get(self.path)
+        version = self.registro.version()
+        self._escribir(b"modelo v2", mtime_s=2_000)  # mismo tamaño, otro contenido
+        self.assertEqual(self.registro.get(self.path), b"modelo v2")
+        self.assertEqual((self.cargas, self.registro.reloads), (2, 1))
+        self.assertNotEqual(self.registro.version(), version)
+
+    def test_revision_espaciada_y_archivo_borrado(self):
+        registro = ModelRegistry(loader=self._cargar, check_interval=3600)
+        registro.get(self.path)
+        self._escribir(b"modelo v2", mtime_s=2_000)
+        # Dentro del intervalo no se vuelve a revisar el archivo
+        self.assertEqual(registro.get(self.path), b"modelo v1")
+        self.path.unlink()
+        with self.assertRaises(FileNotFoundError):
+            self.registro.get(self.path)
+
+    def test_version_de_artefactos_sin_cargarlos(self):
+        version = self.registro.version_artefactos(self.carpeta)
+        self._escribir(b"modelo v2 mas largo", mtime_s=2_000)
+        self.assertNotEqual(self.registro.version_artefactos(self.carpeta), version)
+        self.assertEqual(self.cargas, 0)
+
+
+# ----------------------------------------------------------------------
+# Inferencia por lotes (app/utils.py predecir_condicion_batch)
+# ----------------------------------------------------------------------
+
+class BatchInferenceTests(SimpleTestCase):
+
+    PUNTOS = [(25.686614, -100.316113, 1), (-33.45, -70.66, 180), (64.1, -21.9, 365), (0.0, 179.99, 92)]
+
+    def setUp(self):
+        if not XGBOOST_DISPONIBLE:
+            self.skipTest("xgboost no está instalado")
+        import warnings
+        warnings.filterwarnings("ignore", category=UserWarning)
+        parche = mock.patch.object(utils, "PREDICTION_CACHE_PRECISION", None)
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def test_lote_igual_a_cada_punto(self):
+        lats, lons, dias = zip(*self.PUNTOS)
+        for motor in ("numpy", "native", "sklearn"):
+            with self.subTest(motor=motor), mock.patch.object(utils, "PREDICTION_ENGINE", motor):
+                lote = predecir_condicion_batch(lats, lons, dias)
+                for i, (lat, lon, dia) in enumerate(self.PUNTOS):
+                    punto = predecir_condicion(lat, lon, dia)
+                    self.assertEqual(punto["condition"], lote["condition"][i])
+                    for var in VARIABLE_MAP:
+                        self.assertEqual(punto[var], lote[var][i], var)
+
+    def test_largos_distintos(self):
+        with self.assertRaises(ValueError):
+            predecir_condicion_batch([1, 2], [1], [1, 2])
+
+
+# ----------------------------------------------------------------------
+# Boosters nativos (app/native_models.py)
+# ----------------------------------------------------------------------
+
+class NativeModelTests(SimpleTestCase):
+    """Los .ubj exportados predicen lo mismo que los .pkl de los que salen."""
+
+    def setUp(self):
+        if not XGBOOST_DISPONIBLE:
+            self.skipTest("xgboost no está instalado")
+        import joblib
+        import pandas as pd
+        import warnings
+
+        self.joblib = joblib
+        warnings.filterwarnings("ignore", category=UserWarning)
+
+        rng = np.random.default_rng(402)
+        n = 300
+        dias = rng.integers(1, 366, n)
+        self.columnas = {
+            "lat": rng.uniform(-90, 90, n),
+            "lon": rng.uniform(-180, 180, n),
+            "sin_day": np.sin(2 * np.pi * dias / 365),
+            "cos_day": np.cos(2 * np.pi * dias / 365),
+        }
+        self.X = pd.DataFrame(self.columnas)
+
+    def test_regresores_coinciden(self):
+        for var in VARIABLE_MAP:
+            with self.subTest(var=var):
+                modelo = self.joblib.load(MODELOS_DIR / f"{var}_regressor.pkl")
+                nativo = cargar_nativo(MODELOS_DIR / f"{var}_regressor{EXTENSION_NATIVA}")
+                esperado = modelo.predict(self.X[list(modelo.feature_names_in_)])
+                np.testing.assert_allclose(nativo.predict(self.columnas), esperado, rtol=1e-6, atol=1e-6)
+
+    def test_clasificador_coincide(self):
+        import pandas as pd
+
+        columnas = dict(self.columnas)
+        for var in VARIABLE_MAP:
+            modelo = self.joblib.load(MODELOS_DIR / f"{var}_regressor.pkl")
+            columnas[var] = modelo.predict(self.X[list(modelo.feature_names_in_)])
+
+        clf = self.joblib.load(MODELOS_DIR / "condition_classifier.pkl")
+        nativo = cargar_nativo(MODELOS_DIR / f"condition_classifier{EXTENSION_NATIVA}")
+        self.assertEqual(nativo.classes, np.asarray(clf.classes_).tolist())
+        X = pd.DataFrame(columnas)[list(clf.get_booster().feature_names)]
+        np.testing.assert_array_equal(nativo.predict(columnas), clf.predict(X))
+
+    def test_exportar_y_cargar(self):
+        carpeta = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, carpeta, ignore_errors=True)
+        pkl = carpeta / "uv_index_regressor.pkl"
+        shutil.copy(MODELOS_DIR / pkl.name, pkl)
+
+        destino = exportar_nativo(pkl)
+        self.assertEqual(destino, carpeta / f"uv_index_regressor{EXTENSION_NATIVA}")
+        modelo = self.joblib.load(pkl)
+        nativo = cargar_nativo(destino)
+        self.assertIsNone(nativo.classes)
+        # El buffer por hilo se reutiliza: un lote más chico después de uno grande da lo mismo
+        np.testing.assert_allclose(nativo.predict(self.columnas), modelo.predict(self.X[list(modelo.feature_names_in_)]), rtol=1e-6)
+        pocos = {k: v[:3] for k, v in self.columnas.items()}
+        np.testing.assert_allclose(nativo.predict(pocos), modelo.predict(self.X[list(modelo.feature_names_in_)].iloc[:3]), rtol=1e-6)
+
+
+# ----------------------------------------------------------------------
+# Motor de árboles en NumPy (app/tree_engine.py)
+# ----------------------------------------------------------------------
+
+class TreeEngineTests(SimpleTestCase):
+    """Las predicciones del evaluador en NumPy coinciden con los modelos originales."""
+
+    def setUp(self):
+        if not XGBOOST_DISPONIBLE:
+            self.skipTest("xgboost no está instalado")
+        import joblib
+        import warnings
+
+        self.joblib = joblib
+        warnings.filterwarnings("ignore", category=UserWarning)
+
+        rng = np.random.default_rng(125)
+        n = 500
+        dias = rng.integers(1, 366, n)
+        self.columnas = {
+            "lat": rng.uniform(-90, 90, n),
+            "lon": rng.uniform(-180, 180, n),
+            "sin_day": np.sin(2 * np.pi * dias / 365),
+            "cos_day": np.cos(2 * np.pi * dias / 365),
+        }
+
+    def _cargar(self, nombre):
+        modelo = self.joblib.load(MODELOS_DIR / f"{nombre}.pkl")
+        classes = np.asarray(modelo.classes_).tolist() if hasattr(modelo, "classes_") else None
+        return modelo, TreeEnsemble(aplanar_booster(modelo.get_booster(), classes))
+
+    def test_regresores_coinciden(self):
+        import pandas as pd
+
+        X = pd.DataFrame(self.columnas)
+        for var in VARIABLE_MAP:
+            with self.subTest(var=var):
+                modelo, arboles = self._cargar(f"{var}_regressor")
+                esperado = modelo.predict(X[list(modelo.feature_names_in_)])
+                np.testing.assert_allclose(arboles.predict(self.columnas), esperado, rtol=1e-5, atol=1e-5)
+
+    def test_clasificador_coincide(self):
+        import pandas as pd
+
+        columnas = dict(self.columnas)
+        for var in VARIABLE_MAP:
+            modelo, _ = self._cargar(f"{var}_regressor")
+            columnas[var] = modelo.predict(pd.DataFrame(self.columnas)[list(modelo.feature_names_in_)])
+
+        clf, arboles = self._cargar("condition_classifier")
+        X = pd.DataFrame(columnas)[list(clf.get_booster().feature_names)]
+        np.testing.assert_allclose(arboles.margin(X.to_numpy()), clf.predict(X, output_margin=True), rtol=1e-5, atol=1e-5)
+        np.testing.assert_array_equal(arboles.predict(columnas), clf.predict(X))
+
+
+# ----------------------------------------------------------------------
+# Regresor multisalida (MULTI_OUTPUT_REGRESSOR)
+# ----------------------------------------------------------------------
+
+class MultiOutputRegressorTests(SimpleTestCase):
+    """
+    Con un multi_regressor pequeño (entrenado aquí, con los mismos artefactos que deja
+    data/modelo.py --multisalida) los tres motores dan sus salidas y la misma condición.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        if not XGBOOST_DISPONIBLE:
+            raise unittest.SkipTest("xgboost no está instalado")
+        import json
+        import joblib
+        import pandas as pd
+        from xgboost import XGBRegressor
+
+        rng = np.random.default_rng(606)
+        n = 400
+        dias = rng.integers(1, 366, n)
+        X = pd.DataFrame({
+            "lat": rng.uniform(-90, 90, n),
+            "lon": rng.uniform(-180, 180, n),
+            "sin_day": np.sin(2 * np.pi * dias / 365),
+            "cos_day": np.cos(2 * np.pi * dias / 365),
+        })
+        Y = np.column_stack([X["lat"] * (k + 1) / 10 + X["sin_day"] * k for k in range(len(VARIABLE_MAP))])
+        cls.modelo = XGBRegressor(
+            n_estimators=8, max_depth=3, tree_method="hist", multi_strategy="multi_output_tree"
+        ).fit(X, Y)
+        cls.modelo.get_booster().set_attr(targets=json.dumps(list(VARIABLE_MAP)))
+
+        cls.carpeta = Path(tempfile.mkdtemp())
+        pkl = cls.carpeta / "multi_regressor.pkl"
+        joblib.dump(cls.modelo, pkl)
+        exportar_nativo(pkl)
+        exportar_arboles(pkl)
+        for extension in (".pkl", EXTENSION_NATIVA, EXTENSION_ARBOLES):
+            shutil.copy(MODELOS_DIR / f"condition_classifier{extension}", cls.carpeta)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.carpeta, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        import warnings
+        warnings.filterwarnings("ignore", category=UserWarning)
+        for nombre, valor in (("MODELOS_DIR", self.carpeta), ("MULTI_OUTPUT_REGRESSOR", True), ("PREDICTION_CACHE_PRECISION", None)):
+            parche = mock.patch.object(utils, nombre, valor)
+            parche.start()
+            self.addCleanup(parche.stop)
+
+    def test_motores_coinciden_con_el_modelo(self):
+        import pandas as pd
+
+        lats, lons, dias = [25.68, -33.45, 64.1, 0.0], [-100.31, -70.66, -21.9, 179.99], [1, 180, 365, 92]
+        dia = np.asarray(dias)
+        X = pd.DataFrame({"lat": lats, "lon": lons, "sin_day": np.sin(2 * np.pi * dia / 365), "cos_day": np.cos(2 * np.pi * dia / 365)})
+        esperado = self.modelo.predict(X)
+
+        condiciones = {}
+        for motor in ("numpy", "native", "sklearn"):
+            with self.subTest(motor=motor), mock.patch.object(utils, "PREDICTION_ENGINE", motor):
+                lote = predecir_condicion_batch(lats, lons, dias)
+                for k, var in enumerate(VARIABLE_MAP):
+                    np.testing.assert_allclose(lote[var], esperado[:, k], rtol=1e-5, atol=1e-5, err_msg=var)
+                condiciones[motor] = list(lote["condition"])
+        self.assertEqual(condiciones["numpy"], condiciones["sklearn"])
+        self.assertEqual(condiciones["native"], condiciones["sklearn"])
+
+    def test_sin_regresores_individuales(self):
+        # La carpeta solo tiene el multisalida: ningún regresor individual se intenta cargar
+        with mock.patch.object(utils, "_cargar_modelo", wraps=utils._cargar_modelo) as cargar:
+            predecir_condicion_batch([10.0], [20.0], [5])
+        nombres = [llamada.args[0] for llamada in cargar.call_args_list]
+        self.assertEqual(nombres, ["multi_regressor", "condition_classifier"])
+
+
+# ----------------------------------------------------------------------
+# Caché de predicciones (app/prediction_cache.py)
+# ----------------------------------------------------------------------
+
+class PredictionCacheTests(SimpleTestCase):
+
+    def test_lru_desaloja_la_menos_usada(self):
+        cache = PredictionCache(max_entries=2, ttl=60)
+        cache.set("a", "v1", 1)
+        cache.set("b", "v1", 2)
+        self.assertEqual(cache.get("a", "v1"), 1)  # "b" queda como la menos usada
+        cache.set("c", "v1", 3)
+
+        self.assertIsNone(cache.get("b", "v1"))
+        self.assertEqual(cache.get("a", "v1"), 1)
+        self.assertEqual(cache.get("c", "v1"), 3)
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertEqual(cache.stats()["entries"], 2)
+
+    def test_ttl_vence_las_entradas(self):
+        cache = PredictionCache(max_entries=10, ttl=60)
+        with mock.patch("app.prediction_cache.time.monotonic", return_value=1000.0):
+            cache.set("a", "v1", 1)
+        with mock.patch("app.prediction_cache.time.monotonic", return_value=1059.0):
+            self.assertEqual(cache.get("a", "v1"), 1)
+        with mock.patch("app.prediction_cache.time.monotonic", return_value=1060.0):
+            self.assertIsNone(cache.get("a", "v1"))
+        self.assertEqual(cache.stats()["expirations"], 1)
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_cambio_de_version_invalida(self):
+        cache = PredictionCache(max_entries=10, ttl=60)
+        cache.set("a", "v1", 1)
+        cache.set("b", "v1", 2)
+
+        self.assertIsNone(cache.get("a", "v2"))
+        self.assertEqual(cache.stats()["entries"], 0)
+        self.assertEqual(cache.stats()["model_version"], "v2")
+        # Una lectura con la versión vieja tampoco revive lo borrado
+        self.assertIsNone(cache.get("b", "v1"))
+
+    @override_settings(CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "pred-default"},
+        "compartida": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "pred-compartida"},
+    })
+    def test_alias_compartido_entre_procesos(self):
+        from django.core.cache import caches
+
+        escritor = PredictionCache(max_entries=10, ttl=60, alias="compartida")
+        lector = PredictionCache(max_entries=10, ttl=60, alias="compartida")
+        escritor.set("a", "v1", {"uv_index": 3.0})
+        self.assertEqual(caches["compartida"].get("pred:v1:a"), {"uv_index": 3.0})
+
+        # El otro "worker" no la tiene localmente: la toma del backend y la guarda en su LRU
+        self.assertEqual(lector.get("a", "v1"), {"uv_index": 3.0})
+        self.assertEqual(lector.stats()["shared_hits"], 1)
+        self.assertEqual(lector.stats()["entries"], 1)
+        self.assertEqual(lector.get("a", "v1"), {"uv_index": 3.0})
+        self.assertEqual(lector.stats()["shared_hits"], 1)
+
+        # Con otra versión del modelo la llave compartida es otra
+        self.assertIsNone(lector.get("a", "v2"))
+
+    def test_precision_agrupa_la_celda(self):
+        if not XGBOOST_DISPONIBLE:
+            self.skipTest("xgboost no está instalado")
+        import warnings
+        warnings.filterwarnings("ignore", category=UserWarning)
+
+        cache = PredictionCache(max_entries=10, ttl=60)
+        with mock.patch.object(utils, "prediction_cache", cache), \
+                mock.patch.object(utils, "PREDICTION_CACHE_PRECISION", 2), \
+                mock.patch.object(utils, "_predecir_punto", wraps=utils._predecir_punto) as predecir:
+            uno = predecir_condicion(25.6861, -100.3161, 10)
+            dos = predecir_condicion(25.6851, -100.3158, 10)
+
+        predecir.assert_called_once_with(25.69, -100.32, 10)
+        self.assertEqual((dos["lat"], dos["lon"]), (25.6851, -100.3158))
+        self.assertEqual({k: v for k, v in uno.items() if k not in ("lat", "lon")}, {k: v for k, v in dos.items() if k not in ("lat", "lon")})
+
+    def test_desactivada_por_defecto(self):
+        self.assertIsNone(utils.PREDICTION_CACHE_PRECISION)
+
+
+# ----------------------------------------------------------------------
+# Malla precalculada (app/forecast_grid.py, manage.py build_forecast_grid)
+# ----------------------------------------------------------------------
+
+class ForecastGridTests(TestCase):
+    """Malla de 45° × 90°: 5 latitudes (con los polos) × 4 longitudes, los 365 días."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        if not XGBOOST_DISPONIBLE:
+            raise unittest.SkipTest("xgboost no está instalado")
+        import warnings
+        warnings.filterwarnings("ignore", category=UserWarning)
+        cls.carpeta = Path(tempfile.mkdtemp())
+        cls.path = cls.carpeta / "grid.f32"
+        call_command("build_forecast_grid", "--lat-step", "45", "--lon-step", "90", "--output", str(cls.path), stdout=StringIO())
+        cls.grid = ForecastGrid(cls.path)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.carpeta, ignore_errors=True)
+        super().tearDownClass()
+
+    def _nodo(self, i, j, dia):
+        return self.grid.cubo[dia - 1, i, j, :len(self.grid.variables)]
+
+    def test_header(self):
+        self.assertEqual(self.grid.header["lats"], [-90, -45, 0, 45, 90])
+        self.assertEqual(self.grid.header["lons"], [-180, -90, 0, 90])
+        self.assertEqual(self.grid.variables, list(VARIABLE_MAP))
+        self.assertTrue(self.grid.classes)
+        self.assertTrue(self.grid.header["model_version"])
+
+    def test_nodos_igual_al_modelo(self):
+        lats, lons = np.meshgrid(self.grid.header["lats"], self.grid.header["lons"], indexing="ij")
+        for dia in (1, 200, 365):
+            with self.subTest(dia=dia):
+                n = lats.size
+                esperado = predecir_condicion_batch(lats.ravel(), lons.ravel(), np.full(n, dia))
+                obtenido = self.grid.interpolar(lats.ravel(), lons.ravel(), np.full(n, dia))
+                for var in VARIABLE_MAP:
+                    np.testing.assert_allclose(obtenido[var], np.asarray(esperado[var], dtype=np.float32), rtol=1e-6, err_msg=var)
+                np.testing.assert_array_equal(obtenido["condition"], esperado["condition"])
+
+    def test_bilineal_y_antimeridiano(self):
+        # Centro de la celda (0..45, 0..90): promedio de sus cuatro nodos
+        centro = self.grid.lookup(22.5, 45, 10)
+        promedio = (self._nodo(2, 2, 10) + self._nodo(2, 3, 10) + self._nodo(3, 2, 10) + self._nodo(3, 3, 10)) / 4
+        np.testing.assert_allclose([centro[v] for v in self.grid.variables], promedio, rtol=1e-5)
+
+        # Entre 90° y 180° (= -180°) la celda da la vuelta: a 135° es el promedio de ambas columnas
+        vuelta = self.grid.lookup(0, 135, 10)
+        np.testing.assert_allclose([vuelta[v] for v in self.grid.variables], (self._nodo(2, 3, 10) + self._nodo(2, 0, 10)) / 2, rtol=1e-5)
+        este, oeste = self.grid.lookup(10, 179.999, 10), self.grid.lookup(10, -180.001, 10)
+        np.testing.assert_allclose([este[v] for v in self.grid.variables], [oeste[v] for v in self.grid.variables], rtol=1e-4)
+
+    def test_vista_con_el_esquema_normal(self):
+        invalidar_spatial_index()
+        client = APIClient()
+        url = reverse("clima-actual")
+        location = Location.objects.create(city="Quito", latitude=-0.18, longitude=-78.47)
+        crear_pronostico(location, date(2025, 10, 1), CO_surface_conc="0.5")
+        normal = client.get(url, {"lat": 0, "lon": -78}).json()
+        with mock.patch.object(views, "get_grid", return_value=self.grid):
+            malla = client.get(url, {"lat": 0, "lon": -78, "mode": "grid"}).json()
+        self.assertEqual(list(malla), list(normal))
+        self.assertEqual(malla["metadata"]["source"], "forecast_grid")
+        for campo in ("current_temp", "max_temp", "CO_surface_conc", "pressure"):
+            self.assertIsInstance(malla[campo], str)
+            self.assertEqual(len(malla[campo].split(".")[1]), len(normal[campo].split(".")[1]), campo)
+        self.assertIsInstance(malla["condition_summary"], str)
+
+
+# ----------------------------------------------------------------------
+# Índice espacial en memoria (app/spatial.py, estrategia "memory")
+# ----------------------------------------------------------------------
+
+class SpatialIndexTests(TestCase):
+    """El KD-tree (con lápidas y buffer de altas) da lo mismo que recorrer todos los puntos."""
+
+    def setUp(self):
+        rng = np.random.default_rng(1010)
+        n = 3000
+        self.puntos = {
+            int(pk): (lat, lon)
+            for pk, lat, lon in zip(range(1, n + 1), np.degrees(np.arcsin(rng.uniform(-1, 1, n))), rng.uniform(-180, 180, n))
+        }
+        # Consultas al azar más los casos difíciles: polos y antimeridiano
+        self.consultas = [(float(lat), float(lon)) for lat, lon in zip(rng.uniform(-90, 90, 150), rng.uniform(-180, 180, 150))]
+        self.consultas += [(90, 0), (-90, 45), (89.99, 179.99), (0, 180), (0, -179.999), (-45, 179.5)]
+        self.rng = rng
+
+    def _indice(self):
+        pks, coords = zip(*self.puntos.items())
+        lats, lons = zip(*coords)
+        return spatial.SpatialIndex(pks, lats, lons)
+
+    def _fuerza_bruta(self, lat, lon, k=1):
+        pks = np.array(list(self.puntos))
+        lats, lons = np.array(list(self.puntos.values())).T
+        km = haversine_km(lat, lon, lats, lons)
+        orden = np.argsort(km, kind="stable")[:k]
+        return [(int(pks[i]), float(km[i])) for i in orden]
+
+    def _comparar(self, indice):
+        for lat, lon in self.consultas:
+            for k in (1, 5):
+                with self.subTest(lat=lat, lon=lon, k=k):
+                    obtenido, esperado = indice.nearest(lat, lon, k), self._fuerza_bruta(lat, lon, k)
+                    self.assertEqual([pk for pk, _ in obtenido], [pk for pk, _ in esperado])
+                    np.testing.assert_allclose([km for _, km in obtenido], [km for _, km in esperado], rtol=1e-6, atol=1e-6)
+
+        lats, lons = zip(*self.consultas)
+        esperado = [self._fuerza_bruta(lat, lon)[0] for lat, lon in self.consultas]
+        obtenido = indice.nearest_many(lats, lons)
+        self.assertEqual([pk for pk, _ in obtenido], [pk for pk, _ in esperado])
+        np.testing.assert_allclose([km for _, km in obtenido], [km for _, km in esperado], rtol=1e-6, atol=1e-6)
+
+    def test_igual_a_fuerza_bruta(self):
+        self._comparar(self._indice())
+
+    def test_con_lapidas_y_buffer_de_altas(self):
+        indice = self._indice()
+        borrados = self.rng.choice(list(self.puntos), 20, replace=False)
+        for pk in borrados:
+            indice.remove(int(pk))
+            del self.puntos[int(pk)]
+        # Cambios de coordenadas de pks existentes y altas nuevas, algunas junto a las consultas
+        movidos = self.rng.choice(list(self.puntos), 8, replace=False)
+        for pk, (lat, lon) in zip(movidos, self.consultas):
+            self.puntos[int(pk)] = (lat + 0.01, lon)
+            indice.upsert(int(pk), lat + 0.01, lon)
+        for pk, (lat, lon) in enumerate(self.consultas[-7:], start=10_000):
+            self.puntos[pk] = (lat, max(lon - 0.02, -180))
+            indice.upsert(pk, lat, max(lon - 0.02, -180))
+
+        # Sigue sin reconstruirse: las consultas pasan por las lápidas y el buffer
+        self.assertTrue(indice.lapidas and indice.extra)
+        self.assertEqual(len(indice), len(self.puntos))
+        self._comparar(indice)
+
+    def test_query_many_igual_a_query(self):
+        indice = self._indice()
+        arbol = indice.arbol
+        qs = spatial.a_xyz(*zip(*self.consultas))
+        excluir = self.rng.random(len(indice.ids)) < 0.5
+        d2, idx = arbol.query_many(qs, 6, excluir)
+        vivos = np.flatnonzero(~excluir)
+        for n, q in enumerate(qs):
+            d2_todos = ((indice.xyz[vivos] - q) ** 2).sum(axis=1)
+            orden = np.argsort(d2_todos, kind="stable")[:6]
+            self.assertEqual(idx[n].tolist(), vivos[orden].tolist())
+            np.testing.assert_allclose(d2[n], d2_todos[orden])
+        # Menos puntos que k: lo que falta va como inf y -1
+        d2, idx = spatial.KDTree(indice.xyz[:3]).query_many(qs[:2], 5)
+        self.assertTrue((idx[:, 3:] == -1).all())
+        self.assertTrue(np.isinf(d2[:, 3:]).all())
+
+    def test_indice_vacio(self):
+        self.puntos = {}
+        indice = spatial.SpatialIndex([], [], [])
+        self.assertEqual(indice.nearest(10, 10), [])
+        self.assertEqual(indice.nearest_many([10, 20], [10, 20]), [None, None])
+
+    def test_firma_ve_cambios_de_otros_procesos(self):
+        # Otro proceso edita sin pasar por las señales de este: solo la firma lo puede notar
+        invalidar_spatial_index()
+        invalidar_city_trie()
+        lima = Location.objects.create(city="Lima", latitude=-12.05, longitude=-77.04)
+        Location.objects.create(city="Quito", latitude=-0.18, longitude=-78.47)
+        self.assertEqual(spatial.get_spatial_index().nearest(-12, -77)[0][0], lima.pk)
+        self.assertEqual([c["city"] for c in get_city_trie().sugerencias("lim")], ["Lima"])
+
+        with mock.patch.object(spatial, "SPATIAL_INDEX_TTL", 0), mock.patch("app.search.SEARCH_INDEX_TTL", 0):
+            # Mismo conteo y mismo mayor id: solo cambia updated_at
+            Location.objects.filter(pk=lima.pk).update(
+                city="Cusco", search_key="cusco", latitude=-13.53, longitude=-71.97, updated_at=timezone.now()
+            )
+            pk, km = spatial.get_spatial_index().nearest(-13.5, -72)[0]
+            self.assertEqual(pk, lima.pk)
+            self.assertLess(km, 10)
+            self.assertEqual(get_city_trie().sugerencias("lim"), [])
+            self.assertEqual([c["city"] for c in get_city_trie().sugerencias("cus")], ["Cusco"])
+
+    def test_escribir_pronosticos_no_reconstruye_los_indices(self):
+        invalidar_spatial_index()
+        invalidar_city_trie()
+        lima = Location.objects.create(city="Lima", latitude=-12.05, longitude=-77.04)
+        indice, trie = spatial.get_spatial_index(), get_city_trie()
+        clima = reverse("clima-actual")
+        client = APIClient()
+        crear_pronostico(lima, date(2025, 10, 1))
+        etag = client.get(clima, {"lat": -12, "lon": -77})["ETag"]
+
+        with mock.patch.object(spatial, "SPATIAL_INDEX_TTL", 0), mock.patch("app.search.SEARCH_INDEX_TTL", 0):
+            # El puntero latest_forecast se mueve sin cambiar la firma de Location
+            crear_pronostico(lima, date(2025, 10, 2))
+            self.assertIs(spatial.get_spatial_index(), indice)
+            self.assertIs(get_city_trie(), trie)
+        # La respuesta de clima sí cambia: su ETag lleva el pronóstico
+        self.assertEqual(client.get(clima, {"lat": -12, "lon": -77}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+# ----------------------------------------------------------------------
+# Búsqueda de Location por caja lat/lon (app/spatial.py, estrategia "bbox")
+# ----------------------------------------------------------------------
+
+class BoundingBoxLookupTests(TestCase):
+
+    def setUp(self):
+        Location.objects.bulk_create([
+            Location(
+                city=f"Punto {i}",
+                latitude=-80 + i * 0.7,
+                longitude=-179 + i * 1.5,
+                grid_cell=celda_de(-80 + i * 0.7, -179 + i * 1.5),
+            )
+            for i in range(230)
+        ])
+        self.monterrey = Location.objects.create(city="Monterrey", latitude=25.686614, longitude=-100.316113)
+        self.fiyi = Location.objects.create(city="Suva", latitude=-18.1248, longitude=178.4501)
+        self.taveuni = Location.objects.create(city="Taveuni", latitude=-16.8, longitude=179.998)
+
+    def _indice_lat_lon(self):
+        with connection.cursor() as cursor:
+            restricciones = connection.introspection.get_constraints(cursor, Location._meta.db_table)
+        return next(
+            nombre for nombre, info in restricciones.items()
+            if info["index"] and info["columns"][:2] == ["latitude", "longitude"]
+        )
+
+    def test_plan_usa_indice_compuesto(self):
+        plan = Location.objects.filter(filtro_caja(25.68, -100.31, 0.25)).explain()
+        self.assertIn(self._indice_lat_lon(), plan)
+
+    def test_mas_cercana_coincide_con_haversine(self):
+        for lat, lon in [(25.7, -100.3), (-18.0, -179.9), (89.5, 10.0), (0.0, 0.0)]:
+            with self.subTest(lat=lat, lon=lon):
+                todas = list(Location.objects.all())
+                distancias = haversine_km(
+                    lat, lon,
+                    np.array([float(loc.latitude) for loc in todas]),
+                    np.array([float(loc.longitude) for loc in todas]),
+                )
+                self.assertEqual(ubicacion_mas_cercana_bbox(lat, lon), todas[int(np.argmin(distancias))])
+
+    def test_tolerancia_cruza_el_antimeridiano(self):
+        self.assertEqual(ubicacion_en_tolerancia(-16.8, -179.998, 0.01), self.taveuni)
+        self.assertEqual(ubicacion_en_tolerancia(-18.1249, 178.4502, 0.01), self.fiyi)
+        self.assertIsNone(ubicacion_en_tolerancia(-18.2, 178.4501, 0.01))
+
+    def test_lote_coincide_y_con_pocas_consultas(self):
+        rng = np.random.default_rng(13)
+        puntos = [(float(lat), float(lon)) for lat, lon in zip(rng.uniform(-89, 89, 100), rng.uniform(-180, 180, 100))]
+        puntos += [(25.7, -100.3), (-18.0, -179.9), (89.5, 10.0), (-16.8, -179.999)]
+        esperado = [ubicacion_mas_cercana_bbox(lat, lon).pk for lat, lon in puntos]
+
+        with CaptureQueriesContext(connection) as consultas:
+            obtenido = ubicaciones_mas_cercanas_bbox(puntos)
+        self.assertEqual(obtenido, esperado)
+        # Las celdas vecinas y unas pocas rondas de cajas unidas, no varias consultas por punto
+        self.assertLessEqual(len(consultas), 4)
+
+        with mock.patch.object(spatial, "LOCATION_LOOKUP", "bbox"):
+            self.assertEqual(spatial.ubicaciones_mas_cercanas(puntos[:3]), esperado[:3])
+        self.assertEqual(ubicaciones_mas_cercanas_bbox([]), [])
+
+    def test_lote_sin_ubicaciones(self):
+        Location.objects.all().delete()
+        self.assertEqual(ubicaciones_mas_cercanas_bbox([(0, 0), (10, 10)]), [None, None])
+
+
+# ----------------------------------------------------------------------
+# Celda de la malla en Location (app/models.py)
+# ----------------------------------------------------------------------
+
+class GridCellTests(TestCase):
+
+    def test_celda_se_calcula_al_guardar(self):
+        loc = Location.objects.create(city="Monterrey", latitude=25.686614, longitude=-100.316113)
+        self.assertEqual(loc.grid_cell, celda_de(25.686614, -100.316113))
+        loc.latitude = 25.7
+        loc.save()
+        self.assertEqual(Location.objects.get(pk=loc.pk).grid_cell, celda_de(25.7, -100.316113))
+
+    def test_columnas_internas_fuera_de_la_api(self):
+        user = User.objects.create_user("celdas")
+        loc = Location.objects.create(city="Monterrey", latitude=25.686614, longitude=-100.316113)
+        FavoriteLocation.objects.create(user=user, location=loc)
+        publicos = ["id", "city", "state_province", "country", "latitude", "longitude"]
+
+        client = APIClient()
+        self.assertEqual(list(client.get(reverse("location-list")).json()["results"][0]), publicos)
+        self.assertEqual(list(client.get(reverse("location-detail", args=[loc.pk])).json()), publicos)
+        favorito = client.get(reverse("favoritelocation-list")).json()["results"][0]
+        self.assertEqual(list(favorito["location_details"]), publicos)
+
+    def test_vecinas_dan_la_vuelta_en_el_antimeridiano(self):
+        vecinas = celdas_vecinas(0.005, 179.995)
+        self.assertEqual(len(vecinas), 9)
+        self.assertIn(celda_de(0.005, -179.995), vecinas)
+        self.assertEqual(celda_de(0, 180), celda_de(0, -180))
+        self.assertLess(max(celdas_vecinas(90, 0)), 18001 * GRID_COLUMNS)
+
+    def test_una_sola_location_de_prediccion_por_celda(self):
+        celda = celda_de(10.001, 20.001)
+        Location.objects.create(city="Predicción @ Lat 10.0010", latitude=10.001, longitude=20.001, prediction_cell=celda)
+        with self.assertRaises(IntegrityError):
+            Location.objects.create(city="Predicción @ Lat 10.0020", latitude=10.002, longitude=20.002, prediction_cell=celda)
+
+    def test_resolver_reutiliza_la_celda(self):
+        resultado, creadas = resolver_ubicaciones([(10.001, 20.001), (10.004, 20.006), (10.03, 20.03)])
+        self.assertEqual(creadas, 2)
+        self.assertEqual(resultado[(10.001, 20.001)], resultado[(10.004, 20.006)])
+        self.assertEqual(resolver_ubicaciones([(10.002, 20.002)]), ({(10.002, 20.002): resultado[(10.001, 20.001)]}, 0))
+
+    def test_resolver_con_la_fila_de_otro_proceso_fuera_de_la_instantanea(self):
+        # Otro proceso confirmó la Location de la celda después de que empezó nuestra transacción:
+        # bulk_create la ignora por el conflicto y las lecturas normales no la ven
+        ajena = Location.objects.create(
+            city="Predicción @ Lat 10.0010", latitude=10.001, longitude=20.001, prediction_cell=celda_de(10.001, 20.001)
+        )
+        instantanea = lambda *args, **kwargs: Location.objects.none()
+        with mock.patch.object(Location.objects, "filter", side_effect=instantanea):
+            resultado, creadas = resolver_ubicaciones([(10.002, 20.002)])
+        self.assertEqual(resultado, {(10.002, 20.002): ajena})
+        self.assertEqual(creadas, 1)
+        self.assertEqual(Location.objects.count(), 1)
+
+    def test_resolver_sin_fila_para_la_celda(self):
+        with mock.patch.object(Location.objects, "bulk_create"), self.assertRaises(Location.DoesNotExist):
+            resolver_ubicaciones([(10.002, 20.002)])
+
+
+class BulkForecastWriterTests(TestCase):
+    """predecir_y_guardar_pronosticos: conteos, deduplicación y lo que se escribe además de las filas."""
+
+    def setUp(self):
+        if not XGBOOST_DISPONIBLE:
+            self.skipTest("xgboost no está instalado")
+        import warnings
+        warnings.filterwarnings("ignore", category=UserWarning)
+        self.d1, self.d2 = date(2025, 10, 1), date(2025, 10, 2)
+        self.puntos = [
+            (10.001, 20.001, self.d1),
+            # Misma celda de tolerancia y misma fecha que el anterior: una sola fila, gana el último
+            (10.004, 20.006, self.d1),
+            (10.001, 20.001, self.d2),
+            (-33.45, -70.66, self.d1),
+        ]
+
+    def _escribir(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return predecir_y_guardar_pronosticos(self.puntos)
+
+    def test_inserta_y_luego_actualiza(self):
+        self.assertEqual(self._escribir(), {"inserted": 3, "updated": 0, "locations_created": 2})
+        self.assertEqual(Location.objects.count(), 2)
+        forecasts = {(f.location_id, f.date): f for f in DailyForecast.objects.all()}
+        self.assertEqual(len(forecasts), 3)
+
+        cerca = Location.objects.get(prediction_cell=celda_de(10.001, 20.001))
+        lejos = Location.objects.get(prediction_cell=celda_de(-33.45, -70.66))
+        # Puntero al pronóstico de mayor fecha, JSON prerenderizado y registro de cambios de cada fila
+        self.assertEqual(cerca.latest_forecast_id, forecasts[(cerca.pk, self.d2)].pk)
+        self.assertEqual(lejos.latest_forecast_id, forecasts[(lejos.pk, self.d1)].pk)
+        ids = sorted(f.pk for f in forecasts.values())
+        self.assertEqual(sorted(ForecastBlob.objects.values_list("daily_forecast_id", flat=True)), ids)
+        self.assertEqual(sorted(ChangeLog.objects.filter(kind=ChangeLog.DAILY).values_list("object_id", flat=True)), ids)
+
+        # La fila guardada es la predicción mapeada del punto (el último de los repetidos)
+        ultimo = predecir_condicion_batch([10.004], [20.006], [self.d1.timetuple().tm_yday])
+        esperado = mapear_prediccion({"condition": ultimo["condition"][0], **{var: ultimo[var][0] for var in VARIABLE_MAP}})
+        guardado = forecasts[(cerca.pk, self.d1)]
+        for campo, valor in esperado.items():
+            field = DailyForecast._meta.get_field(campo)
+            valor = field.to_python(valor)
+            if isinstance(valor, Decimal):
+                valor = valor.quantize(Decimal(1).scaleb(-field.decimal_places))
+            self.assertEqual(getattr(guardado, campo), valor, campo)
+
+        antes = {pk: DailyForecast.objects.get(pk=pk).updated_at for pk in ids}
+        self.assertEqual(self._escribir(), {"inserted": 0, "updated": 3, "locations_created": 0})
+        self.assertEqual(sorted(DailyForecast.objects.values_list("pk", flat=True)), ids)
+        for pk, updated_at in antes.items():
+            self.assertGreater(DailyForecast.objects.get(pk=pk).updated_at, updated_at)
+        self.assertEqual(ChangeLog.objects.filter(kind=ChangeLog.DAILY).count(), 6)
+        self.assertEqual(ForecastBlob.objects.count(), 3)
+
+    def test_sin_puntos(self):
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(predecir_y_guardar_pronosticos([]), {"inserted": 0, "updated": 0, "locations_created": 0})
+        self.assertEqual(len(consultas), 0)
+
+
+# ----------------------------------------------------------------------
+# manage.py refresh_forecasts (bloques, vigencia y checkpoint)
+# ----------------------------------------------------------------------
+
+class RefreshForecastsTests(TestCase):
+
+    def setUp(self):
+        if not XGBOOST_DISPONIBLE:
+            self.skipTest("xgboost no está instalado")
+        import warnings
+        warnings.filterwarnings("ignore", category=UserWarning)
+        carpeta = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, carpeta, ignore_errors=True)
+        self.checkpoint = carpeta / "checkpoint.json"
+        self.hoy = date(2025, 10, 1)
+        self.lima = Location.objects.create(city="Lima", latitude=-12.05, longitude=-77.04)
+        self.quito = Location.objects.create(city="Quito", latitude=-0.18, longitude=-78.47)
+
+    def _refrescar(self, *extra):
+        salida = StringIO()
+        call_command(
+            "refresh_forecasts", "--start", str(self.hoy), "--days", "2", "--workers", "1",
+            "--shard-size", "1", "--checkpoint", str(self.checkpoint), *extra, stdout=salida,
+        )
+        return salida.getvalue()
+
+    def test_solo_recalcula_lo_vencido(self):
+        vigente = crear_pronostico(self.lima, self.hoy)
+        vencido = crear_pronostico(self.lima, self.hoy + timedelta(days=1))
+        hace_dos_dias = timezone.now() - timedelta(hours=48)
+        DailyForecast.objects.filter(pk=vencido.pk).update(updated_at=hace_dos_dias)
+        vigente.refresh_from_db()
+
+        salida = self._refrescar("--max-age", "24")
+
+        # Lima: solo el vencido; Quito: sus dos días
+        self.assertIn("3 pronósticos escritos, 1 ya vigentes omitidos", salida)
+        self.assertEqual(DailyForecast.objects.get(pk=vigente.pk).updated_at, vigente.updated_at)
+        self.assertGreater(DailyForecast.objects.get(pk=vencido.pk).updated_at, hace_dos_dias)
+        self.assertEqual(DailyForecast.objects.filter(location=self.quito).count(), 2)
+        self.assertFalse(self.checkpoint.exists())
+
+    def test_force_recalcula_todo(self):
+        crear_pronostico(self.lima, self.hoy)
+        self.assertIn("4 pronósticos escritos, 0 ya vigentes omitidos", self._refrescar("--force"))
+
+    def test_max_age_negativo(self):
+        with self.assertRaises(CommandError):
+            self._refrescar("--max-age", "-1")
+
+    def test_reanuda_desde_el_checkpoint(self):
+        procesar = refresh_forecasts._procesar_shard
+
+        def falla_en_el_segundo(args):
+            if args[0] == 1:
+                raise RuntimeError("worker caído")
+            return procesar(args)
+
+        with mock.patch.object(refresh_forecasts, "_procesar_shard", side_effect=falla_en_el_segundo):
+            with self.assertRaises(RuntimeError):
+                self._refrescar()
+        self.assertEqual(json.loads(self.checkpoint.read_text())["hechos"], [0])
+        self.assertEqual(DailyForecast.objects.filter(location=self.lima).count(), 2)
+        self.assertFalse(DailyForecast.objects.filter(location=self.quito).exists())
+
+        with mock.patch.object(refresh_forecasts, "_procesar_shard", wraps=procesar) as procesados:
+            salida = self._refrescar()
+        self.assertIn("Reanudando: 1/2 bloques ya completados.", salida)
+        self.assertEqual([llamada.args[0][0] for llamada in procesados.call_args_list], [1])
+        self.assertEqual(DailyForecast.objects.filter(location=self.quito).count(), 2)
+        self.assertFalse(self.checkpoint.exists())
+
+        # Con --no-resume se ignora un checkpoint que haya quedado
+        self.checkpoint.write_text(json.dumps({"firma": "otra", "hechos": [0, 1]}))
+        self.assertNotIn("Reanudando", self._refrescar("--no-resume"))
+
+
+# ----------------------------------------------------------------------
+# POST /api/clima-actual/lote/ (varias coordenadas por petición)
+# ----------------------------------------------------------------------
+
+class CurrentWeatherBatchTests(TestCase):
+
+    def setUp(self):
+        invalidar_spatial_index()
+        self.client = APIClient()
+        self.url = reverse("clima-actual-lote")
+        hoy = date(2025, 10, 1)
+        self.locations = [
+            Location.objects.create(city=f"Ciudad {i}", latitude=-60 + i * 6, longitude=-170 + i * 17)
+            for i in range(20)
+        ]
+        for i, loc in enumerate(self.locations[:-1]):
+            for d in range(3):
+                crear_pronostico(loc, hoy - timedelta(days=d), current_temp=i + d)
+        self.hoy = hoy
+
+    def test_orden_de_entrada_y_pronostico_mas_reciente(self):
+        puntos = [{"lat": float(loc.latitude) + 0.1, "lon": float(loc.longitude) - 0.1} for loc in reversed(self.locations)]
+        respuesta = self.client.post(self.url, {"points": puntos}, format="json")
+        self.assertEqual(respuesta.status_code, 200)
+        resultados = respuesta.json()["results"]
+
+        self.assertIn("error", resultados[0])
+        for resultado, loc in zip(resultados[1:], list(reversed(self.locations))[1:]):
+            self.assertEqual(resultado["metadata"]["found_city"], loc.city)
+            self.assertEqual(resultado["date"], str(self.hoy))
+
+    def test_consultas_constantes(self):
+        puntos = [{"lat": float(loc.latitude), "lon": float(loc.longitude)} for loc in self.locations] * 5
+        self.client.post(self.url, {"points": puntos[:1]}, format="json")  # construye el índice
+        with self.assertNumQueries(3):
+            self.client.post(self.url, {"points": puntos[:1]}, format="json")
+        with self.assertNumQueries(3):
+            self.client.post(self.url, {"points": puntos}, format="json")
+
+    def test_valida_la_entrada(self):
+        self.assertEqual(self.client.post(self.url, {"points": []}, format="json").status_code, 400)
+        self.assertEqual(self.client.post(self.url, {"points": [{"lat": "x", "lon": 1}]}, format="json").status_code, 400)
+        self.assertEqual(self.client.post(self.url, {"points": [{"lat": "nan", "lon": 1}]}, format="json").status_code, 400)
+        demasiados = [{"lat": 0, "lon": 0}] * 101
+        self.assertEqual(self.client.post(self.url, {"points": demasiados}, format="json").status_code, 400)
+
+
+# ----------------------------------------------------------------------
+# GET /api/clima-actual/?mode=idw (app/interpolation.py)
+# ----------------------------------------------------------------------
+
+class IdwInterpolationTests(TestCase):
+
+    def setUp(self):
+        invalidar_spatial_index()
+        self.client = APIClient()
+        self.url = reverse("clima-actual")
+        self.a = Location.objects.create(city="A", latitude=10, longitude=10)
+        self.b = Location.objects.create(city="B", latitude=10, longitude=10.2)
+        self.lejos = Location.objects.create(city="Lejos", latitude=-40, longitude=100)
+        crear_pronostico(self.a, date(2025, 9, 30), current_temp=99)
+        crear_pronostico(self.a, date(2025, 10, 1), current_temp=10, humidity=40, O3_concentration=2)
+        crear_pronostico(self.b, date(2025, 10, 1), current_temp=30, humidity=80, condition_summary="Rain")
+        crear_pronostico(self.lejos, date(2025, 10, 1), current_temp=-5)
+
+    def test_mezcla_ponderada_por_distancia(self):
+        datos = self.client.get(self.url, {"lat": 10, "lon": 10.05, "mode": "idw", "k": 2}).json()
+        d_a = float(haversine_km(10, 10.05, 10, 10))
+        d_b = float(haversine_km(10, 10.05, 10, 10.2))
+        w_a = (1 / d_a ** 2) / (1 / d_a ** 2 + 1 / d_b ** 2)
+
+        # Los DecimalField salen como en la respuesta normal: texto con los decimales del campo
+        self.assertEqual(datos["current_temp"], str(Decimal(10 * w_a + 30 * (1 - w_a)).quantize(Decimal("0.1"))))
+        self.assertEqual(datos["humidity"], round(40 * w_a + 80 * (1 - w_a)))
+        # Solo A tiene O3: el nulo de B no arrastra el promedio
+        self.assertEqual(datos["O3_concentration"], "2.000000")
+        self.assertEqual(datos["condition_summary"], "Sunny")
+        self.assertEqual([v["city"] for v in datos["metadata"]["neighbors"]], ["A", "B"])
+
+    def test_mismo_esquema_que_la_respuesta_normal(self):
+        normal = self.client.get(self.url, {"lat": 10, "lon": 10.05}).json()
+        idw = self.client.get(self.url, {"lat": 10, "lon": 10.05, "mode": "idw"}).json()
+        self.assertEqual(list(idw), list(normal))
+        for campo, valor in normal.items():
+            if campo != "metadata" and valor is not None and idw[campo] is not None:
+                self.assertIs(type(idw[campo]), type(valor), campo)
+
+    def test_mezcla_con_tipos_del_campo(self):
+        a, b = DailyForecast.objects.filter(date=date(2025, 10, 1), location__in=[self.a, self.b]).order_by("location")
+        mezcla = mezclar_idw([a, b], [1.0, 1.0])
+        self.assertEqual(mezcla["current_temp"], Decimal("20.0"))
+        self.assertEqual(mezcla["O3_concentration"], Decimal("2.000000"))
+        self.assertEqual(mezcla["humidity"], 60)
+
+    def test_punto_exacto_y_k_invalido(self):
+        datos = self.client.get(self.url, {"lat": 10, "lon": 10.2, "mode": "idw"}).json()
+        self.assertEqual(datos["current_temp"], "30.0")
+        self.assertEqual(self.client.get(self.url, {"lat": 10, "lon": 10, "mode": "idw", "k": 0}).status_code, 400)
+
+    def test_coordenadas_no_finitas(self):
+        # float() acepta nan/inf: se rechazan con 400 en todos los modos (antes, 500 en idw)
+        for modo in ("idw", "grid", None):
+            for lat, lon in (("nan", -3.7), (10, "inf"), ("-inf", 10)):
+                params = {"lat": lat, "lon": lon}
+                if modo:
+                    params["mode"] = modo
+                self.assertEqual(self.client.get(self.url, params).status_code, 400, params)
+
+    def test_una_consulta_de_pronosticos(self):
+        self.client.get(self.url, {"lat": 10, "lon": 10.05, "mode": "idw"})  # construye el índice
+        with self.assertNumQueries(1):
+            self.client.get(self.url, {"lat": 10, "lon": 10.05, "mode": "idw", "k": 3})
+
+    def test_bbox_coincide_con_el_indice(self):
+        esperado = k_mas_cercanas(10, 10.05, 3)
+        original = spatial.LOCATION_LOOKUP
+        spatial.LOCATION_LOOKUP = "bbox"
+        try:
+            obtenido = k_mas_cercanas(10, 10.05, 3)
+        finally:
+            spatial.LOCATION_LOOKUP = original
+        self.assertEqual([pk for pk, _ in obtenido], [pk for pk, _ in esperado])
+        np.testing.assert_allclose([km for _, km in obtenido], [km for _, km in esperado], rtol=1e-6)
+
+
+# ----------------------------------------------------------------------
+# Búsqueda de ciudades sin acentos y autocompletado (app/search.py)
+# ----------------------------------------------------------------------
+
+class CitySearchTests(TestCase):
+
+    def setUp(self):
+        invalidar_city_trie()
+        self.client = APIClient()
+        self.url = reverse("city-autocomplete")
+        ciudades = ["San Pedro Garza García", "Pedro Escobedo", "Monterrey", "Montemorelos", "Tokio", "San Pedro", "Montréal"]
+        self.locations = {
+            nombre: Location.objects.create(city=nombre, latitude=10 + i, longitude=10 + i)
+            for i, nombre in enumerate(ciudades)
+        }
+
+    def test_normalizar(self):
+        self.assertEqual(normalizar_busqueda("  España  "), "espana")
+        self.assertEqual(normalizar_busqueda("MONTRÉAL"), normalizar_busqueda("montreal"))
+
+    def test_buscar_ciudad_exacta_prefijo_subcadena(self):
+        self.assertEqual(buscar_ciudad("TOKIO"), self.locations["Tokio"])
+        self.assertEqual(buscar_ciudad("san pedro"), self.locations["San Pedro"])
+        self.assertEqual(buscar_ciudad("montre"), self.locations["Montréal"])
+        self.assertEqual(buscar_ciudad("garcia"), self.locations["San Pedro Garza García"])
+        self.assertIsNone(buscar_ciudad("Madrid"))
+
+    def test_autocompletado_ordenado(self):
+        resultados = self.client.get(self.url, {"q": "PEDRO"}).json()["results"]
+        self.assertEqual(
+            [(r["city"], r["match"]) for r in resultados],
+            [("Pedro Escobedo", "prefix"), ("San Pedro", "word"), ("San Pedro Garza García", "word")],
+        )
+        resultados = self.client.get(self.url, {"q": "san pedro"}).json()["results"]
+        self.assertEqual(resultados[0]["match"], "exact")
+        self.assertEqual([r["city"] for r in self.client.get(self.url, {"q": "mont", "limit": 2}).json()["results"]],
+                         ["Montréal", "Monterrey"])
+
+    def test_autocompletado_sin_consultas_y_al_dia(self):
+        self.client.get(self.url, {"q": "to"})  # construye el trie
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url, {"q": "tó"}).json()["results"][0]["city"], "Tokio")
+
+        nueva = Location.objects.create(city="Torreón", latitude=25.5, longitude=-103.4)
+        self.assertIn("Torreón", [r["city"] for r in self.client.get(self.url, {"q": "torreon"}).json()["results"]])
+        nueva.delete()
+        self.assertEqual(self.client.get(self.url, {"q": "torreon"}).json()["results"], [])
+        self.assertEqual(self.client.get(self.url, {"q": " "}).status_code, 400)
+
+
+class FuzzyCitySearchTests(TestCase):
+
+    def setUp(self):
+        invalidar_trigram_index()
+        self.client = APIClient()
+        ciudades = [
+            ("Monterrey", "N.L.", "Mexico"), ("Nueva York", "NY", "Estados Unidos"), ("Tokio", None, "Japón"),
+            ("San José", "California", "Estados Unidos"), ("San José", None, "Costa Rica"), ("Montevideo", None, "Uruguay"),
+        ]
+        self.locations = [
+            Location.objects.create(city=city, state_province=state, country=country, latitude=i, longitude=i)
+            for i, (city, state, country) in enumerate(ciudades)
+        ]
+
+    def test_erratas(self):
+        for consulta, esperada in [("Monterey", "Monterrey"), ("Nueva Yrok", "Nueva York"), ("Tokyo", "Tokio")]:
+            with self.subTest(consulta=consulta):
+                location, similitud = ciudad_parecida(consulta)
+                self.assertEqual(location.city, esperada)
+                self.assertGreaterEqual(similitud, 0.3)
+        self.assertEqual(ciudad_parecida("Ulan Bator"), (None, None))
+
+    def test_estado_o_pais_desempata(self):
+        self.assertEqual(ciudad_parecida("San Jose, Costa Rica")[0], self.locations[4])
+        self.assertEqual(ciudad_parecida("San Jose, California")[0], self.locations[3])
+
+    def test_clima_por_ciudad_usa_la_busqueda_difusa(self):
+        crear_pronostico(self.locations[0], date(2025, 10, 1))
+        respuesta = self.client.get(reverse("city-weather"), {"city": "Monterey"})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()["metadata"]["found_city"], "Monterrey")
+        self.assertIn("similarity", respuesta.json()["metadata"])
+
+        Location.objects.create(city="Monterey", state_province="California", latitude=36.6, longitude=-121.9)
+        self.assertEqual(ciudad_parecida("Monterey")[0].state_province, "California")
+
+
+# ----------------------------------------------------------------------
+# Consultas por endpoint (sin N+1 en los serializers anidados)
+# ----------------------------------------------------------------------
+
+class QueryCountTests(TestCase):
+    """Cada endpoint hace el mismo número de consultas con 1, 10 o 1000 filas."""
+
+    TAMANOS = (1, 10, 1000)
+
+    def setUp(self):
+        invalidar_spatial_index()
+        invalidar_city_trie()
+        invalidar_trigram_index()
+        self.client = APIClient()
+        self.user = User.objects.create_user("consultas")
+
+    def _crear(self, n):
+        """n Location, cada una con un pronóstico (2 horas y 1 alerta) y un favorito del usuario."""
+        locations = Location.objects.bulk_create([
+            Location(city=f"Ciudad {i}", search_key=f"ciudad {i}", latitude=i / 100, longitude=i / 100,
+                     grid_cell=celda_de(i / 100, i / 100))
+            for i in range(n)
+        ])
+        forecasts = DailyForecast.objects.bulk_create([
+            DailyForecast(
+                location=loc, date=date(2025, 10, 1), current_temp=20, condition_summary="Sunny", max_temp=25,
+                min_temp=15, feels_like_temp=20, humidity=50, precipitation_prob=10, wind_speed=5,
+                wind_direction="N", visibility=10, pressure=1013, dew_point=10, clouds=20,
+            )
+            for loc in locations
+        ])
+        HourlyForecast.objects.bulk_create([
+            HourlyForecast(daily_forecast=f, time=time(h), temperature=20, condition="Sunny", precipitation_perc=0)
+            for f in forecasts for h in (9, 18)
+        ])
+        WeatherAlert.objects.bulk_create([
+            WeatherAlert(daily_forecast=f, type="Heat", start_time=time(12), date=f.date, details="-", probability=50)
+            for f in forecasts
+        ])
+        FavoriteLocation.objects.bulk_create([FavoriteLocation(user=self.user, location=loc) for loc in locations])
+        actualizar_ultimo_pronostico([loc.pk for loc in locations])
+        renderizar_pronosticos([f.pk for f in forecasts])
+
+    def _contar(self, consultas, url, params=None, user=None, metodo="get"):
+        for n in self.TAMANOS:
+            with self.subTest(n=n, url=url), transaction.atomic():
+                self._crear(n)
+                self.client.force_authenticate(user)
+                pedir = lambda: getattr(self.client, metodo)(url, params, format="json" if metodo == "post" else None)
+                # Los índices en memoria se construyen en la primera petición; se cuenta la siguiente
+                invalidar_spatial_index()
+                pedir()
+                with self.assertNumQueries(consultas):
+                    respuesta = pedir()
+                self.assertEqual(respuesta.status_code, 200)
+                transaction.set_rollback(True)
+
+    def test_listados(self):
+        # Las dos primeras consultas de cada ViewSet son las del ETag: agregados y contador de
+        # borrados (app/conditional.py)
+        self._contar(5, reverse("dailyforecast-list"))
+        self._contar(3, reverse("hourlyforecast-list"))
+        self._contar(3, reverse("weatheralert-list"))
+        self._contar(3, reverse("location-list"))
+        self._contar(3, reverse("favoritelocation-list"))
+        self._contar(3, reverse("favoritelocation-list"), user=self.user)
+
+    def test_detalle_de_pronostico(self):
+        for n in self.TAMANOS:
+            with self.subTest(n=n), transaction.atomic():
+                self._crear(n)
+                forecast = DailyForecast.objects.first()
+                with self.assertNumQueries(5):
+                    self.assertEqual(self.client.get(reverse("dailyforecast-detail", args=[forecast.pk])).status_code, 200)
+                transaction.set_rollback(True)
+
+    def test_vistas_de_clima(self):
+        # clima-actual: Location con el JSON prerenderizado de su latest_forecast (el índice ya está en memoria)
+        self._contar(1, reverse("clima-actual"), {"lat": 0, "lon": 0})
+        # Con ?fields=: Location + latest_forecast en un JOIN y sus 2 precargas
+        self._contar(3, reverse("clima-actual"), {"lat": 0, "lon": 0, "exclude": "summary"})
+        # clima-por-ciudad: búsqueda exacta por search_key con el JSON prerenderizado
+        self._contar(1, reverse("city-weather"), {"city": "Ciudad 0"})
+        # lote: Location con latest_forecast + 2 precargas, sin importar cuántos puntos
+        self._contar(3, reverse("clima-actual-lote"), {"points": [{"lat": i, "lon": i} for i in range(100)]}, metodo="post")
+
+
+# ----------------------------------------------------------------------
+# Puntero Location.latest_forecast
+# ----------------------------------------------------------------------
+
+class LatestForecastTests(TestCase):
+
+    def setUp(self):
+        self.location = Location.objects.create(city="Monterrey", latitude=25.686614, longitude=-100.316113)
+
+    def _puntero(self):
+        return Location.objects.get(pk=self.location.pk).latest_forecast
+
+    def test_se_mantiene_al_guardar_y_borrar(self):
+        hoy = crear_pronostico(self.location, date(2025, 10, 1))
+        self.assertEqual(self._puntero(), hoy)
+        manana = crear_pronostico(self.location, date(2025, 10, 2))
+        crear_pronostico(self.location, date(2025, 9, 30))
+        self.assertEqual(self._puntero(), manana)
+        manana.delete()
+        self.assertEqual(self._puntero(), hoy)
+        hoy.delete()
+        self.assertEqual(self._puntero().date, date(2025, 9, 30))
+
+    def test_escritor_masivo(self):
+        if not XGBOOST_DISPONIBLE:
+            self.skipTest("xgboost no está instalado")
+        pronosticar_ubicaciones([(self.location, date(2025, 10, 1)), (self.location, date(2025, 10, 3))])
+        self.assertEqual(self._puntero().date, date(2025, 10, 3))
+
+    def test_comando_de_reparacion(self):
+        crear_pronostico(self.location, date(2025, 10, 1))
+        Location.objects.filter(pk=self.location.pk).update(latest_forecast=None)
+        with self.assertRaises(CommandError):
+            call_command("repair_latest_forecast", "--check", stdout=StringIO())
+        call_command("repair_latest_forecast", stdout=StringIO())
+        self.assertEqual(self._puntero().date, date(2025, 10, 1))
+        call_command("repair_latest_forecast", "--check", stdout=StringIO())
+
+
+# ----------------------------------------------------------------------
+# Paginación por cursor de los ViewSets (app/pagination.py)
+# ----------------------------------------------------------------------
+
+class KeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        # Varias ubicaciones con pronósticos en las mismas fechas: el orden depende del desempate por id
+        locations = [Location.objects.create(city=f"Ciudad {i}", latitude=i, longitude=i) for i in range(5)]
+        self.forecasts = [crear_pronostico(loc, date(2025, 10, 1 + d)) for loc in locations for d in range(5)]
+
+    def _recorrer(self, url, page_size):
+        vistos, paginas, siguiente = [], 0, f"{url}?page_size={page_size}"
+        while siguiente:
+            datos = self.client.get(siguiente).json()
+            vistos.extend(fila["id"] for fila in datos["results"])
+            siguiente, paginas = datos["next"], paginas + 1
+        return vistos, paginas
+
+    def test_recorre_todo_sin_repetir(self):
+        esperados = [f.pk for f in sorted(self.forecasts, key=lambda f: (f.date, f.pk), reverse=True)]
+        vistos, paginas = self._recorrer(reverse("dailyforecast-list"), 4)
+        self.assertEqual(vistos, esperados)
+        self.assertEqual(paginas, 7)
+
+    def test_pagina_profunda_cuesta_lo_mismo(self):
+        url = reverse("dailyforecast-list")
+        primera = self.client.get(url, {"page_size": 2}).json()
+        self.assertEqual(len(primera["results"]), 2)
+        siguiente = primera["next"]
+        for _ in range(10):
+            with self.assertNumQueries(5):
+                siguiente = self.client.get(siguiente).json()["next"]
+
+    def test_cursor_invalido(self):
+        self.assertEqual(self.client.get(reverse("dailyforecast-list"), {"cursor": "xx"}).status_code, 404)
+
+    def test_favoritos_anonimos_paginados(self):
+        user = User.objects.create_user("paginas")
+        FavoriteLocation.objects.bulk_create([FavoriteLocation(user=user, location=f.location) for f in self.forecasts[::5]])
+        vistos, paginas = self._recorrer(reverse("favoritelocation-list"), 2)
+        self.assertEqual(len(vistos), 5)
+        self.assertEqual(paginas, 3)
+
+
+# ----------------------------------------------------------------------
+# Selección de campos (?fields= / ?exclude=) en DailyForecastSerializer
+# ----------------------------------------------------------------------
+
+class SparseFieldsTests(TestCase):
+
+    def setUp(self):
+        invalidar_spatial_index()
+        self.client = APIClient()
+        self.url = reverse("dailyforecast-list")
+        for i in range(3):
+            forecast = crear_pronostico(Location.objects.create(city=f"Ciudad {i}", latitude=i, longitude=i), date(2025, 10, 1))
+            HourlyForecast.objects.create(daily_forecast=forecast, time=time(9), temperature=20, condition="Sunny", precipitation_perc=0)
+
+    def test_fields_recorta_select_y_prefetch(self):
+        with CaptureQueriesContext(connection) as consultas:
+            datos = self.client.get(self.url, {"fields": "date,current_temp,max_temp"}).json()
+        self.assertEqual(set(datos["results"][0]), {"date", "current_temp", "max_temp"})
+        # ETag (agregados + contador de borrados) + la página
+        self.assertEqual(len(consultas), 3)
+        self.assertNotIn("O3_concentration", consultas[2]["sql"])
+
+        with self.assertNumQueries(4):
+            datos = self.client.get(self.url, {"fields": "id,hourly_forecasts"}).json()
+        self.assertEqual(datos["results"][0]["hourly_forecasts"][0]["condition"], "Sunny")
+
+    def test_exclude(self):
+        with self.assertNumQueries(3):
+            datos = self.client.get(self.url, {"exclude": "hourly_forecasts,alerts"}).json()
+        fila = datos["results"][0]
+        self.assertNotIn("alerts", fila)
+        self.assertIn("potential_vorticity", fila)
+
+    def test_paginacion_con_campos_y_desconocidos(self):
+        primera = self.client.get(self.url, {"fields": "current_temp", "page_size": 2}).json()
+        with self.assertNumQueries(3):
+            segunda = self.client.get(primera["next"]).json()
+        self.assertEqual(len(segunda["results"]), 1)
+        self.assertEqual(self.client.get(self.url, {"fields": "date,nope"}).status_code, 400)
+
+    def test_vistas_de_clima(self):
+        datos = self.client.get(reverse("clima-actual"), {"lat": 0, "lon": 0, "fields": "date,max_temp"}).json()
+        self.assertEqual(set(datos), {"date", "max_temp", "metadata"})
+
+
+# ----------------------------------------------------------------------
+# Camino rápido de lectura y ORJSONRenderer (app/fast_serializers.py, app/renderers.py)
+# ----------------------------------------------------------------------
+
+class FastReadPathTests(TestCase):
+
+    def setUp(self):
+        invalidar_spatial_index()
+        invalidar_city_trie()
+        invalidar_trigram_index()
+        self.client = APIClient()
+        for i in range(3):
+            location = Location.objects.create(city=f"Ciudad {i}", latitude=i + 0.5, longitude=-i, state_province="Ñuble")
+            forecast = crear_pronostico(location, date(2025, 10, 1 + i), current_temp="-3.5", condition_summary="Niebla \u2028 densa")
+            for h in (15, 3, 9):
+                HourlyForecast.objects.create(daily_forecast=forecast, time=time(h, 30), temperature=h, condition="Sunny", precipitation_perc=h)
+            WeatherAlert.objects.create(daily_forecast=forecast, type="Heat", start_time=time(12), date=forecast.date, details="-", probability=50)
+
+    def _ambos(self, url, params):
+        """(rápido, DRF): la misma petición con y sin el camino rápido."""
+        rapido = self.client.get(url, params)
+        with mock.patch.object(views, "FAST_READ_PATH", False), mock.patch.object(views, "PRERENDERED_FORECASTS", False), \
+                mock.patch.object(views.ORJSONRenderer, "render", JSONRenderer.render):
+            lento = self.client.get(url, params)
+        return rapido, lento
+
+    def test_listado_identico_byte_a_byte(self):
+        url = reverse("dailyforecast-list")
+        for params in ({}, {"fields": "date,current_temp,alerts"}, {"exclude": "hourly_forecasts"}, {"page_size": 2}):
+            rapido, lento = self._ambos(url, params)
+            self.assertEqual(rapido.status_code, 200)
+            self.assertEqual(rapido.content, lento.content, params)
+
+        # El cursor que arma el camino rápido (desde dicts) sirve igual
+        siguiente = self.client.get(url, {"page_size": 2}).json()["next"]
+        self.assertEqual(len(self.client.get(siguiente).json()["results"]), 1)
+
+    def test_vistas_de_clima_identicas(self):
+        casos = [
+            (reverse("clima-actual"), {"lat": 1.4, "lon": -1}),
+            (reverse("clima-actual"), {"lat": 0, "lon": 0, "fields": "date,hourly_forecasts"}),
+            (reverse("city-weather"), {"city": "ciudad 2"}),
+        ]
+        for url, params in casos:
+            rapido, lento = self._ambos(url, params)
+            self.assertEqual(rapido.status_code, 200)
+            self.assertEqual(rapido.content, lento.content, params)
+
+        datos = self.client.get(reverse("clima-actual"), {"lat": 1.4, "lon": -1}).json()
+        self.assertEqual(datos["current_temp"], "-3.5")
+        self.assertEqual([h["time"] for h in datos["hourly_forecasts"]], ["03:30:00", "09:30:00", "15:30:00"])
+
+    def test_renderer_como_drf(self):
+        from datetime import datetime, timezone as tz
+        from decimal import Decimal
+        data = {
+            "texto": "Ñandú \u2028 \u2029", "decimal": Decimal("1.50"), "fecha": date(2025, 10, 1),
+            "hora": time(9, 30, 15, 123456), "instante": datetime(2025, 10, 1, 12, 0, 0, 999999, tzinfo=tz.utc),
+            "lista": [1, 2.5, None, True],
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(ORJSONRenderer().render(None), b"")
+        self.assertEqual(
+            ORJSONRenderer().render({"a": 1}, "application/json; indent=2"),
+            JSONRenderer().render({"a": 1}, "application/json; indent=2"),
+        )
+
+
+class SeriesFormatTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        location = Location.objects.create(city="Serie", latitude=1, longitude=1)
+        for d in range(3):
+            forecast = crear_pronostico(location, date(2025, 10, 1) + timedelta(days=d), O3_concentration="0.123456")
+            for h in (6, 18):
+                HourlyForecast.objects.create(daily_forecast=forecast, time=time(h), temperature=10 + d, condition="Sunny", precipitation_perc=5)
+
+    def test_columnar_diario(self):
+        url = reverse("dailyforecast-list")
+        filas = self.client.get(url).json()["results"]
+        respuesta = self.client.get(url, HTTP_ACCEPT="application/vnd.weatheron.columnar+json")
+        self.assertEqual(respuesta["Content-Type"], "application/vnd.weatheron.columnar+json")
+        columnas = respuesta.json()["results"]
+
+        self.assertEqual(list(columnas), list(filas[0]))
+        self.assertEqual(columnas["date"], [f["date"] for f in filas])
+        self.assertEqual(columnas["current_temp"], [f["current_temp"] for f in filas])
+        # Variables científicas como números; las que no tienen valor, null
+        self.assertEqual(columnas["O3_concentration"], [0.123456] * 3)
+        self.assertEqual(columnas["SO2_concentration"], [None] * 3)
+        # Los anidados también por columnas
+        self.assertEqual(columnas["hourly_forecasts"][0], {
+            "time": ["06:00:00", "18:00:00"], "temperature": ["12.0", "12.0"],
+            "condition": ["Sunny", "Sunny"], "precipitation_perc": [5, 5],
+        })
+        self.assertEqual(columnas["alerts"], [{"type": [], "start_time": [], "date": [], "details": [], "probability": []}] * 3)
+
+    def test_columnar_por_query_param_y_paginado(self):
+        url = reverse("hourlyforecast-list")
+        primera = self.client.get(url, {"format": "columnar", "page_size": 4}).json()
+        self.assertEqual(primera["results"]["time"], ["06:00:00"] * 3 + ["18:00:00"])
+        segunda = self.client.get(primera["next"]).json()
+        self.assertEqual(segunda["results"]["temperature"], ["11.0", "12.0"])
+        self.assertIsNone(segunda["next"])
+
+        DailyForecast.objects.all().delete()
+        vacia = self.client.get(reverse("dailyforecast-list"), {"format": "columnar", "fields": "date,max_temp"}).json()
+        self.assertEqual(vacia["results"], {"date": [], "max_temp": []})
+
+    def test_msgpack(self):
+        url = reverse("dailyforecast-list")
+        esperado = self.client.get(url, {"fields": "date,O3_concentration", "format": "columnar"}).json()["results"]
+        self.assertTrue(esperado["date"])
+        por_accept = self.client.get(url, {"fields": "date,O3_concentration"}, HTTP_ACCEPT="application/msgpack")
+        por_format = self.client.get(url, {"fields": "date,O3_concentration", "format": "msgpack"})
+        for respuesta in (por_accept, por_format):
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertEqual(respuesta["Content-Type"], "application/msgpack")
+            self.assertEqual(msgpack.unpackb(respuesta.content)["results"], esperado)
+
+
+# ----------------------------------------------------------------------
+# JSON prerenderizado de los pronósticos (app/forecast_blobs.py)
+# ----------------------------------------------------------------------
+
+class ForecastBlobTests(TestCase):
+
+    def setUp(self):
+        invalidar_spatial_index()
+        invalidar_city_trie()
+        invalidar_trigram_index()
+        self.client = APIClient()
+        self.location = Location.objects.create(city="Mérida", latitude=20.97, longitude=-89.62)
+        self.forecast = crear_pronostico(self.location, date(2025, 10, 1))
+        self.hora = HourlyForecast.objects.create(daily_forecast=self.forecast, time=time(9), temperature=20, condition="Sunny", precipitation_perc=0)
+        self.alerta = WeatherAlert.objects.create(daily_forecast=self.forecast, type="Heat", start_time=time(12), date=self.forecast.date, details="-", probability=50)
+
+    def _comparar(self, url, params):
+        """La respuesta desde el JSON guardado es idéntica a la serializada en la petición."""
+        self.client.get(url, params)  # construye los índices en memoria
+        with CaptureQueriesContext(connection) as consultas:
+            rapida = self.client.get(url, params)
+        n_consultas = len(consultas)
+        with mock.patch.object(views, "PRERENDERED_FORECASTS", False):
+            normal = self.client.get(url, params)
+        self.assertEqual(rapida.status_code, 200)
+        self.assertEqual(rapida["Content-Type"], normal["Content-Type"])
+        self.assertEqual(rapida.content, normal.content)
+        return n_consultas
+
+    def test_se_sirve_tal_cual_y_se_mantiene_al_dia(self):
+        self.assertEqual(self._comparar(reverse("clima-actual"), {"lat": 21, "lon": -89.6}), 1)
+        self.assertEqual(self._comparar(reverse("city-weather"), {"city": "merida"}), 1)
+        self._comparar(reverse("city-weather"), {"city": "Meridaa"})  # por trigramas: metadata.similarity
+
+        # Cualquier escritura del pronóstico o sus detalles lo vuelve a renderizar
+        self.hora.temperature = "31.5"
+        self.hora.save()
+        HourlyForecast.objects.create(daily_forecast=self.forecast, time=time(6), temperature=18, condition="Fog", precipitation_perc=5)
+        self.alerta.delete()
+        self.forecast.condition_summary = "Rain"
+        self.forecast.save()
+        datos = self.client.get(reverse("clima-actual"), {"lat": 21, "lon": -89.6}).json()
+        self.assertEqual([h["temperature"] for h in datos["hourly_forecasts"]], ["18.0", "31.5"])
+        self.assertEqual((datos["alerts"], datos["condition_summary"]), ([], "Rain"))
+        self._comparar(reverse("clima-actual"), {"lat": 21, "lon": -89.6})
+
+    def test_sin_blob_o_con_campos_usa_el_serializer(self):
+        ForecastBlob.objects.all().delete()
+        self._comparar(reverse("clima-actual"), {"lat": 21, "lon": -89.6})
+        datos = self.client.get(reverse("clima-actual"), {"lat": 21, "lon": -89.6, "fields": "date"}).json()
+        self.assertEqual(set(datos), {"date", "metadata"})
+
+        salida = StringIO()
+        with self.assertRaises(CommandError):
+            call_command("rebuild_forecast_blobs", "--check", stdout=salida)
+        call_command("rebuild_forecast_blobs", stdout=salida)
+        self.assertTrue(ForecastBlob.objects.filter(pk=self.forecast.pk).exists())
+
+    def test_borrado_en_cascada(self):
+        self.location.delete()
+        self.assertFalse(ForecastBlob.objects.exists())
+        self.assertFalse(DailyForecast.objects.exists())
+
+
+# ----------------------------------------------------------------------
+# GET condicional: ETag / Last-Modified desde updated_at (app/conditional.py)
+# ----------------------------------------------------------------------
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        invalidar_spatial_index()
+        self.client = APIClient()
+        self.location = Location.objects.create(city="Mérida", latitude=20.97, longitude=-89.62)
+        self.forecast = crear_pronostico(self.location, date(2025, 10, 1))
+        self.hora = HourlyForecast.objects.create(daily_forecast=self.forecast, time=time(9), temperature=20, condition="Sunny", precipitation_perc=0)
+        self.alerta = WeatherAlert.objects.create(daily_forecast=self.forecast, type="Heat", start_time=time(12), date=self.forecast.date, details="-", probability=50)
+        FavoriteLocation.objects.create(user=User.objects.create_user("condicional"), location=self.location)
+
+    def _no_modificado(self, url, params=None, **headers):
+        """(status, consultas) de la misma petición repetida con If-None-Match del ETag recibido."""
+        respuesta = self.client.get(url, params)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn("Last-Modified", respuesta)
+        with CaptureQueriesContext(connection) as consultas:
+            repetida = self.client.get(url, params, HTTP_IF_NONE_MATCH=respuesta["ETag"], **headers)
+        n_consultas = len(consultas)
+        if repetida.status_code == 304:
+            self.assertEqual((repetida.content, repetida["ETag"]), (b"", respuesta["ETag"]))
+        return repetida.status_code, n_consultas
+
+    def test_304_sin_leer_los_datos(self):
+        # ViewSets: MAX de id y updated_at más el contador de borrados; vistas de clima: una consulta
+        for url, params, consultas in [
+            (reverse("dailyforecast-list"), None, 2),
+            (reverse("dailyforecast-detail", args=[self.forecast.pk]), None, 2),
+            (reverse("hourlyforecast-list"), None, 2),
+            (reverse("weatheralert-list"), None, 2),
+            (reverse("location-list"), None, 2),
+            (reverse("location-detail", args=[self.location.pk]), None, 2),
+            (reverse("favoritelocation-list"), None, 2),
+            (reverse("clima-actual"), {"lat": 21, "lon": -89.6}, 1),
+            (reverse("city-weather"), {"city": "merida"}, 1),
+        ]:
+            with self.subTest(url=url):
+                self.assertEqual(self._no_modificado(url, params), (304, consultas))
+
+    def test_version_sin_contar_filas(self):
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(reverse("dailyforecast-list"))
+        self.assertFalse([q["sql"] for q in consultas if "COUNT(" in q["sql"] and "MAX(" in q["sql"]])
+
+    def test_escribir_un_detalle_cambia_el_pronostico(self):
+        antes = DailyForecast.objects.get(pk=self.forecast.pk).updated_at
+        url, clima = reverse("dailyforecast-detail", args=[self.forecast.pk]), reverse("clima-actual")
+        etags = {u: self.client.get(u, p)["ETag"] for u, p in [(url, None), (clima, {"lat": 21, "lon": -89.6})]}
+
+        self.hora.temperature = "31.5"
+        self.hora.save()
+        self.assertGreater(DailyForecast.objects.get(pk=self.forecast.pk).updated_at, antes)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etags[url]).status_code, 200)
+        respuesta = self.client.get(clima, {"lat": 21, "lon": -89.6}, HTTP_IF_NONE_MATCH=etags[clima])
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()["hourly_forecasts"][0]["temperature"], "31.5")
+
+    def test_borrar_o_cambiar_la_url_cambia_el_etag(self):
+        url = reverse("weatheralert-list")
+        etag = self.client.get(url)["ETag"]
+        self.assertNotEqual(self.client.get(url, {"page_size": 1})["ETag"], etag)
+        self.alerta.delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_borrados_en_cascada_cambian_el_etag(self):
+        # Una Location nueva (id mayor) que luego se borra: el mayor id y updated_at vuelven a los de antes
+        url, favoritas = reverse("location-list"), reverse("favoritelocation-list")
+        usuario = User.objects.get(username="condicional")
+        self.client.force_authenticate(usuario)
+        otra = Location.objects.create(city="Cancún", latitude=21.16, longitude=-86.85)
+        crear_pronostico(otra, date(2025, 10, 1))
+        FavoriteLocation.objects.create(user=usuario, location=otra)
+        etags = {u: self.client.get(u)["ETag"] for u in (url, favoritas)}
+        otra.delete()
+        for u, etag in etags.items():
+            self.assertEqual(self.client.get(u, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(borrados_de(DailyForecast), 1)
+        self.assertEqual(borrados_de(FavoriteLocation), 1)
+
+    def test_if_modified_since(self):
+        url = reverse("location-list")
+        ultima = self.client.get(url)["Last-Modified"]
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=ultima).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE="Mon, 01 Jan 2024 00:00:00 GMT").status_code, 200)
+
+
+# ----------------------------------------------------------------------
+# Sincronización incremental /api/sync/ (app/sync.py)
+# ----------------------------------------------------------------------
+
+class SyncTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse("sync")
+        self.merida = Location.objects.create(city="Mérida", latitude=20.97, longitude=-89.62)
+        self.cancun = Location.objects.create(city="Cancún", latitude=21.16, longitude=-86.85)
+
+    def _confirmar(self):
+        # TestCase nunca confirma: el registro se escribe con los on_commit de cada escritura
+        return self.captureOnCommitCallbacks(execute=True)
+
+    def _detalles(self, forecast):
+        hora = HourlyForecast.objects.create(daily_forecast=forecast, time=time(9), temperature=20, condition="Sunny", precipitation_perc=0)
+        alerta = WeatherAlert.objects.create(daily_forecast=forecast, type="Heat", start_time=time(12), date=forecast.date, details="-", probability=50)
+        return hora, alerta
+
+    def _sync(self, since, **params):
+        respuesta = self.client.get(self.url, {"since": since, **params})
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()
+
+    def test_cambios_y_lapidas_desde_la_marca(self):
+        marca = self.client.get(self.url).json()["since"]
+        with self._confirmar():
+            forecast = crear_pronostico(self.merida, date(2025, 10, 1))
+            hora, alerta = self._detalles(forecast)
+
+        datos = self._sync(marca)
+        self.assertEqual([f["id"] for f in datos["daily_forecasts"]], [forecast.pk])
+        self.assertNotIn("hourly_forecasts", datos["daily_forecasts"][0])
+        self.assertEqual(datos["hourly_forecasts"][0]["daily_forecast"], forecast.pk)
+        self.assertEqual([a["id"] for a in datos["alerts"]], [alerta.pk])
+        self.assertFalse(datos["has_more"])
+
+        marca = datos["since"]
+        self.assertEqual(self._sync(marca)["hourly_forecasts"], [])
+        hora.temperature = "31.5"
+        alerta_id = alerta.pk
+        with self._confirmar():
+            hora.save()
+            alerta.delete()
+        datos = self._sync(marca)
+        self.assertEqual([h["temperature"] for h in datos["hourly_forecasts"]], ["31.5"])
+        self.assertEqual(datos["deleted"], {"daily_forecasts": [], "hourly_forecasts": [], "alerts": [alerta_id]})
+
+        # La Location se borra: el pronóstico va como lápida y sus detalles caen con él
+        with self._confirmar():
+            self.merida.delete()
+        datos = self._sync(datos["since"])
+        self.assertEqual(datos["deleted"], {"daily_forecasts": [forecast.pk], "hourly_forecasts": [], "alerts": []})
+
+    def test_paginado_por_la_marca_y_consultas_constantes(self):
+        marca = self.client.get(self.url).json()["since"]
+        # 15 cambios: cada pronóstico seguido de su hora y su alerta
+        forecasts = []
+        with self._confirmar():
+            for d in range(1, 6):
+                forecasts.append(crear_pronostico(self.merida, date(2025, 10, d)))
+                self._detalles(forecasts[-1])
+        vistos, paginas = [], 0
+        while True:
+            # El registro y, como mucho, una consulta por tipo
+            with CaptureQueriesContext(connection) as consultas:
+                datos = self._sync(marca, page_size=4)
+            self.assertLessEqual(len(consultas), 4)
+            vistos += [f["id"] for f in datos["daily_forecasts"]]
+            marca, paginas = datos["since"], paginas + 1
+            if not datos["has_more"]:
+                break
+        self.assertEqual(vistos, [f.pk for f in forecasts])
+        self.assertEqual(paginas, 4)
+
+    def test_solo_favoritos_con_usuario(self):
+        user = User.objects.create_user("sync")
+        FavoriteLocation.objects.create(user=user, location=self.cancun)
+        marca = self.client.get(self.url).json()["since"]
+        with self._confirmar():
+            crear_pronostico(self.merida, date(2025, 10, 1))
+            propio = crear_pronostico(self.cancun, date(2025, 10, 1))
+
+        self.assertEqual(len(self._sync(marca)["daily_forecasts"]), 2)
+        self.client.force_authenticate(user)
+        self.assertEqual([f["id"] for f in self._sync(marca)["daily_forecasts"]], [propio.pk])
+
+    def test_marcas_invalidas_y_vencidas(self):
+        self.assertEqual(self.client.get(self.url, {"since": "xx"}).status_code, 400)
+        with mock.patch.object(sync.time, "time", return_value=0):
+            vieja = sync.codificar_marca(0)
+        self.assertEqual(self.client.get(self.url, {"since": vieja}).status_code, 410)
+
+        marca = self.client.get(self.url).json()["since"]
+        with self._confirmar():
+            crear_pronostico(self.merida, date(2025, 10, 1))
+        # Sin ventana de espera: el cambio se entrega en cuanto confirma
+        self.assertEqual(len(self._sync(marca)["daily_forecasts"]), 1)
+
+        call_command("prune_sync_log", stdout=StringIO())
+        self.assertTrue(ChangeLog.objects.exists())
+
+    def test_cambio_de_id_menor_confirmado_despues(self):
+        # La transacción lenta escribe primero (id de pronóstico menor) y confirma al final
+        marca = self.client.get(self.url).json()["since"]
+        with self.captureOnCommitCallbacks() as lenta:
+            lento = crear_pronostico(self.merida, date(2025, 10, 1))
+        self.assertFalse(ChangeLog.objects.exists())
+        with self._confirmar():
+            rapido = crear_pronostico(self.cancun, date(2025, 10, 1))
+        self.assertLess(lento.pk, rapido.pk)
+
+        datos = self._sync(marca)
+        self.assertEqual([f["id"] for f in datos["daily_forecasts"]], [rapido.pk])
+
+        # Al confirmar, su cambio queda después de la marca ya entregada y el cliente lo recibe
+        for callback in lenta:
+            callback()
+        datos = self._sync(datos["since"])
+        self.assertEqual([f["id"] for f in datos["daily_forecasts"]], [lento.pk])
+
+    def test_commit_tardio_con_otro_reloj_no_se_salta(self):
+        # Un escritor con el reloj adelantado (o un INSERT lento) deja un created_at que no sigue
+        # el orden de los ids: la marca avanza por id confirmado, no por tiempo
+        marca = self.client.get(self.url).json()["since"]
+        adelantado = timezone.now() + timedelta(minutes=10)
+        with mock.patch("django.utils.timezone.now", return_value=adelantado), self._confirmar():
+            tardio = crear_pronostico(self.merida, date(2025, 10, 1))
+        with self._confirmar():
+            normal = crear_pronostico(self.cancun, date(2025, 10, 1))
+        self.assertGreater(*ChangeLog.objects.order_by("pk").values_list("created_at", flat=True)[:2])
+
+        datos = self._sync(marca)
+        self.assertEqual([f["id"] for f in datos["daily_forecasts"]], [tardio.pk, normal.pk])
+        self.assertEqual(self._sync(datos["since"])["daily_forecasts"], [])
+
+    def test_inserciones_del_registro_bajo_bloqueo(self):
+        # Cada INSERT del registro toma la fila de ChangeLogLock antes de asignar ids
+        with CaptureQueriesContext(connection) as consultas, self._confirmar():
+            crear_pronostico(self.merida, date(2025, 10, 1))
+        sql = [q["sql"] for q in consultas]
+        bloqueo = next(i for i, q in enumerate(sql) if "app_changeloglock" in q)
+        insercion = next(i for i, q in enumerate(sql) if q.startswith('INSERT INTO "app_changelog"'))
+        self.assertLess(bloqueo, insercion)
+        self.assertEqual(ChangeLogLock.objects.count(), 1)
+
+    def test_transaccion_revertida_no_registra(self):
+        with self._confirmar():
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                crear_pronostico(self.merida, date(2025, 10, 1))
+                crear_pronostico(self.merida, date(2025, 10, 1))
+        self.assertFalse(ChangeLog.objects.exists())
+
+    def test_escritor_masivo_registra_al_confirmar(self):
+        if not XGBOOST_DISPONIBLE:
+            self.skipTest("xgboost no está instalado")
+        import warnings
+        warnings.filterwarnings("ignore", category=UserWarning)
+        with self.captureOnCommitCallbacks() as pendientes:
+            pronosticar_ubicaciones([(self.merida, date(2025, 10, 1)), (self.cancun, date(2025, 10, 1))])
+        self.assertFalse(ChangeLog.objects.exists())
+        for callback in pendientes:
+            callback()
+        self.assertEqual(
+            sorted(ChangeLog.objects.values_list("location_id", flat=True)), sorted([self.merida.pk, self.cancun.pk])
+        )
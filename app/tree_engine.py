@@ -0,0 +1,196 @@
+# app/tree_engine.py
+
+import json
+import re
+from pathlib import Path
+
+import numpy as np
+
+
+# Extensión de los ensambles aplanados que genera exportar_arboles()
+EXTENSION_ARBOLES = ".trees.npz"
+
+# Máximo de celdas (filas × árboles) que se evalúan de una vez, para acotar memoria
+MAX_CELDAS = 4_000_000
+
+
+class TreeEnsemble:
+    """
+    Ensamble de árboles de XGBoost aplanado en arrays de NumPy: por nodo guarda la
+    feature de corte, el umbral, los hijos izquierdo/derecho, la dirección por defecto
+    para valores faltantes y el valor de hoja. Evalúa todos los árboles para un lote
+    de filas a la vez sin importar xgboost, pandas ni sklearn.
+    """
+
+    def __init__(self, arrays):
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.default_left = arrays["default_left"]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]
+        self.tree_group = arrays["tree_group"]
+        self.base_margin = arrays["base_margin"]
+        self.max_depth = int(arrays["max_depth"])
+        self.objective = str(arrays["objective"])
+        self.feature_names = [str(f) for f in arrays["feature_names"]]
+        self.classes = arrays["classes"].tolist() if "classes" in arrays else None
+        self.targets = [str(t) for t in arrays["targets"]] if "targets" in arrays else None
+        self.n_groups = len(self.base_margin)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, k).nbytes for k in (
+            "feature", "threshold", "left", "right", "default_left", "value", "roots", "tree_group"))
+
+    def margin(self, X):
+        """Suma de hojas por grupo (n, n_groups) + margen base para la matriz X (n, n_features)."""
+        X = np.asarray(X, dtype=np.float32)
+        n = X.shape[0]
+        salida = np.empty((n, self.n_groups), dtype=np.float64)
+        # Árboles multisalida (multi_strategy="multi_output_tree"): cada hoja es un vector
+        hojas_vectoriales = self.value.ndim == 2
+        ancho_hoja = self.value.shape[1] if hojas_vectoriales else 1
+        paso = max(1, MAX_CELDAS // max(len(self.roots) * ancho_hoja, 1))
+
+        for inicio in range(0, n, paso):
+            bloque = X[inicio:inicio + paso]
+            filas = np.arange(bloque.shape[0])[:, None]
+            nodos = np.broadcast_to(self.roots, (bloque.shape[0], len(self.roots))).copy()
+
+            # Bajamos todos los árboles un nivel por iteración; las hojas (left == -1) se quedan quietas
+            for _ in range(self.max_depth):
+                hijos_izq = self.left[nodos]
+                es_hoja = hijos_izq < 0
+                if es_hoja.all():
+                    break
+                x = bloque[filas, self.feature[nodos]]
+                ir_izq = np.where(np.isnan(x), self.default_left[nodos], x < self.threshold[nodos])
+                nodos = np.where(es_hoja, nodos, np.where(ir_izq, hijos_izq, self.right[nodos]))
+
+            hojas = self.value[nodos]
+            if hojas_vectoriales:
+                salida[inicio:inicio + paso] = hojas.sum(axis=1, dtype=np.float64)
+                continue
+            for g in range(self.n_groups):
+                salida[inicio:inicio + paso, g] = hojas[:, self.tree_group == g].sum(axis=1, dtype=np.float64)
+
+        return (salida + self.base_margin).astype(np.float32)
+
+    def predict(self, columnas):
+        """
+        Misma interfaz que NativeModel.predict: `columnas` es un dict nombre -> array.
+        Para clasificadores devuelve el índice de la clase.
+        """
+        X = np.column_stack([np.asarray(columnas[nombre], dtype=np.float32) for nombre in self.feature_names])
+        margen = self.margin(X)
+
+        if self.objective.startswith("multi:"):
+            return np.argmax(margen, axis=1)
+        if self.objective == "binary:logistic":
+            probas = 1.0 / (1.0 + np.exp(-margen[:, 0]))
+            return (probas > 0.5).astype(int) if self.classes is not None else probas
+        if self.n_groups > 1:
+            # Regresor multisalida: una columna por variable objetivo
+            return margen
+        return margen[:, 0]
+
+
+def cargar_arboles(path):
+    """Loader para el registro de modelos: lee un .trees.npz (solo requiere NumPy)."""
+    with np.load(path, allow_pickle=False) as datos:
+        return TreeEnsemble({k: datos[k] for k in datos.files})
+
+
+def _parsear_base_score(texto, n_groups):
+    valores = [float(v) for v in re.findall(r"[-+]?[0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)?", texto)]
+    if len(valores) == 1:
+        valores = valores * n_groups
+    return np.asarray(valores, dtype=np.float64)
+
+
+def aplanar_booster(booster, classes=None):
+    """Convierte un booster de XGBoost (gbtree, sin categóricas) en el dict de arrays de TreeEnsemble."""
+    learner = json.loads(booster.save_raw(raw_format="json"))["learner"]
+    objective = learner["objective"]["name"]
+    modelo = learner["gradient_booster"]["model"]
+    arboles = modelo["trees"]
+    param = learner["learner_model_param"]
+    n_groups = max(int(param.get("num_class", "0")), int(param.get("num_target", "1")), 1)
+
+    base = _parsear_base_score(param["base_score"], n_groups)
+    if objective == "binary:logistic":
+        base = np.log(base / (1 - base))
+
+    feature, threshold, left, right, default_left, value, roots = [], [], [], [], [], [], []
+    max_depth, offset = 0, 0
+    for arbol in arboles:
+        izq = np.asarray(arbol["left_children"], dtype=np.int32)
+        der = np.asarray(arbol["right_children"], dtype=np.int32)
+        es_hoja = izq < 0
+        condiciones = np.asarray(arbol["split_conditions"], dtype=np.float32)
+
+        ancho_hoja = int(arbol["tree_param"].get("size_leaf_vector", "1"))
+
+        feature.append(np.where(es_hoja, 0, arbol["split_indices"]).astype(np.int32))
+        threshold.append(np.where(es_hoja, 0, condiciones).astype(np.float32))
+        if ancho_hoja > 1:
+            # Árbol multisalida: base_weights trae un vector por nodo
+            pesos = np.asarray(arbol["base_weights"], dtype=np.float32).reshape(len(izq), ancho_hoja)
+            value.append(np.where(es_hoja[:, None], pesos, 0).astype(np.float32))
+        else:
+            # En XGBoost las hojas guardan su valor en split_conditions
+            value.append(np.where(es_hoja, condiciones, 0).astype(np.float32))
+        left.append(np.where(es_hoja, -1, izq + offset).astype(np.int32))
+        right.append(np.where(es_hoja, -1, der + offset).astype(np.int32))
+        default_left.append(np.asarray(arbol["default_left"], dtype=bool))
+        roots.append(offset)
+
+        # Profundidad del árbol recorriendo desde la raíz
+        profundidad, nivel = 0, [0]
+        while True:
+            nivel = [h for nodo in nivel if izq[nodo] >= 0 for h in (izq[nodo], der[nodo])]
+            if not nivel:
+                break
+            profundidad += 1
+        max_depth = max(max_depth, profundidad)
+        offset += len(izq)
+
+    arrays = {
+        "feature": np.concatenate(feature),
+        "threshold": np.concatenate(threshold),
+        "left": np.concatenate(left),
+        "right": np.concatenate(right),
+        "default_left": np.concatenate(default_left),
+        "value": np.concatenate(value),
+        "roots": np.asarray(roots, dtype=np.int32),
+        "tree_group": np.asarray(modelo["tree_info"], dtype=np.int32),
+        "base_margin": base,
+        "max_depth": np.asarray(max_depth),
+        "objective": np.asarray(objective),
+        "feature_names": np.asarray(booster.feature_names),
+    }
+    if classes is not None:
+        arrays["classes"] = np.asarray(classes)
+    targets = booster.attr("targets")
+    if targets is not None:
+        arrays["targets"] = np.asarray(json.loads(targets))
+    return arrays
+
+
+def exportar_arboles(pkl_path):
+    """
+    Aplana el modelo de un .pkl de XGBoost y lo guarda como .trees.npz al lado.
+    Solo esta conversión (offline) necesita joblib/xgboost.
+    """
+    import joblib
+
+    pkl_path = Path(pkl_path)
+    modelo = joblib.load(pkl_path)
+    classes = np.asarray(modelo.classes_).tolist() if hasattr(modelo, "classes_") else None
+    arrays = aplanar_booster(modelo.get_booster(), classes)
+
+    destino = pkl_path.with_name(pkl_path.stem + EXTENSION_ARBOLES)
+    np.savez(destino, **arrays)
+    return destino
@@ -9,7 +9,10 @@ from .views import (
     HourlyForecastViewSet, 
     WeatherAlertViewSet, 
     FavoriteLocationViewSet,
-    CurrentWeatherView
+    CurrentWeatherView,
+    CurrentWeatherBatchView,
+    CityAutocompleteView,
+    SyncView
 )
 
 # Creamos un Router para manejar automáticamente las rutas ViewSet
@@ -24,7 +27,10 @@ router.register(r'favoritos', FavoriteLocationViewSet) # Rutas para favoritos (P
 
 urlpatterns = [
      path('clima-actual/', CurrentWeatherView.as_view(), name='clima-actual'), # Ruta para clima actual
+     path('clima-actual/lote/', CurrentWeatherBatchView.as_view(), name='clima-actual-lote'), # Varias coordenadas por POST
      path('clima-por-ciudad/', CityWeatherView.as_view(), name='city-weather'),
+     path('ciudades/autocomplete/', CityAutocompleteView.as_view(), name='city-autocomplete'),
+     path('sync/', SyncView.as_view(), name='sync'), # Cambios desde una marca (?since=)
     # Incluye todas las rutas generadas por el router (ej: /locaciones/, /locaciones/1/, etc.)
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,16 +1,25 @@
 # app/utils.py
 
-import joblib
-import pandas as pd
+import json
 import numpy as np
 import os
 from pathlib import Path
 from datetime import date, time
 from decimal import Decimal, InvalidOperation # Importado para el FIX de DecimalField
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
 from django.utils import timezone
 
 # Asegúrate de que tu modelo tenga la aplicación correcta
-from app.models import Location, DailyForecast 
+from app.models import ChangeLog, Location, DailyForecast, actualizar_ultimo_pronostico, celda_de, normalizar_busqueda
+from app.forecast_blobs import renderizar_pronosticos
+from app.sync import registrar_cambios
+from app.model_registry import registry, MODELOS_DIR
+from app.native_models import NativeModel, cargar_nativo, EXTENSION_NATIVA
+from app.tree_engine import TreeEnsemble, cargar_arboles, EXTENSION_ARBOLES
+from app.prediction_cache import prediction_cache
+from app.spatial import celdas_en_tolerancia, haversine_km, ubicacion_en_tolerancia
 
 
 # Define la ruta base del proyecto (un nivel más arriba de la carpeta 'app')
@@ -38,91 +47,179 @@ VARIABLE_MAP = {
     "potential_vorticity": "potential_vorticity",
 }
 
+# Motor de inferencia:
+#   "numpy"   evalúa los árboles aplanados (.trees.npz) solo con NumPy, sin importar xgboost/pandas;
+#   "native"  usa los boosters exportados (.ubj) sin pandas;
+#   "sklearn" usa siempre el PKL.
+# Si falta el artefacto del motor elegido se cae al siguiente (numpy -> native -> PKL).
+PREDICTION_ENGINE = getattr(settings, "PREDICTION_ENGINE", "native")
+
+# Usar un solo regresor multisalida (multi_regressor.*, ver data/modelo.py --multisalida)
+# en lugar de los 18 regresores individuales, si el artefacto existe.
+MULTI_OUTPUT_REGRESSOR = getattr(settings, "MULTI_OUTPUT_REGRESSOR", False)
+
+# Caché de predicciones: coordenadas redondeadas a PREDICTION_CACHE_PRECISION decimales
+# (2 ≈ 1 km). Es una aproximación: cada punto recibe la predicción del centro de su celda,
+# no la de predecir_condicion_batch. Con None (por defecto) se desactiva y cada llamada
+# ejecuta los modelos en el punto exacto.
+PREDICTION_CACHE_PRECISION = getattr(settings, "PREDICTION_CACHE_PRECISION", None)
+
+# Tolerancia en grados para considerar que un punto corresponde a una Location existente
+TOLERANCIA_UBICACION = 0.01
+
+# Modelos que reciben un dict de columnas en vez de un DataFrame
+MODELOS_COLUMNARES = (NativeModel, TreeEnsemble)
+
+
+def _cargar_modelo(nombre):
+    """
+    Devuelve (modelo, ruta) para `nombre` (ej: 'uv_index_regressor') según el motor
+    configurado, o (None, ruta_pkl) si no existe ningún artefacto.
+    """
+    if PREDICTION_ENGINE == "numpy":
+        arboles_path = MODELOS_DIR / f"{nombre}{EXTENSION_ARBOLES}"
+        try:
+            return registry.get(arboles_path, loader=cargar_arboles), arboles_path
+        except FileNotFoundError:
+            pass
+
+    if PREDICTION_ENGINE in ("numpy", "native"):
+        nativo_path = MODELOS_DIR / f"{nombre}{EXTENSION_NATIVA}"
+        try:
+            return registry.get(nativo_path, loader=cargar_nativo), nativo_path
+        except FileNotFoundError:
+            pass
+
+    # RUTA CORREGIDA: Busca en 'data/app'
+    modelo_path = MODELOS_DIR / f"{nombre}.pkl"
+    try:
+        # El registro carga el PKL una sola vez por proceso
+        return registry.get(modelo_path), modelo_path
+    except FileNotFoundError:
+        return None, modelo_path
+
+
+def precargar_modelos():
+    """Carga en el registro todos los modelos que usa el motor configurado (arranque del worker)."""
+    if MULTI_OUTPUT_REGRESSOR and _cargar_modelo("multi_regressor")[0] is not None:
+        _cargar_modelo("condition_classifier")
+        return registry.stats()
+    for var in VARIABLE_MAP:
+        _cargar_modelo(f"{var}_regressor")
+    _cargar_modelo("condition_classifier")
+    return registry.stats()
+
 
 def predecir_condicion(lat, lon, dia):
     """
     Ejecuta el modelo de predicción de Python usando archivos PKL.
+    Si la caché está activa, memoiza por (lat, lon redondeadas, día, versión del modelo).
+    """
+    if PREDICTION_CACHE_PRECISION is None:
+        return _predecir_punto(lat, lon, dia)
+
+    # Redondeamos antes de predecir para que el valor guardado sea el mismo para toda la celda
+    lat_r = round(float(lat), PREDICTION_CACHE_PRECISION) + 0.0
+    lon_r = round(float(lon), PREDICTION_CACHE_PRECISION) + 0.0
+    key = f"{lat_r}:{lon_r}:{int(dia)}"
+    version = registry.version_artefactos()
+
+    pred = prediction_cache.get(key, version)
+    if pred is None:
+        pred = _predecir_punto(lat_r, lon_r, dia)
+        prediction_cache.set(key, version, pred)
+
+    return {**pred, "lat": lat, "lon": lon, "day": dia}
+
+
+def _predecir_punto(lat, lon, dia):
+    # Un solo punto es un lote de tamaño 1: así ambos caminos dan exactamente lo mismo
+    lote = predecir_condicion_batch([lat], [lon], [dia])
+    preds = {var: lote[var][0] for var in VARIABLE_MAP}
+
+    return {"lat": lat, "lon": lon, "day": dia, "condition": lote["condition"][0], **preds}
+
+
+def predecir_condicion_batch(lats, lons, dias):
     """
-    sin_day = np.sin(2 * np.pi * dia / 365)
-    cos_day = np.cos(2 * np.pi * dia / 365)
-    X_pred = pd.DataFrame([{"lat": lat, "lon": lon, "sin_day": sin_day, "cos_day": cos_day}])
+    Versión vectorizada de predecir_condicion para muchos puntos (lat, lon, día).
+    Ejecuta cada regresor una sola vez sobre todo el lote y el clasificador una vez
+    sobre las salidas apiladas. Devuelve un dict columnar de arrays NumPy.
+    """
+    lats = np.asarray(lats, dtype=float).ravel()
+    lons = np.asarray(lons, dtype=float).ravel()
+    dias = np.asarray(dias).ravel()
+    if not (len(lats) == len(lons) == len(dias)):
+        raise ValueError("lats, lons y dias deben tener la misma longitud.")
+
+    sin_day = np.sin(2 * np.pi * dias / 365)
+    cos_day = np.cos(2 * np.pi * dias / 365)
+    columnas = {"lat": lats, "lon": lons, "sin_day": sin_day, "cos_day": cos_day}
+    X_pred = None  # DataFrame (pandas) solo si algún modelo usa el camino de sklearn
 
-    variables_fisicas = list(VARIABLE_MAP.keys())
     preds = {}
-    
-    # 1. Predecir variables físicas usando modelos regresores
-    for var in variables_fisicas:
-        # RUTA CORREGIDA: Busca en 'data/app'
-        modelo_path = BASE_DIR / "data" / "app" / f"{var}_regressor.pkl" 
-        
-        if modelo_path.exists():
-            modelo = joblib.load(modelo_path)
+
+    # 1a. Regresor multisalida: un solo recorrido de árboles da todas las variables
+    multi = _cargar_modelo("multi_regressor")[0] if MULTI_OUTPUT_REGRESSOR else None
+    if multi is not None:
+        if isinstance(multi, MODELOS_COLUMNARES):
+            salida, targets = multi.predict(columnas), multi.targets
+        else:
+            import pandas as pd
+            X_pred = pd.DataFrame(columnas)
+            salida = multi.predict(X_pred[list(multi.feature_names_in_)])
+            targets = json.loads(multi.get_booster().attr("targets"))
+        salida = np.asarray(salida).reshape(len(lats), -1)
+        preds = {var: salida[:, targets.index(var)] for var in VARIABLE_MAP if var in targets}
+
+    # 1b. Predecir variables físicas: un .predict por regresor para todo el lote
+    for var in VARIABLE_MAP:
+        if var in preds:
+            continue
+        modelo, modelo_path = _cargar_modelo(f"{var}_regressor")
+
+        if isinstance(modelo, MODELOS_COLUMNARES):
+            preds[var] = modelo.predict(columnas)
+        elif modelo is not None:
+            if X_pred is None:
+                import pandas as pd
+                X_pred = pd.DataFrame(columnas)
             # Asegura que las features del input coincidan con las que espera el modelo
             X_model_features = X_pred[[col for col in X_pred.columns if col in modelo.feature_names_in_]]
-            preds[var] = modelo.predict(X_model_features)[0]
+            preds[var] = modelo.predict(X_model_features)
         else:
             print(f"ERROR: Archivo regresor no encontrado para {var} en: {modelo_path}")
-            preds[var] = 0.0 
+            preds[var] = np.zeros(len(lats))
 
-    # 2. Clasificar la condición principal
-    # RUTA CORREGIDA: Busca en 'data/app'
-    clf_path = BASE_DIR / "data" / "app" / "condition_classifier.pkl"
-    
-    condition = "Not Classified"
-    if clf_path.exists():
-        clf = joblib.load(clf_path)
+    # 2. Clasificar la condición principal con todas las salidas apiladas
+    clf, clf_path = _cargar_modelo("condition_classifier")
+
+    if isinstance(clf, MODELOS_COLUMNARES):
+        pred = clf.predict({**preds, **columnas})
+        condition = np.asarray(clf.classes)[pred]
+    elif clf is not None:
+        import pandas as pd
         
         # Preparar DataFrame para el clasificador
-        df_pred = pd.DataFrame([{**preds, "lat": lat, "lon": lon, "sin_day": sin_day, "cos_day": cos_day}])
+        df_pred = pd.DataFrame({**preds, **columnas})
         feature_names = list(clf.get_booster().feature_names)
         df_pred = df_pred[[col for col in feature_names if col in df_pred.columns]]
         
-        pred = clf.predict(df_pred)[0]
-        classes = clf.classes_
-        condition = classes[int(pred)] 
+        pred = clf.predict(df_pred)
+        condition = np.asarray(clf.classes_)[pred.astype(int)]
     else:
         print(f"ERROR: Archivo clasificador no encontrado en: {clf_path}")
+        condition = np.full(len(lats), "Not Classified", dtype=object)
 
-    return {"lat": lat, "lon": lon, "day": dia, "condition": condition, **preds}
+    return {"lat": lats, "lon": lons, "day": dias, "condition": condition, **preds}
 
 
-def predecir_y_guardar_pronostico(lat, lon, forecast_date):
+def mapear_prediccion(pred_data):
     """
-    Ejecuta el modelo de predicción, mapea los resultados y guarda/actualiza
-    el registro DailyForecast en la base de datos.
+    Mapea y limpia la salida de predecir_condicion a los campos de DailyForecast
+    (sin 'location' ni 'date').
     """
-    dia_del_año = forecast_date.timetuple().tm_yday
-    
-    # 1. Ejecutar la predicción
-    pred_data = predecir_condicion(lat, lon, dia_del_año)
-    
-    # 2. Buscar/Crear la Ubicación (Para asegurar el ForeignKey)
-    tolerance = 0.01
-    try:
-        # Buscamos la Location con una pequeña tolerancia
-        location = Location.objects.get(
-            latitude__gte=lat - tolerance, latitude__lte=lat + tolerance,
-            longitude__gte=lon - tolerance, longitude__lte=lon + tolerance
-        )
-    except Location.DoesNotExist:
-        # Si la ubicación no existe, la creamos
-        location = Location.objects.create(
-            city=f"Predicción @ Lat {lat:.4f}",
-            latitude=lat,
-            longitude=lon
-        )
-    except Location.MultipleObjectsReturned:
-        # Si hay duplicados (como sucedió en la prueba anterior), tomamos el primero
-        location = Location.objects.filter(
-            latitude__gte=lat - tolerance, latitude__lte=lat + tolerance,
-            longitude__gte=lon - tolerance, longitude__lte=lon + tolerance
-        ).first()
-
-
-    # 3. Mapear y Limpiar Datos para Django
     data_to_save = {
-        'location': location,
-        'date': forecast_date,
         'condition_summary': pred_data['condition'],
     }
     
@@ -173,6 +270,46 @@ def predecir_y_guardar_pronostico(lat, lon, forecast_date):
         except (ValueError, InvalidOperation, TypeError):
              print(f"Advertencia: Error de conversión para {model_key} con valor {value}. Se omite.")
 
+    return data_to_save
+
+
+def predecir_y_guardar_pronostico(lat, lon, forecast_date):
+    """
+    Ejecuta el modelo de predicción, mapea los resultados y guarda/actualiza
+    el registro DailyForecast en la base de datos.
+    """
+    dia_del_año = forecast_date.timetuple().tm_yday
+    
+    # 1. Ejecutar la predicción
+    pred_data = predecir_condicion(lat, lon, dia_del_año)
+    
+    # 2. Buscar/Crear la Ubicación (Para asegurar el ForeignKey)
+    # Caja fija de ±tolerancia sobre el índice (latitude, longitude); si hay varias, la más cercana
+    location = ubicacion_en_tolerancia(lat, lon, TOLERANCIA_UBICACION)
+    if location is None:
+        # Si la ubicación no existe, la creamos; prediction_cell es única, así que si otro
+        # proceso acaba de crear la de esta celda usamos la suya
+        celda = celda_de(lat, lon)
+        try:
+            with transaction.atomic():
+                location = Location.objects.create(
+                    city=f"Predicción @ Lat {lat:.4f}",
+                    latitude=lat,
+                    longitude=lon,
+                    prediction_cell=celda,
+                )
+        except IntegrityError:
+            location = Location.objects.filter(prediction_cell=celda).first() or ubicacion_en_tolerancia(
+                lat, lon, TOLERANCIA_UBICACION
+            )
+
+    # 3. Mapear y Limpiar Datos para Django
+    data_to_save = {
+        'location': location,
+        'date': forecast_date,
+        **mapear_prediccion(pred_data),
+    }
+
     # 4. Guardar/Actualizar en la Base de Datos
     forecast, created = DailyForecast.objects.update_or_create(
         location=location,
@@ -180,4 +317,191 @@ def predecir_y_guardar_pronostico(lat, lon, forecast_date):
         defaults=data_to_save
     )
 
-    return forecast, created
\ No newline at end of file
+    return forecast, created
+
+
+# ----------------------------------------------------------------------
+# Escritura masiva de pronósticos
+# ----------------------------------------------------------------------
+
+# Puntos por consulta al resolver ubicaciones y filas por INSERT en bulk_create
+TAMANO_LOTE = 500
+
+
+def resolver_ubicaciones(coords, tolerance=TOLERANCIA_UBICACION):
+    """
+    Resuelve muchas coordenadas (lat, lon) a su Location con consultas por conjuntos
+    (las celdas vecinas de cada TAMANO_LOTE puntos) en lugar de una consulta por punto.
+    Igual que predecir_y_guardar_pronostico, si hay varias se toma la más cercana y si
+    no hay ninguna se crea "Predicción @ Lat ...". Devuelve ({(lat, lon): Location}, creadas).
+    """
+    unicos = list(dict.fromkeys((float(lat), float(lon)) for lat, lon in coords))
+
+    candidatas = []
+    for i in range(0, len(unicos), TAMANO_LOTE):
+        celdas = set()
+        for lat, lon in unicos[i:i + TAMANO_LOTE]:
+            celdas |= celdas_en_tolerancia(lat, lon, tolerance)
+        candidatas.extend(Location.objects.filter(grid_cell__in=celdas))
+    candidatas = sorted({loc.pk: loc for loc in candidatas}.values(), key=lambda loc: loc.pk)
+
+    cand_lat = np.array([float(loc.latitude) for loc in candidatas])
+    cand_lon = np.array([float(loc.longitude) for loc in candidatas])
+
+    resultado, faltantes = {}, []
+    for lat, lon in unicos:
+        dlon = np.abs(cand_lon - lon)
+        cerca = np.flatnonzero((np.abs(cand_lat - lat) <= tolerance) & (np.minimum(dlon, 360 - dlon) <= tolerance))
+        if len(cerca):
+            distancias = haversine_km(lat, lon, cand_lat[cerca], cand_lon[cerca])
+            resultado[(lat, lon)] = candidatas[cerca[np.argmin(distancias)]]
+        else:
+            faltantes.append((lat, lon))
+
+    # Crear las que faltan; puntos cercanos entre sí comparten la misma Location nueva
+    nuevas = []
+    for lat, lon in faltantes:
+        for nueva in nuevas:
+            if abs(nueva[0] - lat) <= tolerance and abs(nueva[1] - lon) <= tolerance:
+                resultado[(lat, lon)] = nueva
+                break
+        else:
+            nuevas.append((lat, lon))
+            resultado[(lat, lon)] = (lat, lon)
+
+    if nuevas:
+        cuantizar = lambda v: Decimal(str(v)).quantize(Decimal('0.000001'))
+        # bulk_create no pasa por save(): la celda y la llave de búsqueda se asignan aquí
+        Location.objects.bulk_create(
+            [
+                Location(
+                    city=f"Predicción @ Lat {lat:.4f}",
+                    search_key=normalizar_busqueda(f"Predicción @ Lat {lat:.4f}"),
+                    latitude=cuantizar(lat),
+                    longitude=cuantizar(lon),
+                    grid_cell=celda_de(lat, lon),
+                    prediction_cell=celda_de(lat, lon),
+                )
+                for lat, lon in nuevas
+            ],
+            batch_size=TAMANO_LOTE,
+            ignore_conflicts=True,
+        )
+        # MySQL no devuelve los ids de bulk_create: las volvemos a leer por su celda única
+        # (si otro proceso ganó la carrera por una celda, nos quedamos con la suya)
+        celdas = [celda_de(lat, lon) for lat, lon in nuevas]
+        creadas = {}
+        for i in range(0, len(celdas), TAMANO_LOTE):
+            for loc in Location.objects.filter(prediction_cell__in=celdas[i:i + TAMANO_LOTE]):
+                creadas[loc.prediction_cell] = loc
+        faltan = [celda for celda in celdas if celda not in creadas]
+        if faltan:
+            # La fila del otro proceso puede no estar en nuestra instantánea (REPEATABLE READ de
+            # MySQL, dentro del atomic del llamador): una lectura con bloqueo ve la última confirmada
+            with transaction.atomic():
+                for i in range(0, len(faltan), TAMANO_LOTE):
+                    for loc in Location.objects.select_for_update().filter(prediction_cell__in=faltan[i:i + TAMANO_LOTE]):
+                        creadas[loc.prediction_cell] = loc
+        for key, valor in resultado.items():
+            if isinstance(valor, tuple):
+                celda = celda_de(*valor)
+                if celda not in creadas:
+                    raise Location.DoesNotExist(f"No se pudo crear ni leer la Location de la celda {celda}.")
+                resultado[key] = creadas[celda]
+
+    return resultado, len(nuevas)
+
+
+def predecir_y_guardar_pronosticos(puntos, batch_size=TAMANO_LOTE):
+    """
+    Versión masiva de predecir_y_guardar_pronostico para muchas tuplas (lat, lon, fecha):
+    resuelve todas las Location por conjuntos, ejecuta la inferencia en lote y escribe
+    todos los DailyForecast con bulk_create(update_conflicts=True) sobre (location, date)
+    en bloques dentro de una sola transacción.
+    Devuelve {'inserted', 'updated', 'locations_created'}.
+    """
+    puntos = [(float(lat), float(lon), fecha) for lat, lon, fecha in puntos]
+    if not puntos:
+        return {'inserted': 0, 'updated': 0, 'locations_created': 0}
+
+    # 1. Inferencia en lote
+    lats, lons, fechas = zip(*puntos)
+    lote = predecir_condicion_batch(lats, lons, [f.timetuple().tm_yday for f in fechas])
+
+    with transaction.atomic():
+        # 2. Ubicaciones
+        ubicaciones, creadas = resolver_ubicaciones([(lat, lon) for lat, lon, _ in puntos])
+        pares = [(ubicaciones[(lat, lon)], fecha) for lat, lon, fecha in puntos]
+
+        resultado = _guardar_lote(pares, lote, batch_size)
+
+    return {**resultado, 'locations_created': creadas}
+
+
+def pronosticar_ubicaciones(pares, batch_size=TAMANO_LOTE):
+    """
+    Como predecir_y_guardar_pronosticos pero para pares (Location, fecha) ya conocidos:
+    predice en las coordenadas de cada Location sin volver a resolverla.
+    """
+    pares = list(pares)
+    if not pares:
+        return {'inserted': 0, 'updated': 0, 'locations_created': 0}
+
+    lote = predecir_condicion_batch(
+        [float(loc.latitude) for loc, _ in pares],
+        [float(loc.longitude) for loc, _ in pares],
+        [fecha.timetuple().tm_yday for _, fecha in pares],
+    )
+    with transaction.atomic():
+        resultado = _guardar_lote(pares, lote, batch_size)
+
+    return {**resultado, 'locations_created': 0}
+
+
+def _guardar_lote(pares, lote, batch_size):
+    """Mapea la fila i del lote columnar al par (Location, fecha) i y hace el upsert por bloques."""
+    # 3. Mapear cada fila (si un par (location, date) se repite, gana el último)
+    filas, update_fields = {}, set()
+    for i, (location, fecha) in enumerate(pares):
+        pred_data = {'condition': lote['condition'][i], **{var: lote[var][i] for var in VARIABLE_MAP}}
+        campos = mapear_prediccion(pred_data)
+        # Como update_or_create: en filas existentes solo se actualizan los campos mapeados
+        update_fields.update(campos)
+        filas[(location.pk, fecha)] = DailyForecast(location=location, date=fecha, **campos)
+
+    existentes = set(
+        DailyForecast.objects.filter(
+            location_id__in={pk for pk, _ in filas},
+            date__in={fecha for _, fecha in filas},
+        ).values_list('location_id', 'date')
+    )
+    actualizadas = len(existentes & filas.keys())
+
+    # 4. Upsert por bloques
+    # MySQL resuelve el conflicto con ON DUPLICATE KEY UPDATE y no admite unique_fields
+    unique_fields = ['location', 'date'] if connection.features.supports_update_conflicts_with_target else None
+    objetos = list(filas.values())
+    for i in range(0, len(objetos), batch_size):
+        DailyForecast.objects.bulk_create(
+            objetos[i:i + batch_size],
+            update_conflicts=True,
+            unique_fields=unique_fields,
+            # auto_now llena updated_at en el INSERT; para que el UPDATE del conflicto lo copie va en update_fields
+            update_fields=sorted(update_fields | {'updated_at'}),
+        )
+
+    # bulk_create no dispara señales: el puntero latest_forecast, el JSON prerenderizado y el
+    # registro de cambios de /api/sync/ se actualizan aquí
+    actualizar_ultimo_pronostico({pk for pk, _ in filas})
+    escritos = [
+        (pk, location_id)
+        for pk, location_id, fecha in DailyForecast.objects.filter(
+            location_id__in={pk for pk, _ in filas},
+            date__in={fecha for _, fecha in filas},
+        ).values_list('pk', 'location_id', 'date')
+        if (location_id, fecha) in filas
+    ]
+    renderizar_pronosticos(pk for pk, _ in escritos)
+    registrar_cambios(ChangeLog.DAILY, escritos)
+
+    return {'inserted': len(filas) - actualizadas, 'updated': actualizadas}
@@ -4,14 +4,18 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework import viewsets
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.permissions import IsAuthenticated, AllowAny
-# Importaciones necesarias para la búsqueda por distancia
-from django.db.models import F, FloatField, ExpressionWrapper
-from django.db.models.functions import Cast
+from django.conf import settings
+from django.http import HttpResponse
+from django.db.models import DecimalField, Prefetch
+from django.utils import timezone
 from decimal import Decimal
+import math
 
 # Importa todos los modelos y serializers necesarios
 from .models import (
+    DECIMAL_PLACES,
     Location, 
     DailyForecast, 
     HourlyForecast, 
@@ -23,39 +27,205 @@ from .serializers import (
     DailyForecastSerializer, 
     HourlyForecastSerializer, 
     WeatherAlertSerializer, 
-    FavoriteLocationSerializer
+    FavoriteLocationSerializer,
+    LECTOR_HORAS,
+    LECTOR_PRONOSTICO_PLANO,
+    LECTOR_PRONOSTICOS,
+    ORDEN_DETALLES,
+    campos_pedidos
 )
+from .conditional import ConditionalGetMixin, ValidadoresMixin, etag_de
+from .forecast_blobs import PRERENDERED_FORECASTS, con_metadata, ubicaciones_con_blob
+from .forecast_grid import get_grid
+from .pagination import FechaDescPagination, HoraPagination, IdPagination, KeysetPagination
+from .renderers import ColumnarJSONRenderer, MessagePackRenderer, ORJSONRenderer
+from .interpolation import IDW_POWER, campos_numericos, mezclar_idw, pesos_idw
+from .search import AUTOCOMPLETE_MAX, buscar_ciudad, ciudad_parecida, get_city_trie
+from .spatial import k_mas_cercanas, ubicacion_mas_cercana, ubicaciones_mas_cercanas
+from .sync import MarcaVencida, cambios_desde, codificar_marca, decodificar_marca, ultimo_cambio
+from .utils import mapear_prediccion
+
+
+# Lecturas calientes: dicts desde .values_list() en lugar de DailyForecastSerializer (app/fast_serializers.py)
+FAST_READ_PATH = getattr(settings, 'FAST_READ_PATH', True)
+
+# JSON con orjson (mismos bytes que el JSONRenderer de DRF) y la API navegable
+RENDERERS_RAPIDOS = [ORJSONRenderer, BrowsableAPIRenderer]
+
+# Series de tiempo: además, JSON columnar y MessagePack (si está instalado) por negociación de contenido
+RENDERERS_SERIES = [
+    ORJSONRenderer, ColumnarJSONRenderer, *([MessagePackRenderer] if MessagePackRenderer.disponible else []),
+    BrowsableAPIRenderer,
+]
+
+# Variables físicas del modelo predictivo: en los formatos columnares van como números, no como cadenas
+CAMPOS_CIENTIFICOS = frozenset(
+    f.name for f in DailyForecast._meta.concrete_fields
+    if isinstance(f, DecimalField) and f.decimal_places == DECIMAL_PLACES
+)
+
+
+def _detalles(prefijo=''):
+    return [
+        Prefetch(f'{prefijo}hourly_forecasts', queryset=HourlyForecast.objects.order_by(*ORDEN_DETALLES['hourly_forecasts'])),
+        Prefetch(f'{prefijo}alerts', queryset=WeatherAlert.objects.order_by(*ORDEN_DETALLES['alerts'])),
+    ]
+
+
+def _campos_pronostico(query_params):
+    """Campos de DailyForecastSerializer pedidos con ?fields= / ?exclude= (None = todos)."""
+    if query_params is None:
+        return None
+    return campos_pedidos(query_params, LECTOR_PRONOSTICOS.disponibles)
+
+
+def _lector(query_params):
+    return LECTOR_PRONOSTICOS.recortado(_campos_pronostico(query_params))
+
+
+def pronostico_data(forecast, request):
+    """El pronóstico como lo devuelve DailyForecastSerializer (con ?fields= / ?exclude=), por el camino rápido si está activo."""
+    if FAST_READ_PATH:
+        return _lector(request.query_params).serializar_instancia(forecast)
+    return DailyForecastSerializer(forecast, context={'request': request}).data
+
+
+def _usar_blob(request):
+    """El JSON prerenderizado (ForecastBlob) sirve tal cual si se pide el pronóstico completo en JSON."""
+    return (
+        PRERENDERED_FORECASTS and request.accepted_renderer.format == 'json'
+        and not request.query_params.get('fields') and not request.query_params.get('exclude')
+    )
+
+
+def _validadores_ubicacion(request, location):
+    """
+    ETag y última modificación de la respuesta de clima de `location`: su updated_at y el
+    de su latest_forecast (anotado por ubicaciones_con_blob o ya en el JOIN), sin consultas.
+    """
+    if hasattr(location, 'forecast_updated_at'):
+        pronostico = location.forecast_updated_at
+    else:
+        pronostico = location.latest_forecast.updated_at if location.latest_forecast else None
+    ultimo = max(filter(None, (location.updated_at, pronostico)))
+    return etag_de(request, location.pk, location.updated_at, location.latest_forecast_id, pronostico), ultimo
+
+
+def _metadata(location, similitud=None):
+    metadata = {
+        'found_city': location.city,
+        'found_latitude': location.latitude,
+        'found_longitude': location.longitude
+    }
+    if similitud is not None:
+        metadata['similarity'] = round(similitud, 3)
+    return metadata
+
+
+def pronosticos_con_detalles(query_params=None, columnas_extra=()):
+    """
+    DailyForecast con las horas y alertas que anida DailyForecastSerializer ya precargadas
+    (dos consultas en total, no dos por pronóstico), en el orden en que se muestran.
+    Con ?fields= / ?exclude= solo se leen las columnas pedidas (más `columnas_extra`) y
+    solo se precarga lo anidado que se pidió.
+    """
+    pedidos = _campos_pronostico(query_params)
+    if pedidos is None:
+        return DailyForecast.objects.prefetch_related(*_detalles())
+
+    columnas = [f.name for f in DailyForecast._meta.concrete_fields if f.name in pedidos]
+    return (
+        DailyForecast.objects
+        .prefetch_related(*[p for p in _detalles() if p.prefetch_to in pedidos])
+        .only('id', *columnas_extra, *columnas)
+    )
+
+
+def ubicaciones_con_pronostico(query_params=None):
+    """Location con su latest_forecast en el mismo JOIN y las horas/alertas de éste precargadas (las pedidas)."""
+    pedidos = _campos_pronostico(query_params)
+    detalles = [
+        p for p in _detalles('latest_forecast__')
+        if pedidos is None or p.prefetch_to.removeprefix('latest_forecast__') in pedidos
+    ]
+    return Location.objects.select_related('latest_forecast').prefetch_related(*detalles)
+
+
+class LecturaRapidaMixin:
+    """
+    list() de un ViewSet paginado por el camino rápido (`lector`, un LectorRapido del
+    serializer_class). Si el renderer negociado es columnar (JSON columnar, MessagePack)
+    responde las columnas de la página en lugar de una lista de objetos.
+    """
+    lector = None
+    campos_flotantes = frozenset()
+
+    def get_lector(self):
+        return self.lector
+
+    def list(self, request, *args, **kwargs):
+        columnar = getattr(request.accepted_renderer, 'columnar', False)
+        if not (FAST_READ_PATH or columnar):
+            return super().list(request, *args, **kwargs)
+
+        lector = self.get_lector()
+        orden = [campo.lstrip('-') for campo in self.pagination_class.ordering]
+        queryset = lector.values(self.filter_queryset(self.get_queryset()), columnas_extra=orden)
+        page = self.paginate_queryset(queryset)
+        filas = queryset if page is None else page
+        if columnar:
+            data = lector.serializar_columnas(filas, self.campos_flotantes)
+        else:
+            data = lector.serializar(filas)
+        return Response(data) if page is None else self.get_paginated_response(data)
 
 
 # ----------------------------------------------------------------------
 # 1. ViewSets de Datos Climáticos (CRUD para Administración/Carga)
 # ----------------------------------------------------------------------
 
-class LocationViewSet(viewsets.ModelViewSet):
+class LocationViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """Permite listar y crear ubicaciones (ciudades)."""
     queryset = Location.objects.all()
     serializer_class = LocationSerializer
+    pagination_class = IdPagination
     permission_classes = [AllowAny] 
     
 
-class DailyForecastViewSet(viewsets.ModelViewSet):
+class DailyForecastViewSet(ConditionalGetMixin, LecturaRapidaMixin, viewsets.ModelViewSet):
     """Permite listar y obtener pronósticos diarios (Home Screen)."""
-    queryset = DailyForecast.objects.all().order_by('-date', '-id')
+    queryset = pronosticos_con_detalles().order_by('-date', '-id')
     serializer_class = DailyForecastSerializer
+    pagination_class = FechaDescPagination
     permission_classes = [AllowAny]
+    renderer_classes = RENDERERS_SERIES
+    campos_flotantes = CAMPOS_CIENTIFICOS
+
+    def get_queryset(self):
+        """Recorta el SELECT y los prefetch a los campos pedidos (?fields= / ?exclude=)."""
+        orden = [campo.lstrip('-') for campo in self.pagination_class.ordering]
+        return pronosticos_con_detalles(self.request.query_params, columnas_extra=orden).order_by('-date', '-id')
+
+    def get_lector(self):
+        """El lector recortado a ?fields= / ?exclude=."""
+        return _lector(self.request.query_params)
     
     
-class HourlyForecastViewSet(viewsets.ModelViewSet):
+class HourlyForecastViewSet(ConditionalGetMixin, LecturaRapidaMixin, viewsets.ModelViewSet):
     """Permite listar pronósticos por hora."""
     queryset = HourlyForecast.objects.all().order_by('time')
     serializer_class = HourlyForecastSerializer
+    pagination_class = HoraPagination
     permission_classes = [AllowAny]
+    renderer_classes = RENDERERS_SERIES
+    lector = LECTOR_HORAS
     
     
-class WeatherAlertViewSet(viewsets.ModelViewSet):
+class WeatherAlertViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """Permite listar alertas climáticas."""
     queryset = WeatherAlert.objects.all().order_by('-date')
     serializer_class = WeatherAlertSerializer
+    pagination_class = FechaDescPagination
     permission_classes = [AllowAny]
 
 
@@ -63,17 +233,21 @@ class WeatherAlertViewSet(viewsets.ModelViewSet):
 # 2. ViewSet de Favoritos
 # ----------------------------------------------------------------------
 
-class FavoriteLocationViewSet(viewsets.ModelViewSet):
+class FavoriteLocationViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """Permite a los usuarios gestionar sus ubicaciones favoritas."""
-    queryset = FavoriteLocation.objects.all() 
+    # location_details anida la Location completa: se trae en el mismo JOIN
+    queryset = FavoriteLocation.objects.select_related('location')
     serializer_class = FavoriteLocationSerializer
+    pagination_class = IdPagination
     permission_classes = [AllowAny] 
+    # Lo que cambia en un favorito es la Location anidada
+    campo_modificacion = 'location__updated_at'
 
     def get_queryset(self):
         """Filtra el queryset para mostrar solo los favoritos del usuario actual."""
         if self.request.user.is_authenticated:
-            return FavoriteLocation.objects.filter(user=self.request.user)
-        return FavoriteLocation.objects.all() 
+            return self.queryset.filter(user=self.request.user)
+        return self.queryset.all() 
 
     def perform_create(self, serializer):
         """Asigna el usuario que realiza la petición al crear el favorito."""
@@ -87,11 +261,14 @@ class FavoriteLocationViewSet(viewsets.ModelViewSet):
 # 3. Vista de Búsqueda por Coordenadas (Endpoint: /clima-actual/)
 # ----------------------------------------------------------------------
 
-class CurrentWeatherView(APIView):
+class CurrentWeatherView(ValidadoresMixin, APIView):
     """
     Endpoint para obtener el pronóstico más reciente, encontrando la 
-    Location más cercana por distancia euclidiana.
+    Location más cercana (distancia great-circle con el índice en memoria).
     """
+    idw_max_k = getattr(settings, 'IDW_MAX_K', 16)
+    renderer_classes = RENDERERS_RAPIDOS
+
     def get(self, request, *args, **kwargs):
         latitude_str = request.query_params.get('lat')
         longitude_str = request.query_params.get('lon')
@@ -107,24 +284,27 @@ class CurrentWeatherView(APIView):
             # Convertimos a float para usar en el cálculo SQL
             lat_f = float(latitude_str) 
             lon_f = float(longitude_str)
+            # nan/inf pasan por float() pero no son coordenadas (y rompen el redondeo del modo idw)
+            if not (math.isfinite(lat_f) and math.isfinite(lon_f)):
+                raise ValueError("coordenadas no finitas")
         except Exception:
             return Response(
                 {"error": "Los parámetros lat y lon deben ser valores numéricos válidos."},
                 status=status.HTTP_400_BAD_REQUEST
             )
+
+        # Modo malla precalculada: interpolación sobre el cubo memory-mapped, sin XGBoost ni ORM
+        if request.query_params.get('mode') == 'grid':
+            return self.get_desde_grid(lat_f, lon_f)
+
+        # Modo interpolado: mezcla IDW de los pronósticos de las k ubicaciones más cercanas
+        if request.query_params.get('mode') == 'idw':
+            return self.get_idw(request, lat_f, lon_f)
         
-        # 2. BÚSQUEDA POR DISTANCIA (FIXED)
-        distance_expression = ExpressionWrapper(
-            (Cast(F('latitude'), FloatField()) - lat_f) ** 2 + 
-            (Cast(F('longitude'), FloatField()) - lon_f) ** 2,
-            output_field=FloatField() 
-        )
-        
-        locations_with_distance = Location.objects.annotate(
-            distance=distance_expression
-        )
-        
-        closest_location = locations_with_distance.order_by('distance').first()
+        # 2. BÚSQUEDA POR DISTANCIA (índice espacial en memoria o consulta SQL, según LOCATION_LOOKUP)
+        usar_blob = _usar_blob(request)
+        ubicaciones = ubicaciones_con_blob() if usar_blob else ubicaciones_con_pronostico(request.query_params)
+        closest_location = ubicacion_mas_cercana(lat_f, lon_f, queryset=ubicaciones)
 
         if not closest_location:
             return Response(
@@ -132,9 +312,20 @@ class CurrentWeatherView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        # 3. Obtener el pronóstico más reciente
+        # 304 si el cliente ya tiene esta versión (ETag / Last-Modified de la misma consulta)
+        no_modificado = self.no_modificado(request, *_validadores_ubicacion(request, closest_location))
+        if no_modificado is not None:
+            return no_modificado
+
+        # JSON guardado al escribir el pronóstico: solo falta el bloque metadata
+        if usar_blob:
+            if closest_location.blob is not None:
+                return HttpResponse(con_metadata(closest_location.blob, _metadata(closest_location)), content_type='application/json')
+            closest_location = ubicaciones_con_pronostico(request.query_params).get(pk=closest_location.pk)
+
+        # 3. El pronóstico más reciente ya viene con la ubicación (puntero latest_forecast)
         try:
-            forecast = DailyForecast.objects.filter(location=closest_location).order_by('-date').first()
+            forecast = closest_location.latest_forecast
             
             if not forecast:
                  return Response(
@@ -143,13 +334,8 @@ class CurrentWeatherView(APIView):
                 )
 
             # 4. Serializar y devolver
-            serializer = DailyForecastSerializer(forecast)
-            response_data = serializer.data
-            response_data['metadata'] = {
-                'found_city': closest_location.city,
-                'found_latitude': closest_location.latitude,
-                'found_longitude': closest_location.longitude
-            }
+            response_data = pronostico_data(forecast, request)
+            response_data['metadata'] = _metadata(closest_location)
             
             return Response(response_data, status=status.HTTP_200_OK)
 
@@ -160,15 +346,159 @@ class CurrentWeatherView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    def get_idw(self, request, lat_f, lon_f):
+        """Responde con los campos numéricos ponderados por inverso de la distancia (?k=4)."""
+        try:
+            k = int(request.query_params.get('k', 4))
+            if not 1 <= k <= self.idw_max_k:
+                raise ValueError
+        except ValueError:
+            return Response(
+                {"error": f"El parámetro k debe ser un entero entre 1 y {self.idw_max_k}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # k vecinos (KD-tree en memoria) y sus pronósticos más recientes en una sola consulta (JOIN por latest_forecast)
+        vecinos = k_mas_cercanas(lat_f, lon_f, k)
+        ubicaciones = Location.objects.select_related('latest_forecast').in_bulk([pk for pk, _ in vecinos])
+        vecinos = [(pk, km) for pk, km in vecinos if pk in ubicaciones and ubicaciones[pk].latest_forecast_id]
+
+        if not vecinos:
+            return Response(
+                {"error": "No hay pronósticos registrados en las ubicaciones cercanas."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        locations = [ubicaciones[pk] for pk, _ in vecinos]
+        forecasts = [loc.latest_forecast for loc in locations]
+        distancias = [km for _, km in vecinos]
+        cercano = forecasts[0]
+
+        # Los campos no numéricos (condición, dirección del viento...) vienen del más cercano. Como en
+        # ?mode=grid, la mezcla se representa con los campos de DailyForecastSerializer (sin fila guardada)
+        numericos = campos_numericos()
+        mezcla = DailyForecast(**{
+            field.name: getattr(cercano, field.name)
+            for field in DailyForecast._meta.concrete_fields
+            if field.name not in numericos and not field.primary_key and not field.is_relation
+        }, **mezclar_idw(forecasts, distancias))
+        datos = LECTOR_PRONOSTICO_PLANO.serializar_instancia(mezcla)
+        response_data = {campo: datos.get(campo, []) for campo in LECTOR_PRONOSTICOS.disponibles}
+        response_data['metadata'] = {
+            'source': 'idw',
+            'latitude': lat_f,
+            'longitude': lon_f,
+            'power': IDW_POWER,
+            'neighbors': [
+                {
+                    'city': loc.city,
+                    'latitude': loc.latitude,
+                    'longitude': loc.longitude,
+                    'date': loc.latest_forecast.date,
+                    'distance_km': round(km, 3),
+                    'weight': round(float(w), 4),
+                }
+                for loc, km, w in zip(locations, distancias, pesos_idw(distancias))
+            ],
+        }
+        return Response(response_data, status=status.HTTP_200_OK)
+
+    def get_desde_grid(self, lat_f, lon_f):
+        """Responde con la predicción interpolada de la malla para el día de hoy."""
+        grid = get_grid()
+        if grid is None:
+            return Response(
+                {"error": "La malla de pronóstico no se ha generado (manage.py build_forecast_grid)."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+
+        today = timezone.now().date()
+        pred = grid.lookup(lat_f, lon_f, today.timetuple().tm_yday)
+        # Mismo esquema que la respuesta normal: la predicción se mapea como al guardarla y se
+        # representa con los campos de DailyForecastSerializer (sin fila guardada: id y location nulos)
+        datos = LECTOR_PRONOSTICO_PLANO.serializar_instancia(DailyForecast(date=today, **mapear_prediccion(pred)))
+        response_data = {
+            **{campo: datos.get(campo, []) for campo in LECTOR_PRONOSTICOS.disponibles},
+            'metadata': {
+                'source': 'forecast_grid',
+                'latitude': lat_f,
+                'longitude': lon_f,
+                'model_version': grid.header.get('model_version'),
+            },
+        }
+        return Response(response_data, status=status.HTTP_200_OK)
+
+
+class CurrentWeatherBatchView(APIView):
+    """
+    POST con varias coordenadas ({"points": [{"lat": .., "lon": ..}, ...]}): resuelve la
+    Location más cercana de todas en una pasada y trae sus pronósticos más recientes
+    (latest_forecast) en una sola consulta. Los resultados vuelven en el orden de entrada.
+    """
+    max_points = getattr(settings, 'CURRENT_WEATHER_BATCH_MAX_POINTS', 100)
+    renderer_classes = RENDERERS_RAPIDOS
+
+    def post(self, request, *args, **kwargs):
+        points = request.data.get('points') if isinstance(request.data, dict) else None
+
+        # 1. Validar y convertir la lista de puntos
+        if not isinstance(points, list) or not points:
+            return Response(
+                {"error": "Se requiere 'points': una lista de objetos con 'lat' y 'lon'."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(points) > self.max_points:
+            return Response(
+                {"error": f"Se permiten como máximo {self.max_points} puntos por petición."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            coords = [(float(p['lat']), float(p['lon'])) for p in points]
+            if not all(math.isfinite(c) for punto in coords for c in punto):
+                raise ValueError("coordenadas no finitas")
+        except Exception:
+            return Response(
+                {"error": "Cada punto debe tener 'lat' y 'lon' numéricos válidos."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # 2. Location más cercana de cada punto (una sola pasada sobre el índice)
+        location_ids = ubicaciones_mas_cercanas(coords)
+
+        # 3. Las Location con su pronóstico más reciente (latest_forecast) en una consulta
+        locations = ubicaciones_con_pronostico(request.query_params).filter(
+            pk__in={pk for pk in location_ids if pk is not None}, latest_forecast__isnull=False
+        )
+
+        # 4. Serializar cada pronóstico una sola vez, aunque varios puntos caigan en la misma Location
+        por_location = {}
+        for location in locations:
+            data = pronostico_data(location.latest_forecast, request)
+            data['metadata'] = _metadata(location)
+            por_location[location.pk] = data
+
+        results = []
+        for (lat_f, lon_f), pk in zip(coords, location_ids):
+            if pk is None:
+                results.append({"error": "No hay ubicaciones registradas en la base de datos para realizar la búsqueda."})
+            elif pk not in por_location:
+                results.append({"error": "No hay pronóstico registrado para la ubicación más cercana.", "location_id": pk})
+            else:
+                results.append(por_location[pk])
+
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
 
 # ----------------------------------------------------------------------
 # 4. Vista de Búsqueda por Ciudad (Endpoint: /clima-por-ciudad/)
 # ----------------------------------------------------------------------
 
-class CityWeatherView(APIView):
+class CityWeatherView(ValidadoresMixin, APIView):
     """
     Endpoint para obtener el pronóstico climático actual dado el nombre de la ciudad.
     """
+    renderer_classes = RENDERERS_RAPIDOS
+
     def get(self, request, *args, **kwargs):
         city_name = request.query_params.get('city')
 
@@ -179,10 +509,14 @@ class CityWeatherView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # 2. Buscar la ubicación por nombre (búsqueda insensible a mayúsculas y minúsculas)
+        # 2. Buscar la ubicación por nombre (sin acentos ni mayúsculas: exacta, prefijo y subcadena)
+        usar_blob = _usar_blob(request)
+        ubicaciones = ubicaciones_con_blob() if usar_blob else ubicaciones_con_pronostico(request.query_params)
         try:
-            # Usamos icontains (case-insensitive contains) para búsquedas flexibles
-            location = Location.objects.filter(city__icontains=city_name).first()
+            location, similitud = buscar_ciudad(city_name, queryset=ubicaciones), None
+            if not location:
+                # Sin coincidencia literal: la ciudad más parecida por trigramas ("Monterey", "Nueva Yrok")
+                location, similitud = ciudad_parecida(city_name, queryset=ubicaciones)
             
             if not location:
                 return Response(
@@ -196,10 +530,20 @@ class CityWeatherView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+        # 304 si el cliente ya tiene esta versión (ETag / Last-Modified de la misma consulta)
+        no_modificado = self.no_modificado(request, *_validadores_ubicacion(request, location))
+        if no_modificado is not None:
+            return no_modificado
+
+        # JSON guardado al escribir el pronóstico: solo falta el bloque metadata
+        if usar_blob:
+            if location.blob is not None:
+                return HttpResponse(con_metadata(location.blob, _metadata(location, similitud)), content_type='application/json')
+            location = ubicaciones_con_pronostico(request.query_params).get(pk=location.pk)
 
-        # 3. Obtener el pronóstico más reciente
+        # 3. El pronóstico más reciente ya viene con la ubicación (puntero latest_forecast)
         try:
-            forecast = DailyForecast.objects.filter(location=location).order_by('-date').first()
+            forecast = location.latest_forecast
             
             if not forecast:
                  return Response(
@@ -208,14 +552,8 @@ class CityWeatherView(APIView):
                 )
 
             # 4. Serializar y devolver la respuesta
-            serializer = DailyForecastSerializer(forecast)
-            
-            response_data = serializer.data
-            response_data['metadata'] = {
-                'found_city': location.city,
-                'found_latitude': location.latitude,
-                'found_longitude': location.longitude
-            }
+            response_data = pronostico_data(forecast, request)
+            response_data['metadata'] = _metadata(location, similitud)
             
             return Response(response_data, status=status.HTTP_200_OK)
 
@@ -223,4 +561,83 @@ class CityWeatherView(APIView):
             return Response(
                 {"error": "Error interno al procesar el pronóstico. Verifique el log del servidor."},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
+
+
+# ----------------------------------------------------------------------
+# 5. Autocompletado de ciudades (Endpoint: /ciudades/autocomplete/)
+# ----------------------------------------------------------------------
+
+class CityAutocompleteView(APIView):
+    """
+    Sugerencias de ciudades para lo que el usuario lleva escrito (?q=, ?limit=), servidas
+    desde el trie en memoria: primero la coincidencia exacta, luego prefijos y luego palabras.
+    """
+    def get(self, request, *args, **kwargs):
+        q = request.query_params.get('q', '')
+        if not q.strip():
+            return Response(
+                {"error": "Se requiere el parámetro 'q'."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            limit = min(int(request.query_params.get('limit', AUTOCOMPLETE_MAX)), AUTOCOMPLETE_MAX)
+            if limit < 1:
+                raise ValueError
+        except ValueError:
+            return Response(
+                {"error": f"El parámetro limit debe ser un entero entre 1 y {AUTOCOMPLETE_MAX}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response({"results": get_city_trie().sugerencias(q, limit)}, status=status.HTTP_200_OK)
+
+
+# ----------------------------------------------------------------------
+# 6. Sincronización incremental (Endpoint: /sync/)
+# ----------------------------------------------------------------------
+
+class SyncView(APIView):
+    """
+    Los DailyForecast, HourlyForecast y WeatherAlert creados, cambiados o borrados después
+    de la marca ?since= (del registro de cambios, ver app/sync.py), solo de las ubicaciones
+    favoritas si hay usuario. Los borrados van como lápidas en "deleted" y la respuesta trae
+    la marca para la siguiente petición; con has_more se pide de nuevo enseguida.
+    Sin ?since= solo devuelve la marca actual: el cliente la pide antes de su descarga
+    completa y desde ahí sincroniza (o al recibir un 410 porque su marca venció).
+    """
+    renderer_classes = RENDERERS_RAPIDOS
+    permission_classes = [AllowAny]
+
+    def get(self, request, *args, **kwargs):
+        since = request.query_params.get('since')
+        if not since:
+            return Response({'since': codificar_marca(ultimo_cambio()), 'has_more': False}, status=status.HTTP_200_OK)
+
+        try:
+            ultimo_id = decodificar_marca(since)
+        except ValueError:
+            return Response(
+                {"error": "Marca de sincronización inválida."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except MarcaVencida:
+            return Response(
+                {"error": "La marca de sincronización venció: descargue los datos de nuevo y pida una marca sin 'since'."},
+                status=status.HTTP_410_GONE
+            )
+
+        try:
+            tamano = int(request.query_params.get('page_size', KeysetPagination.page_size))
+        except ValueError:
+            tamano = KeysetPagination.page_size
+        tamano = max(1, min(tamano, KeysetPagination.max_page_size))
+
+        location_ids = None
+        if request.user.is_authenticated:
+            location_ids = FavoriteLocation.objects.filter(user=request.user).values('location_id')
+
+        datos, ultimo_id, hay_mas = cambios_desde(ultimo_id, location_ids, tamano)
+        return Response({'since': codificar_marca(ultimo_id), 'has_more': hay_mas, **datos}, status=status.HTTP_200_OK)
+
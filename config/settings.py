@@ -139,4 +139,49 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
-#correccion de settings.py
\ No newline at end of file
+#correccion de settings.py
+# Registro de modelos de predicción (app/model_registry.py)
+MODEL_REGISTRY_PRELOAD = True        # Cargar todos los .pkl al arrancar el worker WSGI
+MODEL_REGISTRY_CHECK_INTERVAL = 2.0  # Segundos entre revisiones de mtime para recarga en caliente
+
+# Malla global precalculada (app/forecast_grid.py, manage.py build_forecast_grid)
+FORECAST_GRID_PATH = BASE_DIR / 'data' / 'app' / 'forecast_grid.f32'
+
+# Motor de inferencia de app/utils.py: 'numpy' (árboles .trees.npz, sin xgboost), 'native' (boosters .ubj,
+# sin pandas) o 'sklearn'. Si falta el artefacto del motor elegido se cae al siguiente.
+PREDICTION_ENGINE = 'native'
+MULTI_OUTPUT_REGRESSOR = False  # True: usar data/app/multi_regressor.* (un solo modelo) en lugar de los 18 regresores
+
+# Caché de predicciones de app/utils.py (app/prediction_cache.py). Activa, toda la celda recibe la
+# predicción de su punto redondeado (2 decimales ≈ 1 km); apagada, cada respuesta es la del punto exacto.
+PREDICTION_CACHE_PRECISION = None     # Decimales de lat/lon en la llave (None desactiva la caché)
+PREDICTION_CACHE_MAX_ENTRIES = 10000  # Tamaño máximo de la LRU por proceso
+PREDICTION_CACHE_TTL = 3600           # Segundos de vida de cada entrada
+PREDICTION_CACHE_ALIAS = None         # Alias de CACHES para compartir entre workers (ej: 'default')
+
+# manage.py refresh_forecasts: los pronósticos guardados hace más de estas horas se recalculan (--max-age)
+REFRESH_FORECASTS_MAX_AGE_HOURS = 24
+
+# Búsqueda de la Location más cercana (app/spatial.py): 'memory' (KD-tree en el proceso) u 'orm' (SQL)
+LOCATION_LOOKUP = 'memory'  # o 'bbox': caja lat/lon creciente en SQL + haversine
+SPATIAL_INDEX_TTL = 60  # Segundos entre revisiones de cambios en Location hechos por otros procesos
+CURRENT_WEATHER_BATCH_MAX_POINTS = 100  # Máximo de coordenadas por POST a /api/clima-actual/lote/
+
+# Modo interpolado de /api/clima-actual/?mode=idw&k=4 (app/interpolation.py)
+IDW_POWER = 2    # Exponente de la ponderación 1 / d^p
+IDW_MAX_K = 16   # Máximo de vecinos que se pueden pedir con ?k=
+
+# Búsqueda de ciudades (app/search.py): trie de autocompletado e índice de trigramas
+SEARCH_INDEX_TTL = 60         # Segundos entre revisiones de cambios en Location hechos por otros procesos
+FUZZY_MIN_SIMILARITY = 0.3    # Similitud mínima de trigramas para /clima-por-ciudad/ con nombres mal escritos
+
+# Paginación por cursor de los ViewSets (app/pagination.py)
+API_PAGE_SIZE = 100       # Filas por página por defecto (?page_size= para cambiarlo)
+API_MAX_PAGE_SIZE = 1000  # Tope de ?page_size=
+
+# Lecturas de pronósticos (/api/pronosticos-diarios/, /api/clima-actual/, /api/clima-por-ciudad/)
+FAST_READ_PATH = True  # Dicts desde .values_list() (app/fast_serializers.py) en lugar de DailyForecastSerializer
+PRERENDERED_FORECASTS = True  # JSON de cada pronóstico guardado al escribir (ForecastBlob) y servido tal cual
+
+# Sincronización incremental (/api/sync/, app/sync.py)
+SYNC_LOG_RETENTION_DAYS = 30  # Días de cambios que se guardan (manage.py prune_sync_log); marcas más viejas reciben 410
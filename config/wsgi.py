@@ -14,3 +14,12 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# Precarga los modelos de predicción una vez por worker (o antes del fork con --preload)
+# para que ninguna petición pague el joblib.load.
+from django.conf import settings
+
+if getattr(settings, 'MODEL_REGISTRY_PRELOAD', True):
+    from app.utils import precargar_modelos
+
+    precargar_modelos()
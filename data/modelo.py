@@ -5,6 +5,8 @@ from sklearn.preprocessing import LabelEncoder
 from sklearn.metrics import r2_score, mean_squared_error
 from xgboost import XGBClassifier, XGBRegressor
 import joblib
+import json
+import sys
 
 def modelo_regresor(df, variable_obj):
     predictores = ["lat", "lon", "sin_day", "cos_day"]
@@ -44,6 +46,61 @@ def modelo_regresor(df, variable_obj):
         print(f"{i}: R2 = {resultados[i]['R2']} | RMSE = {resultados[i]['RMSE']}")
     return resultados
 
+def modelo_regresor_multisalida(df, variable_obj):
+    # Un solo modelo de árboles multisalida para todas las variables objetivo:
+    # cada árbol tiene hojas vectoriales, así que al servir se recorre 1 ensamble en vez de 18
+    predictores = ["lat", "lon", "sin_day", "cos_day"]
+
+    tscv = TimeSeriesSplit(n_splits=5)
+    parametros = {
+        "n_estimators": [300, 500],
+        "max_depth": [4, 6, 8],
+        "learning_rate": [0.01, 0.05],
+        "subsample": [0.8],
+        "colsample_bytree": [0.8]
+    }
+
+    X, Y = df[predictores], df[variable_obj]
+    modelo = XGBRegressor(
+        objective='reg:squarederror',
+        tree_method="hist",
+        multi_strategy="multi_output_tree"
+    )
+    grid = GridSearchCV(
+        estimator=modelo,
+        param_grid=parametros,
+        cv=tscv,
+        scoring="r2",
+        verbose=1,
+        n_jobs=-1
+    )
+
+    grid.fit(X, Y)
+    mejor_modelo = grid.best_estimator_
+    print("Mejores parametros (multisalida): ", grid.best_params_)
+
+    # El orden de las salidas viaja con el booster para que app/utils.py sepa qué columna es cada variable
+    mejor_modelo.get_booster().set_attr(targets=json.dumps(list(variable_obj)))
+    joblib.dump(mejor_modelo, "app\\multi_regressor.pkl")
+
+    Y_pred = mejor_modelo.predict(X)
+    resultados = {}
+    for k, i in enumerate(variable_obj):
+        resultados[i] = {
+            "R2": r2_score(Y[i], Y_pred[:, k]),
+            "RMSE": np.sqrt(mean_squared_error(Y[i], Y_pred[:, k]))
+        }
+    return resultados
+
+def comparar_resultados(individuales, multisalida):
+    print(f"\n{'variable':<22}{'R2 indiv.':>12}{'R2 multi':>12}{'RMSE indiv.':>14}{'RMSE multi':>14}")
+    for i in multisalida:
+        ind, mul = individuales.get(i, {}), multisalida[i]
+        print(
+            f"{i:<22}{ind.get('R2', float('nan')):>12.4f}{mul['R2']:>12.4f}"
+            f"{ind.get('RMSE', float('nan')):>14.4f}{mul['RMSE']:>14.4f}"
+        )
+
 def entrenar_modelo(df):
     
     entradas = ["lat", "lon", "sin_day", "cos_day",
@@ -264,6 +321,12 @@ if __name__ == "__main__":
     print("\nEntrenando modelos regresores...")
     resultados = modelo_regresor(df, variables_objetivo)
 
+    # Opcional: un solo regresor multisalida en lugar de los 18 (python modelo.py --multisalida)
+    if "--multisalida" in sys.argv:
+        print("\nEntrenando regresor multisalida...")
+        resultados_multi = modelo_regresor_multisalida(df, variables_objetivo)
+        comparar_resultados(resultados, resultados_multi)
+
     # ======================================================
     # 4️⃣ Entrenar el clasificador de condición
     # ======================================================